@@ -0,0 +1,50 @@
+import settings
+
+import argparse
+import logging
+import time
+
+from benchmarks.common import RUN_SERVER_CONFIG
+from modules.checkpoint import fork, restore, snapshot
+from modules.simulator import Simulator
+
+
+def best_time(function, repeats:int):
+    """Fastest wall-clock time of repeated calls
+
+    Args:
+        function (callable): Function without arguments
+        repeats (int): Number of calls
+
+    Returns:
+        (float, object): Best time in seconds and the result of the last call
+    """
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Cost of checkpointing, restoring and forking a warm simulator')
+    parser.add_argument('--num_clients', type=int, default=12501, help='number of clients')
+    parser.add_argument('--warmup_time', type=float, default=60, help='simulated seconds before the checkpoint')
+    parser.add_argument('--repeats', type=int, default=5, help='repeats of every measurement, the fastest is reported')
+    parser.add_argument('--seed', type=int, default=1, help='seed of the runs')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    for engine in ("object", "array"):
+        sim = Simulator(clients = args.num_clients, simulation_time = args.warmup_time, seed = args.seed, engine = engine, **RUN_SERVER_CONFIG)
+        start = time.perf_counter()
+        sim.advance(args.warmup_time)
+        warmup = time.perf_counter() - start
+
+        save, data = best_time(lambda: snapshot(sim), args.repeats)
+        load, _ = best_time(lambda: restore(data), args.repeats)
+        forked, _ = best_time(lambda: fork(data, request_timeout = 20), args.repeats)
+        print(f"{engine} engine | {len(sim.event_queue) + len(sim.arrivals) + len(sim.timeouts):,} pending events and timeouts | "
+              f"snapshot : {save*1000:.0f} ms, {len(data)/2**20:.1f} MiB | restore : {load*1000:.0f} ms | "
+              f"fork : {forked*1000:.0f} ms | re-simulating the warm-up : {warmup*1000:.0f} ms")
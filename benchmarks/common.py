@@ -0,0 +1,44 @@
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from modules.simulator import Simulator
+
+
+# Configuration of the sweep in run_server.sh, without num_clients and simulation_time
+RUN_SERVER_CONFIG = dict(
+    application_server_count = 20,
+    db_server_count = 5,
+    application_service_time = 0.1,
+    db_service_time = 1,
+    app_to_db_prob = 0.02,
+    think_time = 5,
+    priority_prob = 0.2,
+    app_server_queue_length = 30000,
+    db_server_queue_length = 30000,
+    retry_delay = 0.1,
+    request_timeout = 10,
+    db_call_is_synchronous = 1
+)
+
+
+def run_quietly(sim:Simulator):
+    """Run a simulation without leaving its report or results file behind
+
+    Args:
+        sim (Simulator): Simulator instance
+
+    Returns:
+        float: Wall-clock seconds spent in run
+    """
+    with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+        cwd = os.getcwd()
+        os.chdir(directory)
+        try:
+            start = time.perf_counter()
+            sim.run()
+            return time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
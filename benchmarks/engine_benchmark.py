@@ -0,0 +1,72 @@
+import settings
+
+import argparse
+import gc
+import logging
+import tracemalloc
+
+from benchmarks.common import RUN_SERVER_CONFIG, run_quietly
+from modules.request import Request
+from modules.simulator import Simulator
+
+
+def events_per_second(engine:str, clients:int, simulation_time:float, seed:int, repeats:int = 5):
+    """Best events per second of an engine over repeated runs
+
+    Args:
+        engine (str): Engine of the simulator
+        clients (int): Number of clients
+        simulation_time (float): Simulated seconds
+        seed (int): Seed of the runs
+        repeats (int): Number of runs, the fastest one is reported
+
+    Returns:
+        float: Events processed per wall-clock second
+    """
+    best = 0
+    for _ in range(repeats):
+        sim = Simulator(clients = clients, simulation_time = simulation_time, seed = seed, engine = engine, **RUN_SERVER_CONFIG)
+        elapsed = run_quietly(sim)
+        best = max(best, sim.events_processed / elapsed)
+    return best
+
+def bytes_per_request(engine:str, clients:int, simulation_time:float, seed:int):
+    """Memory held per in-flight request, including its events, timeout and queue entries
+
+    Args:
+        engine (str): Engine of the simulator
+        clients (int): Number of clients
+        simulation_time (float): Simulated seconds before measuring
+        seed (int): Seed of the run
+
+    Returns:
+        float: Traced bytes per request in flight
+    """
+    gc.collect()
+    Request.free_list.clear()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    sim = Simulator(clients = clients, simulation_time = simulation_time, seed = seed, engine = engine, **RUN_SERVER_CONFIG)
+    sim.event_handler.run_until(simulation_time, 0)
+    used = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+
+    if engine == "array":
+        in_flight = sim.event_handler.in_flight()
+    else:
+        in_flight = sum(isinstance(obj, Request) for obj in gc.get_objects()) - len(Request.free_list)
+    return used / in_flight
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Object engine against the array engine')
+    parser.add_argument('--num_clients', type=int, default=12501, help='number of clients')
+    parser.add_argument('--simulation_time', type=float, default=60, help='simulated seconds per run')
+    parser.add_argument('--seed', type=int, default=1, help='seed of the runs')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)   # Measure the engine, not the event log
+    for engine in ["object", "array"]:
+        speed = events_per_second(engine, args.num_clients, args.simulation_time, args.seed)
+        memory = bytes_per_request(engine, args.num_clients, args.simulation_time, args.seed)
+        print(f"{engine} engine : {speed:,.0f} events/sec | {memory:,.0f} bytes per in-flight request")
@@ -0,0 +1,75 @@
+import settings
+
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.common import RUN_SERVER_CONFIG
+from modules.event_list import EVENT_LISTS
+
+
+# Distribution name -> increments of the event times drawn by the model, RUN_SERVER_CONFIG means
+INCREMENTS = {
+    "app_service" : lambda generator, size: generator.exponential(RUN_SERVER_CONFIG["application_service_time"], size),
+    "db_service" : lambda generator, size: generator.exponential(RUN_SERVER_CONFIG["db_service_time"], size),
+    "retry" : lambda generator, size: np.abs(RUN_SERVER_CONFIG["retry_delay"] + generator.standard_normal(size)),
+    "model" : lambda generator, size: np.where(     # Completions of the app server, and of the db server for some requests
+        generator.random(size) < RUN_SERVER_CONFIG["app_to_db_prob"],
+        generator.exponential(RUN_SERVER_CONFIG["db_service_time"], size),
+        generator.exponential(RUN_SERVER_CONFIG["application_service_time"], size)
+    )
+}
+
+
+def hold_time(name:str, distribution:str, population:int, holds:int, seed:int):
+    """Mean time of a hold, a pop followed by the push of a later event, on an event list of constant size
+
+    Args:
+        name (str): Event list of EVENT_LISTS
+        distribution (str): Increment distribution of INCREMENTS
+        population (int): Number of pending events
+        holds (int): Number of holds timed, after as many untimed ones to reach a steady state
+        seed (int): Seed of the event times
+
+    Returns:
+        float: Nanoseconds per hold
+    """
+    generator = np.random.default_rng(seed)
+    initial = INCREMENTS[distribution](generator, population).tolist()
+    increments = INCREMENTS[distribution](generator, 2 * holds).tolist()
+
+    event_list = EVENT_LISTS[name]()
+    push, pop = event_list.operations()
+    for seq, event_time in enumerate(initial):
+        push((event_time, seq, settings.EVENT_REQUEST_COMPLETE_FROM_APP_SERVER, seq))   # Events of the array engine
+    seq = population
+
+    def hold(increments:list):
+        nonlocal seq
+        for increment in increments:
+            event_time, _, event_type, slot = pop()
+            seq += 1
+            push((event_time + increment, seq, event_type, slot))
+
+    hold(increments[:holds])
+    start = time.perf_counter()
+    hold(increments[holds:])
+    return (time.perf_counter() - start) / holds * 1e9
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Hold model of the event lists, on the event time increments of the model')
+    parser.add_argument('--populations', type=int, nargs='+', default=[100, 1000, 10000, 50000], help='numbers of pending events')
+    parser.add_argument('--distributions', type=str, nargs='+', default=list(INCREMENTS), choices=list(INCREMENTS),
+                        help='event time increments')
+    parser.add_argument('--holds', type=int, default=200000, help='holds timed per point')
+    parser.add_argument('--seed', type=int, default=1, help='seed of the event times')
+    args = parser.parse_args()
+
+    for distribution in args.distributions:
+        for population in args.populations:
+            times = {name : hold_time(name, distribution, population, args.holds, args.seed) for name in EVENT_LISTS}
+            fastest = min(times, key = times.get)
+            print(f"{distribution} | {population:,} events | " + " | ".join(f"{name} : {ns:,.0f} ns" for name, ns in times.items())
+                  + f" | fastest : {fastest}")
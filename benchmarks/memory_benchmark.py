@@ -0,0 +1,61 @@
+import settings
+
+import argparse
+import json
+import logging
+import resource
+import subprocess
+import sys
+
+from benchmarks.common import RUN_SERVER_CONFIG, run_quietly
+from modules.request import Request
+from modules.simulator import Simulator
+
+
+def peak_rss(clients:int, simulation_time:float, seed:int):
+    """Peak resident memory of a simulation run in a fresh interpreter
+
+    Args:
+        clients (int): Number of clients
+        simulation_time (float): Simulated seconds
+        seed (int): Seed of the run
+
+    Returns:
+        dict: Peak RSS in MB and number of requests created
+    """
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.memory_benchmark", "--worker",
+         "--num_clients", str(clients), "--simulation_time", str(simulation_time), "--seed", str(seed)],
+        check = True, capture_output = True, text = True
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Peak RSS against simulated duration')
+    parser.add_argument('--num_clients', type=int, default=12501, help='number of clients')
+    parser.add_argument('--simulation_time', type=float, nargs='+', default=[100, 300, 900], help='simulated seconds per run')
+    parser.add_argument('--seed', type=int, default=1, help='seed of the runs')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='allowed relative RSS growth over the shortest run')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        logging.disable(logging.CRITICAL)   # Measure the engine, not the event log
+        sim = Simulator(clients = args.num_clients, simulation_time = args.simulation_time[0], seed = args.seed, **RUN_SERVER_CONFIG)
+        run_quietly(sim)
+        print(json.dumps({
+            "peak_rss_mb" : resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "requests_created" : Request.counter
+        }))
+        sys.exit(0)
+
+    baseline = None
+    for simulation_time in args.simulation_time:
+        measurement = peak_rss(args.num_clients, simulation_time, args.seed)
+        baseline = baseline or measurement["peak_rss_mb"]
+        print(f"simulation time : {simulation_time} sec | requests created : {measurement['requests_created']} | "
+              f"peak RSS : {measurement['peak_rss_mb']:.1f} MB")
+    growth = measurement["peak_rss_mb"] / baseline - 1
+    print(f"RSS growth over the shortest run : {growth:.1%}")
+    sys.exit(0 if growth <= args.tolerance else 1)
@@ -0,0 +1,94 @@
+import settings
+
+import argparse
+import logging
+import time
+
+from benchmarks.common import RUN_SERVER_CONFIG, run_quietly
+from modules.checkpoint import fork, snapshot
+from modules.numba_event_handler import numba_unsupported_reason
+from modules.simulator import Simulator
+
+
+def events_per_second(engine:str, config:dict, repeats:int = 5):
+    """Best events per second of an engine over repeated runs
+
+    Args:
+        engine (str): Engine of the simulator
+        config (dict): Simulator arguments
+        repeats (int): Number of runs, the fastest one is reported
+
+    Returns:
+        (float, Simulator): Events processed per wall-clock second, last simulator run
+    """
+    best = 0
+    for _ in range(repeats):
+        sim = Simulator(engine = engine, **config)
+        elapsed = run_quietly(sim)
+        best = max(best, sim.events_processed / elapsed)
+    return best, sim
+
+def same_rows(first:dict, second:dict):
+    """Whether two results rows are equal, NaN columns of the first one excepted
+
+    Args:
+        first (dict): Results row
+        second (dict): Results row
+
+    Returns:
+        bool: True if every column matches
+    """
+    return all(first[column] == second[column] or first[column] != first[column] for column in first)
+
+def forked_row(engine:str, config:dict, warmup_time:float, **changes):
+    """Results row of a fork of a simulator warmed up on an engine
+
+    Args:
+        engine (str): Engine of the simulator
+        config (dict): Simulator arguments
+        warmup_time (float): Simulated seconds before the fork
+        **changes: Parameters changed by the fork
+
+    Returns:
+        dict: Results row of the fork, measured from the fork on
+    """
+    sim = Simulator(engine = engine, **config)
+    sim.advance(warmup_time)
+    return fork(snapshot(sim), **changes).run().row
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Numba engine against the array engine')
+    parser.add_argument('--num_clients', type=int, default=12501, help='number of clients')
+    parser.add_argument('--simulation_time', type=float, default=60, help='simulated seconds per run')
+    parser.add_argument('--seed', type=int, default=1, help='seed of the runs')
+    args = parser.parse_args()
+
+    reason = numba_unsupported_reason()
+    if reason is not None:
+        raise SystemExit(f"Numba engine unavailable : {reason}")
+
+    logging.disable(logging.CRITICAL)   # Measure the engine, not the event log
+    config = dict(RUN_SERVER_CONFIG, clients = args.num_clients, simulation_time = args.simulation_time, seed = args.seed)
+
+    # First run compiles the kernel, or loads it from the numba cache, timed apart from the runs
+    start = time.perf_counter()
+    Simulator(engine = "numba", **dict(config, simulation_time = 1)).run()
+    print(f"numba kernel compiled or loaded in {time.perf_counter() - start:.1f} sec")
+
+    rows = {}
+    speeds = {}
+    for engine in ["array", "numba"]:
+        speeds[engine], sim = events_per_second(engine, config)
+        rows[engine] = sim.collect_results()
+        print(f"{engine} engine : {speeds[engine]:,.0f} events/sec | {sim.events_processed:,} events")
+    print(f"numba speedup : {speeds['numba'] / speeds['array']:.1f}x")
+
+    # Same draws in the same order, the kernel reproduces the array engine exactly
+    print(f"numba results match the array engine : {same_rows(rows['array'], rows['numba'])}")
+
+    # Forks changing the timeout leave the pending timeouts of the old duration behind the new ones
+    fork_config = dict(config, simulation_time = 2 * args.simulation_time)
+    for request_timeout in [config["request_timeout"] / 4, config["request_timeout"] * 2]:
+        array_row, numba_row = (forked_row(engine, fork_config, args.simulation_time, request_timeout = request_timeout) for engine in ["array", "numba"])
+        print(f"numba fork with request_timeout = {request_timeout:g} matches the array engine : {same_rows(array_row, numba_row)}")
@@ -0,0 +1,106 @@
+import settings
+
+import argparse
+import logging
+import timeit
+
+import numpy as np
+
+from benchmarks.common import RUN_SERVER_CONFIG, run_quietly
+from modules.simulator import Simulator
+from utils.random_streams import RandomStreams
+
+
+def measure_draws(number:int = 200000):
+    """Cost of a single variate for the legacy scalar calls and the block streams
+
+    Args:
+        number (int): Number of draws timed per method
+
+    Returns:
+        dict: Microseconds per draw for each method
+    """
+    streams = RandomStreams(seed = 1)
+    methods = {
+        "np.random.exponential" : lambda: np.random.exponential(0.1),
+        "np.random.randint" : lambda: np.random.randint(low = 1, high = 10**4),
+        "np.random.normal" : lambda: np.random.normal(0.1),
+        "RandomStream.next (exponential)" : streams.app_service.next,
+        "RandomStream.next (uniform)" : streams.routing.next,
+        "RandomStream.next (normal)" : streams.retry.next
+    }
+    return {name: timeit.timeit(method, number = number) / number * 1e6 for name, method in methods.items()}
+
+class ScalarStream:
+    def __init__(self, draw) -> None:
+        """Stream drawing one scalar from the global numpy state per call, as before block streams
+
+        Args:
+            draw (callable): Function returning a single variate
+        """
+        self.next = draw
+
+
+def use_scalar_streams(sim:Simulator):
+    """Replace the block streams of a simulator with per-call numpy draws
+
+    Args:
+        sim (Simulator): Simulator instance
+    """
+    sim.application_server.service_stream = ScalarStream(np.random.standard_exponential)
+    sim.db_server.service_stream = ScalarStream(np.random.standard_exponential)
+    sim.random_streams.routing = ScalarStream(lambda: np.random.randint(low = 1, high = 10**4) / 10**4)
+    sim.random_streams.priority = ScalarStream(lambda: np.random.randint(low = 1, high = 10**4) / 10**4)
+    sim.random_streams.retry = ScalarStream(np.random.standard_normal)
+
+def measure(scalar:bool, clients:int, simulation_time:float, seed:int, repeats:int = 5):
+    """Best events per second over repeated simulation runs
+
+    Args:
+        scalar (bool): Draw every variate with a scalar numpy call
+        clients (int): Number of clients
+        simulation_time (float): Simulated seconds
+        seed (int): Seed of the runs
+        repeats (int): Number of runs, the fastest one is reported
+
+    Returns:
+        float: Events processed per wall-clock second
+    """
+    return max(measure_once(scalar, clients, simulation_time, seed) for _ in range(repeats))
+
+def measure_once(scalar:bool, clients:int, simulation_time:float, seed:int):
+    """Events per second of one simulation run
+
+    Args:
+        scalar (bool): Draw every variate with a scalar numpy call
+        clients (int): Number of clients
+        simulation_time (float): Simulated seconds
+        seed (int): Seed of the run
+
+    Returns:
+        float: Events processed per wall-clock second
+    """
+    np.random.seed(seed)
+    sim = Simulator(clients = clients, simulation_time = simulation_time, seed = seed, **RUN_SERVER_CONFIG)
+    if scalar:
+        use_scalar_streams(sim)
+
+    return sim.events_processed / run_quietly(sim)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Per-call vs block random variate generation')
+    parser.add_argument('--num_clients', type=int, default=12501, help='number of clients')
+    parser.add_argument('--simulation_time', type=float, default=30, help='simulated seconds per run')
+    parser.add_argument('--seed', type=int, default=1, help='seed of the runs')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)   # Measure the engine, not the event log
+    for name, cost in measure_draws().items():
+        print(f"{name} : {cost:.3f} us/draw")
+
+    per_call = measure(True, args.num_clients, args.simulation_time, args.seed)
+    block = measure(False, args.num_clients, args.simulation_time, args.seed)
+    print(f"per-call draws : {per_call:,.0f} events/sec")
+    print(f"block draws : {block:,.0f} events/sec")
+    print(f"speedup : {block/per_call:.2f}x")
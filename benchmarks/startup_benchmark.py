@@ -0,0 +1,61 @@
+import settings
+
+import argparse
+import json
+import logging
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from benchmarks.common import RUN_SERVER_CONFIG
+from modules.simulator import Simulator
+
+
+def import_time():
+    """Wall-clock time of importing the simulator in a fresh interpreter
+
+    Returns:
+        float: Seconds
+    """
+    output = subprocess.run(
+        [sys.executable, "-c", "import time; start = time.perf_counter(); import modules.simulator; print(time.perf_counter() - start)"],
+        check = True, capture_output = True, text = True
+    ).stdout
+    return float(output.splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Import time, construction cost and memory per simulator instance')
+    parser.add_argument('--num_clients', type=int, nargs='+', default=[100, 1000, 12501], help='clients of the measured instances')
+    parser.add_argument('--instances', type=int, default=1000, help='short simulations run in one process')
+    parser.add_argument('--json', action='store_true', help='print the measurements as json')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    measurements = {"import_sec" : min(import_time() for _ in range(3))}
+
+    # Construction time and memory held by one instance
+    for clients in args.num_clients:
+        tracemalloc.start()
+        start = time.perf_counter()
+        sim = Simulator(clients = clients, simulation_time = 1, seed = 1, **RUN_SERVER_CONFIG)
+        elapsed = time.perf_counter() - start
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        measurements[f"construct_{clients}_ms"] = elapsed * 1000
+        measurements[f"memory_{clients}_kib"] = memory / 1024
+        del sim
+
+    # Many short simulations in one process, no file is written and no handler accumulates
+    start = time.perf_counter()
+    for seed in range(args.instances):
+        Simulator(clients = 50, simulation_time = 5, seed = seed, **RUN_SERVER_CONFIG).run()
+    measurements["simulations_per_sec"] = args.instances / (time.perf_counter() - start)
+    measurements["logger_handlers"] = len(logging.getLogger("EVENT_HANDLER").handlers)
+
+    if args.json:
+        print(json.dumps(measurements))
+    else:
+        for name, value in measurements.items():
+            print(f"{name} : {value:,.2f}")
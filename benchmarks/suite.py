@@ -0,0 +1,270 @@
+import settings
+
+import argparse
+import fnmatch
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from benchmarks.common import RUN_SERVER_CONFIG
+
+
+# Canonical scenarios, the run_server.sh configuration at a few loads, both call modes and both queue lengths
+SUITE_CLIENTS = (1, 5001, 12501)
+SUITE_CALL_MODES = {"sync" : 1, "async" : 0}
+SUITE_QUEUE_LENGTHS = {"small" : 50, "large" : 30000}
+SUITE_SEED = 1
+
+# Metric -> whether larger is better, compared between two entries of the history
+SUITE_METRICS = {
+    "events_per_sec" : True,
+    "wall_per_simulated_sec" : False,
+    "peak_rss_mib" : False
+}
+
+
+def suite_scenarios():
+    """Simulator arguments of every scenario of the suite, without simulation_time
+
+    Returns:
+        dict: Scenario name, e.g. sync_large_12501 -> Simulator arguments
+    """
+    scenarios = {}
+    for mode, synchronous in SUITE_CALL_MODES.items():
+        for size, queue_length in SUITE_QUEUE_LENGTHS.items():
+            for clients in SUITE_CLIENTS:
+                scenarios[f"{mode}_{size}_{clients}"] = dict(
+                    RUN_SERVER_CONFIG,
+                    clients = clients,
+                    db_call_is_synchronous = synchronous,
+                    app_server_queue_length = queue_length,
+                    db_server_queue_length = queue_length,
+                    seed = SUITE_SEED
+                )
+    return scenarios
+
+def peak_rss_mib():
+    """Peak resident set size of the current process
+
+    Returns:
+        float: MiB, None where the resource module is missing
+    """
+    try:
+        import resource
+    except ImportError:     # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10     # Bytes on macOS, KiB elsewhere
+
+def measure_scenario(config:dict, repeats:int):
+    """Speed and memory of a scenario, in a fresh worker process so the peak RSS is its own
+
+    Args:
+        config (dict): Simulator arguments, with simulation_time
+        repeats (int): Runs of the scenario, the fastest one is reported
+
+    Returns:
+        dict: events, events_per_sec, wall_per_simulated_sec, peak_rss_mib, heap_size and pending_events at the end
+    """
+    from modules.numba_event_handler import NumbaEventHandler
+    from modules.simulator import Simulator
+    logging.disable(logging.CRITICAL)   # Measure the engine, not the event log
+
+    best = None
+    for _ in range(repeats):
+        sim = Simulator(**config)
+        result = sim.run()
+        if best is None or result.wall_time < best[0]:
+            best = (result.wall_time, sim)
+    wall_time, sim = best
+    if isinstance(sim.event_handler, NumbaEventHandler):   # Events, arrivals included, and timeouts live in the kernel
+        heap_size, timeouts = sim.event_handler.pending_events()
+        pending_events = heap_size + timeouts
+    else:
+        heap_size = len(sim.event_queue)
+        pending_events = len(sim.event_queue) + len(sim.arrivals) + len(sim.timeouts)
+    return {
+        "events" : sim.events_processed,
+        "events_per_sec" : sim.events_processed / wall_time,
+        "wall_per_simulated_sec" : wall_time / config["simulation_time"],
+        "peak_rss_mib" : peak_rss_mib(),
+        "heap_size" : heap_size,
+        "pending_events" : pending_events
+    }
+
+def git_commit():
+    """Commit of the working tree, and whether it has uncommitted changes
+
+    Returns:
+        (str, bool): Commit hash, None outside a git repository, and the dirty flag
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd = settings.BASE, check = True, capture_output = True, text = True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd = settings.BASE, check = True,
+                                capture_output = True, text = True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+    return commit, bool(status.strip())
+
+def run_suite(simulation_time:float = 60, repeats:int = 3, pattern:str = "*", engine:str = settings.DEFAULT_ENGINE,
+              event_list:str = settings.DEFAULT_EVENT_LIST, verbose:bool = True):
+    """Run the scenarios of the suite, each in its own worker process
+
+    Args:
+        simulation_time (float): Simulated seconds per run
+        repeats (int): Runs per scenario, the fastest one is reported
+        pattern (str): Shell pattern of the scenario names run
+        engine (str): Engine of the simulator
+        event_list (str): Future event list of the simulator
+        verbose (bool): Print every scenario once measured
+
+    Returns:
+        dict: History entry, commit, configuration and metrics of every scenario
+    """
+    if engine == "numba" and event_list != "heap":  # The kernel keeps its own heap, the entry would be mislabelled
+        raise ValueError(f"The numba engine keeps its own heap, cannot benchmark it with the {event_list} event list")
+    commit, dirty = git_commit()
+    entry = {
+        "commit" : commit,
+        "dirty" : dirty,
+        "timestamp" : time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python" : platform.python_version(),
+        "machine" : platform.machine(),
+        "engine" : engine,
+        "event_list" : event_list,
+        "simulation_time" : simulation_time,
+        "repeats" : repeats,
+        "scenarios" : {}
+    }
+    for name, config in suite_scenarios().items():
+        if not fnmatch.fnmatch(name, pattern):
+            continue
+        config = dict(config, simulation_time = simulation_time, engine = engine, event_list = event_list)
+        with ProcessPoolExecutor(max_workers = 1, mp_context = get_context("spawn")) as executor:
+            metrics = executor.submit(measure_scenario, config, repeats).result()
+        entry["scenarios"][name] = metrics
+        if verbose:
+            rss = f"{metrics['peak_rss_mib']:.0f} MiB" if metrics["peak_rss_mib"] is not None else "n/a"
+            print(f"{name} : {metrics['events_per_sec']:,.0f} events/sec | {metrics['wall_per_simulated_sec'] * 1000:.1f} ms per simulated sec | "
+                  f"peak RSS {rss} | heap {metrics['heap_size']:,} of {metrics['pending_events']:,} pending events")
+    return entry
+
+def load_history(path:str = settings.BENCHMARK_HISTORY_PATH):
+    """Entries of the benchmark history, oldest first
+
+    Args:
+        path (str): Path of the json history
+
+    Returns:
+        list: History entries, empty if the file does not exist
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path) as file:
+        return json.load(file)
+
+def append_history(entry:dict, path:str = settings.BENCHMARK_HISTORY_PATH):
+    """Append an entry to the benchmark history
+
+    Args:
+        entry (dict): Output of run_suite
+        path (str): Path of the json history
+    """
+    history = load_history(path)
+    history.append(entry)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok = True)
+    with open(path, "w") as file:
+        json.dump(history, file, indent = 1)
+
+def find_entry(history:list, commit:str):
+    """Latest entry of a commit
+
+    Args:
+        history (list): History entries, oldest first
+        commit (str): Commit hash or prefix of it
+
+    Returns:
+        dict: Latest entry whose commit starts with the given one
+    """
+    for entry in reversed(history):
+        if entry["commit"] and entry["commit"].startswith(commit):
+            return entry
+    raise ValueError(f"No benchmark of commit {commit} in the history")
+
+def compare_entries(base:dict, new:dict, threshold:float = 0.05):
+    """Relative change of every metric of the scenarios both entries measured
+
+    Args:
+        base (dict): Reference entry
+        new (dict): Entry compared against it
+        threshold (float): Relative worsening flagged as a regression, e.g. 0.05 for 5%
+
+    Returns:
+        list: (scenario, metric, base value, new value, relative change, regressed) rows
+    """
+    rows = []
+    for name in base["scenarios"]:
+        if name not in new["scenarios"]:
+            continue
+        for metric, larger_is_better in SUITE_METRICS.items():
+            before, after = base["scenarios"][name][metric], new["scenarios"][name][metric]
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            worsening = -change if larger_is_better else change
+            rows.append((name, metric, before, after, change, worsening > threshold))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark suite of the simulator, with a json history to track regressions')
+    parser.add_argument('--history', type=str, default=settings.BENCHMARK_HISTORY_PATH, help='path of the json history')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='run the scenarios and append the results to the history')
+    run.add_argument('--simulation_time', type=float, default=60, help='simulated seconds per run')
+    run.add_argument('--repeats', type=int, default=3, help='runs per scenario, the fastest one is kept')
+    run.add_argument('--scenarios', type=str, default='*', help='shell pattern of the scenario names, e.g. "sync_*_12501"')
+    run.add_argument('--engine', type=str, default=settings.DEFAULT_ENGINE, help='engine of the simulator')
+    run.add_argument('--event_list', type=str, default=settings.DEFAULT_EVENT_LIST, help='future event list of the simulator')
+    run.add_argument('--no_save', action='store_true', help='do not append the results to the history')
+
+    compare = commands.add_parser('compare', help='flag regressions between two commits of the history')
+    compare.add_argument('base', type=str, nargs='?', default=None, help='reference commit, the entry before the new one by default')
+    compare.add_argument('new', type=str, nargs='?', default=None, help='compared commit, the latest entry by default')
+    compare.add_argument('--threshold', type=float, default=0.05, help='relative worsening flagged as a regression')
+
+    commands.add_parser('list', help='list the entries of the history')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        entry = run_suite(args.simulation_time, args.repeats, args.scenarios, args.engine, args.event_list)
+        if not args.no_save:
+            append_history(entry, args.history)
+            print(f"saved to {args.history} as {entry['commit'] or 'no commit'}{' (dirty)' if entry['dirty'] else ''}")
+
+    elif args.command == 'list':
+        for entry in load_history(args.history):
+            print(f"{entry['timestamp']} | {(entry['commit'] or 'no commit')[:10]}{'+' if entry['dirty'] else ''} | {entry['engine']} "
+                  f"{entry['event_list']} | {entry['simulation_time']} sec x {entry['repeats']} | {len(entry['scenarios'])} scenarios")
+
+    else:
+        history = load_history(args.history)
+        if len(history) < 2 and (args.base is None or args.new is None):
+            raise SystemExit("Need two entries in the history to compare")
+        new = find_entry(history, args.new) if args.new else history[-1]
+        base = find_entry(history, args.base) if args.base else history[history.index(new) - 1]
+        if (base["engine"], base["event_list"], base["simulation_time"]) != (new["engine"], new["event_list"], new["simulation_time"]):
+            print("warning : the entries differ in engine, event list or simulation time")
+        rows = compare_entries(base, new, args.threshold)
+        for name, metric, before, after, change, regressed in rows:
+            print(f"{name} | {metric} : {before:,.6g} -> {after:,.6g} ({change:+.1%}){' REGRESSION' if regressed else ''}")
+        regressions = sum(regressed for *_, regressed in rows)
+        print(f"{regressions} regressions beyond {args.threshold:.0%} between {(base['commit'] or '?')[:10]} and {(new['commit'] or '?')[:10]}")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,24 @@
+import settings
+
+import argparse
+import logging
+
+from benchmarks.common import RUN_SERVER_CONFIG, run_quietly
+from modules.simulator import Simulator
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Event queue size and speed with timeouts and in-order arrivals kept outside the heap')
+    parser.add_argument('--num_clients', type=int, nargs='+', default=[1001, 5001, 12501], help='number of clients')
+    parser.add_argument('--simulation_time', type=float, default=60, help='simulated seconds per run')
+    parser.add_argument('--request_timeout', type=float, default=20, help='request timeout time')
+    parser.add_argument('--seed', type=int, default=1, help='seed of the runs')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)   # Measure the engine, not the event log
+    config = dict(RUN_SERVER_CONFIG, request_timeout = args.request_timeout)
+    for clients in args.num_clients:
+        sim = Simulator(clients = clients, simulation_time = args.simulation_time, seed = args.seed, **config)
+        elapsed = run_quietly(sim)
+        print(f"num clients : {clients} | heap size : {len(sim.event_queue)} | arrival fifo : {len(sim.arrivals)} | "
+              f"pending timeouts : {len(sim.timeouts)} | {sim.events_processed/elapsed:,.0f} events/sec")
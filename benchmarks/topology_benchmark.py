@@ -0,0 +1,71 @@
+import settings
+
+import argparse
+import logging
+
+from benchmarks.common import RUN_SERVER_CONFIG, run_quietly
+from modules.simulator import Simulator
+from modules.topology import Topology, two_tier_topology
+from modules.topology_simulator import TopologySimulator
+
+
+def events_per_second(make_simulator, repeats:int = 5):
+    """Best events per second of a simulator over repeated runs
+
+    Args:
+        make_simulator (callable): Builds a fresh simulator
+        repeats (int): Number of runs, the fastest one is reported
+
+    Returns:
+        (float, Simulator): Events processed per wall-clock second, last simulator run
+    """
+    best = 0
+    for _ in range(repeats):
+        sim = make_simulator()
+        elapsed = run_quietly(sim)
+        best = max(best, sim.events_processed / elapsed)
+    return best, sim
+
+def chain_topology(tiers:int):
+    """Chain of tiers, each calling the next synchronously, to show the event cost does not grow with depth
+
+    Args:
+        tiers (int): Number of tiers
+
+    Returns:
+        Topology: Chain topology
+    """
+    return Topology({
+        "tiers" : {f"tier_{tier}" : {"cores" : 20, "service_time" : 0.05} for tier in range(tiers)},
+        "calls" : [{"from" : f"tier_{tier}", "to" : f"tier_{tier + 1}", "probability" : 0.5, "synchronous" : True} for tier in range(tiers - 1)]
+    })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Topology engine against the two-tier engines')
+    parser.add_argument('--num_clients', type=int, default=12501, help='number of clients')
+    parser.add_argument('--simulation_time', type=float, default=60, help='simulated seconds per run')
+    parser.add_argument('--seed', type=int, default=1, help='seed of the runs')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)   # Measure the engine, not the event log
+    config = dict(RUN_SERVER_CONFIG, clients = args.num_clients, simulation_time = args.simulation_time, seed = args.seed)
+    runs = {
+        "object" : lambda: Simulator(engine = "object", **config),
+        "array" : lambda: Simulator(engine = "array", **config),
+        "topology" : lambda: TopologySimulator(topology = two_tier_topology(**config), **config)
+    }
+    rows = {}
+    for name, make_simulator in runs.items():
+        speed, sim = events_per_second(make_simulator)
+        rows[name] = sim.collect_results()
+        print(f"{name} engine : {speed:,.0f} events/sec | {sim.events_processed:,} events")
+
+    # Same draws in the same order, the topology engine reproduces the array engine exactly
+    columns = ["system_throughput", "system_average_response_time", "requests_timed_out", "db_server_throughput"]
+    same = all(abs(rows["array"][column] - rows["topology"][column]) <= 1e-9 * max(1, abs(rows["array"][column])) for column in columns)
+    print(f"topology results match the array engine : {same}")
+
+    for tiers in [2, 4, 8]:
+        speed, sim = events_per_second(lambda: TopologySimulator(topology = chain_topology(tiers), **config), repeats = 3)
+        print(f"chain of {tiers} tiers : {speed:,.0f} events/sec")
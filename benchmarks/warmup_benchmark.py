@@ -0,0 +1,54 @@
+import settings
+
+import argparse
+import logging
+import numpy as np
+
+from benchmarks.common import RUN_SERVER_CONFIG, run_quietly
+from modules.simulator import Simulator
+
+
+def run(clients:int, simulation_time:float, seed:int, **argv):
+    """Run one simulation with output analysis
+
+    Args:
+        clients (int): Number of clients
+        simulation_time (float): Simulated seconds
+        seed (int): Seed of the run
+
+    Returns:
+        (Simulator, dict): Simulator and its results row
+    """
+    sim = Simulator(clients = clients, simulation_time = simulation_time, seed = seed, **RUN_SERVER_CONFIG, **argv)
+    run_quietly(sim)
+    return sim, sim.collect_results()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Fixed horizon against warm-up truncation with a batch-means precision stop')
+    parser.add_argument('--num_clients', type=int, default=3001, help='number of clients')
+    parser.add_argument('--simulation_time', type=float, default=300, help='fixed horizon in simulated seconds')
+    parser.add_argument('--reference_time', type=float, default=3000, help='simulated seconds of the reference run')
+    parser.add_argument('--target_precision', type=float, default=0.03, help='relative half-width stopping the truncated runs')
+    parser.add_argument('--seeds', type=int, default=5, help='number of seeds compared')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    # Long truncated run as the steady-state reference
+    _, reference = run(args.num_clients, args.reference_time, seed = 0, detect_warmup = True)
+    truth = reference["system_response_time_batch_mean"]
+    print(f"reference response time : {truth:.4f} sec (warm-up {reference['warmup_time']:.1f} sec)")
+
+    for name, argv in (
+        ("fixed horizon", dict(target_precision = 0.0)),    # Batch means from time 0, never precise enough to stop
+        ("warm-up + precision", dict(detect_warmup = True, target_precision = args.target_precision))
+    ):
+        errors, simulated, events = [], [], []
+        for seed in range(1, args.seeds + 1):
+            sim, results = run(args.num_clients, args.simulation_time, seed, **argv)
+            errors.append(results["system_response_time_batch_mean"] - truth)
+            simulated.append(sim.end_time)
+            events.append(sim.events_processed)
+        print(f"{name} | bias : {np.mean(errors):+.4f} sec | rmse : {np.sqrt(np.mean(np.square(errors))):.4f} sec | "
+              f"simulated : {np.mean(simulated):.0f} sec | events : {np.mean(events):,.0f}")
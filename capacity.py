@@ -0,0 +1,56 @@
+import settings
+
+import argparse
+import time
+
+from modules.capacity import CAPACITY_METRICS, CAPACITY_PARAMETERS, search_capacity
+from sweep import parse_assignments, parse_value
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Search the capacity of the web server meeting a target, instead of sweeping a grid')
+    parser.add_argument('--parameter', type=str, default='clients', choices=list(CAPACITY_PARAMETERS),
+                        help='largest clients, or smallest app or db server count, meeting the target')
+    parser.add_argument('--low', type=int, required=True, help='smallest value of the parameter searched')
+    parser.add_argument('--high', type=int, required=True, help='largest value of the parameter searched')
+    parser.add_argument('--resolution', type=int, default=1, help='width of the final bracket, and step of the equivalent grid sweep')
+    parser.add_argument('--metric', type=str, required=True,
+                        help=f'metric bounded by the target, one of {", ".join(CAPACITY_METRICS)} or a results column')
+    parser.add_argument('--target', type=float, required=True, help='upper bound on the metric')
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE',
+                        help='Simulator argument of every point, repeatable')
+    parser.add_argument('--points', type=int, default=None, help='points simulated in parallel per round')
+    parser.add_argument('--min_replications', type=int, default=3, help='replications of every point')
+    parser.add_argument('--max_replications', type=int, default=10, help='replications of a point whose interval contains the target')
+    parser.add_argument('--confidence', type=float, default=0.95, help='confidence level of the intervals')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes, one per CPU by default')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the search, drawn from the OS when omitted')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    search = search_capacity(
+        config = parse_assignments(args.set, parse_value),
+        parameter = args.parameter,
+        low = args.low,
+        high = args.high,
+        metric = args.metric,
+        target = args.target,
+        resolution = args.resolution,
+        points = args.points,
+        min_replications = args.min_replications,
+        max_replications = args.max_replications,
+        confidence = args.confidence,
+        workers = args.workers,
+        seed = args.seed
+    )
+    for value, point in search["points"].items():
+        print(f"{args.parameter} = {value} : {args.metric} {point['mean']:.4f} +/- {point['half_width']:.4f} "
+              f"({point['replications']} replications) {'meets' if point['meets'] else 'misses'} the target")
+    kind = "largest" if CAPACITY_PARAMETERS[args.parameter] else "smallest"
+    print(f"\n{kind} {args.parameter} meeting {args.metric} <= {args.target} : {search['value']} (bracket {search['bracket']})")
+    summary = f"{len(search['points'])} points in {search['rounds']} rounds, {search['events']:,} events in {time.perf_counter() - start:.1f} sec"
+    # No grid estimate when the search did not simulate any point, e.g. --low equal to --high
+    if search['grid_events']:
+        summary += (f", against about {search['grid_events']:,.0f} events for the {search['grid_points']} point grid sweep "
+                    f"({search['events'] / search['grid_events']:.1%})")
+    print(summary)
@@ -3,7 +3,11 @@ import settings
 import sys
 import argparse
 
+from modules.event_list import EVENT_LISTS
 from modules.simulator import Simulator
+from modules.replication import run_paired_replications, run_replications
+from modules.analytic import ANALYTIC_METHODS, AnalyticModel
+from sweep import parse_assignments, parse_value
 
 
 if __name__ == "__main__":
@@ -23,8 +27,56 @@ if __name__ == "__main__":
     parser.add_argument('--retry_delay', type=float, required=True, help='delay time after request timeout')
     parser.add_argument('--request_timeout', type=float, required=True, help='request timeout time')
     parser.add_argument('--db_call_is_synchronous', type=int, required=True, help='boolean flag to run the simulation with synchronous db calls')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the random streams, drawn from the OS when omitted')
+    parser.add_argument('--common_random_numbers', action='store_true', 
+                        help='give every client its own random streams, so runs with the same seed see the same workload')
+    parser.add_argument('--engine', type=str, default=settings.DEFAULT_ENGINE, choices=['object', 'array', 'numba'], 
+                        help='representation of events and requests in the simulation engine')
+    parser.add_argument('--event_list', type=str, default=settings.DEFAULT_EVENT_LIST, choices=list(EVENT_LISTS), 
+                        help='future event list, binary heap, calendar queue or ladder queue')
+    parser.add_argument('--trace_mode', type=str, default=settings.TRACE_MODE, choices=['off', 'sampled', 'full'], 
+                        help='binary event trace, off, sampled (1 in trace_sample_every requests) or full')
+    parser.add_argument('--trace_sample_every', type=int, default=settings.TRACE_SAMPLE_EVERY, help='sampling period of the sampled trace')
+    parser.add_argument('--trace_path', type=str, default=None, help='path of the .npy trace file, inside the log directory by default')
+    parser.add_argument('--time_series_interval', type=float, default=settings.TIME_SERIES_INTERVAL, 
+                        help='record throughput, drops, timeouts, occupancy and utilization every this many simulated seconds')
+    parser.add_argument('--time_series_path', type=str, default=None, 
+                        help='path of the time series, .npy or .parquet (requires pyarrow), inside the log directory by default')
+    parser.add_argument('--checkpoint_every', type=float, default=None, 
+                        help='checkpoint the simulator every this many simulated seconds, resume with python -m modules.checkpoint')
+    parser.add_argument('--checkpoint_path', type=str, default=None, help='path of the checkpoint, inside the log directory by default')
+    parser.add_argument('--instrument', action='store_true', 
+                        help='count and time the events of every type, the event list high-water mark and the queue depths')
+    parser.add_argument('--instrument_path', type=str, default=None, 
+                        help='write the instrumentation as a pstats profile, readable by pstats.Stats or snakeviz')
+    parser.add_argument('--snapshot_interval', type=float, default=None, 
+                        help='print the throughput, response time and utilization every this many simulated seconds')
+    parser.add_argument('--stop_when_saturated', action='store_true', 
+                        help='stop the run once the snapshots show a saturated server or drops several times in a row')
+    parser.add_argument('--detect_warmup', action='store_true', 
+                        help='detect the end of the warm-up online (MSER-5) and reset the statistics there')
+    parser.add_argument('--target_precision', type=float, default=None, 
+                        help='stop the run once the batch-means half-width of the response time is within this fraction of its mean')
+    parser.add_argument('--analytic', action='store_true', 
+                        help='solve the model with Mean Value Analysis instead of simulating it, written to RT_<timeout>_analytic.csv')
+    parser.add_argument('--analytic_method', type=str, default='exact', choices=ANALYTIC_METHODS, 
+                        help='exact multi-server or Seidmann approximate Mean Value Analysis')
+    parser.add_argument('--replications', type=int, default=None, 
+                        help='run up to this many independent replications in parallel and report confidence intervals')
+    parser.add_argument('--compare', action='append', default=[], metavar='NAME=VALUE', 
+                        help='Simulator argument changed in an alternative configuration, compared on paired replications '
+                             'with common random numbers, repeatable')
+    parser.add_argument('--min_replications', type=int, default=3, help='replications run before checking the precision')
+    parser.add_argument('--relative_precision', type=float, default=None, 
+                        help='stop launching replications once every confidence half-width is within this fraction of its mean')
+    parser.add_argument('--confidence', type=float, default=0.95, help='confidence level of the intervals')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes, one per CPU by default')
     args = parser.parse_args()
-    sim = Simulator(
+    if args.stop_when_saturated and args.snapshot_interval is None:
+        parser.error("--stop_when_saturated requires --snapshot_interval")
+    if args.snapshot_interval is not None and (args.checkpoint_every or args.target_precision is not None):
+        parser.error("--snapshot_interval cannot be combined with --checkpoint_every or --target_precision")
+    config = dict(
         application_server_count = args.app_servers,
         db_server_count = args.db_servers,
         application_service_time = args.app_server_service_time,
@@ -38,7 +90,23 @@ if __name__ == "__main__":
         db_server_queue_length = args.db_server_queue_length,
         retry_delay = args.retry_delay,
         request_timeout = args.request_timeout,
-        db_call_is_synchronous = args.db_call_is_synchronous
+        db_call_is_synchronous = args.db_call_is_synchronous,
+        seed = args.seed,
+        common_random_numbers = args.common_random_numbers,
+        engine = args.engine,
+        event_list = args.event_list,
+        trace_mode = args.trace_mode,
+        trace_sample_every = args.trace_sample_every,
+        trace_path = args.trace_path,
+        time_series_interval = args.time_series_interval,
+        time_series_path = args.time_series_path,
+        checkpoint_every = args.checkpoint_every,
+        checkpoint_path = args.checkpoint_path,
+        instrument = args.instrument or args.instrument_path is not None,
+        detect_warmup = args.detect_warmup,
+        target_precision = args.target_precision,
+        confidence = args.confidence,
+        log_to_file = True
     )
 
     # sim = Simulator(
@@ -57,4 +125,47 @@ if __name__ == "__main__":
     #     request_timeout = 20,
     #     db_call_is_synchronous = 1
     # )
-    sim.run()
\ No newline at end of file
+    if args.analytic:
+        AnalyticModel(analytic_method = args.analytic_method, **config).run(write_results = True, verbose = True)
+    elif args.replications is None:
+        sim = Simulator(**config)
+        if args.snapshot_interval is not None:
+            for snapshot in sim.snapshots(args.snapshot_interval, stop_when_saturated = args.stop_when_saturated):
+                print(snapshot.summary())
+            result = sim.finish(write_results = True, verbose = True)
+        else:
+            result = sim.run(write_results = True, verbose = True)
+        if args.instrument_path is not None:
+            result.instrumentation.dump_stats(args.instrument_path)
+    elif args.compare:
+        comparison = run_paired_replications(
+            config = dict(config, trace_mode = "off", time_series_interval = None, checkpoint_every = None, instrument = False, log_to_file = False),
+            alternative = parse_assignments(args.compare, parse_value),
+            replications = args.replications,
+            confidence = args.confidence,
+            workers = args.workers,
+            seed = args.seed
+        )
+        print(f"\n-- {' '.join(args.compare)} - BASELINE, {comparison['replications']} PAIRED REPLICATIONS, "
+              f"{args.confidence:.0%} CONFIDENCE INTERVALS --")
+        for name, metric in comparison["difference"].items():
+            print(f"{name} : {comparison['baseline'][name]['mean']:.4f} -> {comparison['alternative'][name]['mean']:.4f}, "
+                  f"difference {metric['mean']:+.4f} +/- {metric['half_width']:.4f}")
+    else:
+        replications = run_replications(
+            config = dict(config, trace_mode = "off", time_series_interval = None, checkpoint_every = None, instrument = False, log_to_file = False),   # Replications would share one file
+            max_replications = args.replications,
+            min_replications = args.min_replications,
+            relative_precision = args.relative_precision,
+            confidence = args.confidence,
+            workers = args.workers,
+            seed = args.seed
+        )
+        print(f"\n-- {replications['replications']} REPLICATIONS, {args.confidence:.0%} CONFIDENCE INTERVALS --")
+        for name, metric in replications["summary"].items():
+            print(f"{name} : {metric['mean']:.4f} +/- {metric['half_width']:.4f} ({metric['relative_half_width']:.2%})")
+        percentiles = replications["percentiles"]
+        print(f"pooled system p95 / p99 response time : {percentiles['system_p95_response_time']:.4f} / "
+              f"{percentiles['system_p99_response_time']:.4f}")
+        if args.relative_precision is not None and not replications["precise"]:
+            print(f"relative precision {args.relative_precision} not reached within {args.replications} replications")
\ No newline at end of file
@@ -0,0 +1,194 @@
+import settings
+
+import numpy as np
+
+from modules.simulator import save_results
+
+
+ANALYTIC_METHODS = ("exact", "seidmann")
+
+
+def exact_mva(think_time:float, demands:list, core_counts:list, max_clients:int):
+    """Exact Mean Value Analysis of multi-server stations and a think time, for every population
+
+    The probability of an idle station is updated with the throughput of the network without
+    that station, p(0|n) = p(0|n-1) X(n) / X'(n), instead of by complementing the other
+    probabilities, which is unstable near saturation.
+
+    Args:
+        think_time (float): Think time of the clients, positive
+        demands (list): Service demand of every station, visits times service time
+        core_counts (list): Cores of every station
+        max_clients (int): Largest population
+
+    Returns:
+        (np.ndarray, np.ndarray): Throughput for 1 .. max_clients clients, and the residence time
+                                  of every station (one row per station)
+    """
+    solved = {}
+
+    def solve(stations:tuple):
+        if stations in solved:
+            return solved[stations]
+        populations = np.arange(1, max_clients + 1)
+        if not stations:
+            solved[stations] = (populations / think_time, np.empty((0, max_clients)))
+            return solved[stations]
+
+        without = [solve(tuple(other for other in stations if other != station))[0] for station in stations]
+        throughput = np.empty(max_clients)
+        residences = np.empty((len(stations), max_clients))
+        queue_lengths = np.zeros(len(stations))
+        marginals = [np.eye(1, core_counts[station]).ravel() for station in stations]   # All cores idle without clients
+        for index in range(max_clients):
+            for position, station in enumerate(stations):
+                core_count = core_counts[station]
+                idle = np.arange(core_count - 1, 0, -1)   # Idle cores when 0 .. core_count - 2 are busy
+                residences[position, index] = demands[station] / core_count * (1 + queue_lengths[position] + idle @ marginals[position][:-1])
+            throughput[index] = (index + 1) / (think_time + residences[:, index].sum())
+            for position, station in enumerate(stations):
+                queue_lengths[position] = throughput[index] * residences[position, index]
+                previous = marginals[position]
+                updated = np.empty_like(previous)
+                updated[1:] = demands[station] * throughput[index] / np.arange(1, core_counts[station]) * previous[:-1]
+                updated[0] = previous[0] * throughput[index] / without[position][index]
+                marginals[position] = updated
+        solved[stations] = (throughput, residences)
+        return solved[stations]
+
+    return solve(tuple(range(len(demands))))
+
+
+class AnalyticModel:
+    def __init__(self, **argv) -> None:
+        """Mean Value Analysis of the closed tandem queue, same arguments as Simulator
+
+        Every request visits the app server, then goes to the db server with probability
+        app_to_db_prob and back to the app server, so the app server is visited 1 / (1 - p) times
+        and the db server p / (1 - p) times. Service times are exponential and queues unbounded,
+        timeouts, drops and priorities are not modelled.
+
+        Asynchronous calls form a product-form network, solved exactly or with the Seidmann
+        approximation (c cores of service S as one core of service S/c and a delay of S(c-1)/c).
+        Synchronous calls hold an app core through the db call, which is not product form: the
+        db residence time of the previous population is added to the app service time, with
+        Seidmann stations whatever the method.
+
+        Args:
+            analytic_method (str): "exact" multi-server MVA (default) or "seidmann" approximation
+        """
+        self.argv = argv
+        self.num_clients = argv['clients']
+        self.think_time = argv['think_time']
+        self.app_core_count = argv['application_server_count']
+        self.db_core_count = argv['db_server_count']
+        self.app_service_time = argv['application_service_time']
+        self.db_service_time = argv['db_service_time']
+        self.app_to_db_prob = argv['app_to_db_prob']
+        self.db_call_is_synchronous = bool(argv['db_call_is_synchronous'])
+        self.request_timeout = argv['request_timeout']
+        self.method = argv.get('analytic_method', "exact")
+        if self.method not in ANALYTIC_METHODS:
+            raise ValueError(f"Unknown analytic method {self.method}, expected one of {', '.join(ANALYTIC_METHODS)}")
+        if not 0 <= self.app_to_db_prob < 1 or self.think_time <= 0:
+            raise ValueError("Mean Value Analysis needs app_to_db_prob in [0, 1) and a positive think time")
+
+    def solve_seidmann(self, max_clients:int, app_visits:float, db_visits:float):
+        """Seidmann approximation, with the app core held through synchronous db calls
+
+        Args:
+            max_clients (int): Largest population
+            app_visits (float): Visits to the app server per request
+            db_visits (float): Visits to the db server per request
+
+        Returns:
+            (np.ndarray, np.ndarray, np.ndarray, np.ndarray): Throughput, app and db residence times, and app demand
+        """
+        throughput, app_residence, db_residence, app_demand = (np.empty(max_clients) for _ in range(4))
+        db_demand = db_visits * self.db_service_time
+        app_queue = db_queue = 0.0
+        held_db_time = 0.0  # Db residence per app visit, of the previous population
+        for index in range(max_clients):
+            app_demand[index] = app_visits * (self.app_service_time + held_db_time)
+            app_queueing = app_demand[index] / self.app_core_count * (1 + app_queue)
+            db_queueing = db_demand / self.db_core_count * (1 + db_queue)
+            app_residence[index] = app_queueing + app_demand[index] * (self.app_core_count - 1) / self.app_core_count
+            db_residence[index] = db_queueing + db_demand * (self.db_core_count - 1) / self.db_core_count
+
+            total = app_residence[index] if self.db_call_is_synchronous else app_residence[index] + db_residence[index]
+            throughput[index] = (index + 1) / (self.think_time + total)
+            app_queue = throughput[index] * app_queueing
+            db_queue = throughput[index] * db_queueing
+            if self.db_call_is_synchronous:
+                held_db_time = db_residence[index] / app_visits
+        return throughput, app_residence, db_residence, app_demand
+
+    def solve(self, max_clients:int = None):
+        """Results of every population from 1 to max_clients clients
+
+        Args:
+            max_clients (int): Largest population, the number of clients by default
+
+        Returns:
+            pd.DataFrame: One results row per population, with the Simulator columns that apply
+        """
+        import pandas as pd
+
+        max_clients = max_clients or self.num_clients
+        app_visits = 1 / (1 - self.app_to_db_prob)
+        db_visits = self.app_to_db_prob / (1 - self.app_to_db_prob)
+        db_demand = db_visits * self.db_service_time
+
+        if self.method == "exact" and not self.db_call_is_synchronous:
+            app_demand = app_visits * self.app_service_time
+            throughput, (app_residence, db_residence) = exact_mva(
+                self.think_time, [app_demand, db_demand], [self.app_core_count, self.db_core_count], max_clients
+            )
+        else:
+            throughput, app_residence, db_residence, app_demand = self.solve_seidmann(max_clients, app_visits, db_visits)
+
+        response_time = app_residence if self.db_call_is_synchronous else app_residence + db_residence
+        return pd.DataFrame({
+            "num_clients" : np.arange(1, max_clients + 1),
+            "app_servers" : self.app_core_count,
+            "db_servers" : self.db_core_count,
+            "app_server_service_time" : self.app_service_time,
+            "db_server_service_time" : self.db_service_time,
+            "app_to_db_server_probability" : self.app_to_db_prob,
+            "priority_probability" : self.argv['priority_prob'],
+            "app_server_queue_length" : self.argv['app_server_queue_length'],
+            "db_server_queue_length" : self.argv['db_server_queue_length'],
+            "db_call_is_synchronous" : self.db_call_is_synchronous,
+
+            "system_throughput" : throughput,
+            "app_server_throughput" : throughput * app_visits,
+            "db_server_throughput" : throughput * db_visits,
+
+            "system_average_response_time" : response_time,
+
+            "number_in_system" : throughput * response_time,
+            "number_in_app_server" : throughput * app_residence,
+            "number_in_db_app_server" : throughput * db_residence,
+
+            "app_server_utilization" : throughput * app_demand / self.app_core_count,
+            "db_server_utlization" : throughput * db_demand / self.db_core_count
+        })
+
+    def run(self, write_results:bool = False, verbose:bool = False):
+        """Results of the configured number of clients
+
+        Args:
+            write_results (bool): Append the results row to RT_<request_timeout>_analytic.csv
+            verbose (bool): Print the results
+
+        Returns:
+            dict: Results row, column name -> value
+        """
+        results = self.solve().iloc[-1].to_dict()
+        if write_results:
+            save_results([results], self.request_timeout, kind = "analytic")
+        if verbose:
+            print(f"\n-- MEAN VALUE ANALYSIS ({self.method}) --")
+            for name, value in results.items():
+                print(f"{name.replace('_', ' ')} : {value}")
+        return results
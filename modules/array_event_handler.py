@@ -0,0 +1,429 @@
+import settings
+
+from array import array
+
+from modules.event_handler import EventHandler
+from modules.server import Server
+from utils.probability_gen import get_probablity, get_retry_delay
+
+
+class ArrayEventHandler(EventHandler):
+    def __init__(self, **kwargs) -> None:
+        """Event handler on a compact representation of events and requests
+
+        Events are plain (time, seq, type, slot) tuples, so the event queue compares them in C.
+        Requests live in struct-of-arrays columns indexed by a slot, and slots of finished
+        requests are reused. Takes the same arguments as EventHandler.
+        """
+        super().__init__(**kwargs)
+        self.seq = 0    # Tie breaker of events scheduled at the same time
+
+        # Request columns, indexed by slot
+        self.request_id = array('q')
+        self.client_id = array('l')
+        self.request_priority = array('b')
+        self.arrival_time = array('d')
+        self.is_timed_out = array('b')
+        self.state = array('b')
+        self.tier = array('b')  # Tier whose waiting queue holds the request
+        self.holds_app_core = array('b')    # App server core held for a synchronous db call
+        self.timeout_entry = []
+        self.free_slots = []
+        self.request_counter = 0
+
+    def acquire_slot(self, client_id:int, request_priority:int, arrival_time:float, is_timed_out:bool):
+        """Allocate the columns of a new request
+
+        Args:
+            client_id (int): Client sending the request
+            request_priority (int): Priority of the request
+            arrival_time (float): Arrival time of the request
+            is_timed_out (bool): Whether the request retries a timed out one
+
+        Returns:
+            int: Slot of the request
+        """
+        request_id = self.request_counter
+        self.request_counter += 1
+        if self.free_slots:
+            slot = self.free_slots.pop()
+            self.request_id[slot] = request_id
+            self.client_id[slot] = client_id
+            self.request_priority[slot] = request_priority
+            self.arrival_time[slot] = arrival_time
+            self.is_timed_out[slot] = is_timed_out
+            self.state[slot] = settings.REQUEST_IN_SERVICE
+            self.tier[slot] = settings.NO_TIER
+            self.holds_app_core[slot] = False
+            self.timeout_entry[slot] = None
+        else:
+            slot = len(self.state)
+            self.request_id.append(request_id)
+            self.client_id.append(client_id)
+            self.request_priority.append(request_priority)
+            self.arrival_time.append(arrival_time)
+            self.is_timed_out.append(is_timed_out)
+            self.state.append(settings.REQUEST_IN_SERVICE)
+            self.tier.append(settings.NO_TIER)
+            self.holds_app_core.append(False)
+            self.timeout_entry.append(None)
+        return slot
+
+    def release_slot(self, slot:int):
+        """Free the slot of a request nothing refers to anymore
+
+        Args:
+            slot (int): Slot of the request
+        """
+        self.timeout_entry[slot] = None
+        self.free_slots.append(slot)
+
+    def in_flight(self):
+        """Number of requests currently holding a slot
+
+        Returns:
+            int: Requests in flight
+        """
+        return len(self.state) - len(self.free_slots)
+
+    def schedule(self, event_type:int, slot:int, time:float):
+        """Push an event in the event queue
+
+        Args:
+            event_type (int): Type of the event
+            slot (int): Slot of the request
+            time (float): Execution time of the event
+        """
+        self.seq += 1
+        self.push_event((time, self.seq, event_type, slot))
+
+    def schedule_arrival(self, client_id:int, request_priority:int, time:float, is_timed_out:bool = False):
+        """Schedule the arrival of a new request at the application server
+
+        Args:
+            client_id (int): Client sending the request
+            request_priority (int): Priority of the request
+            time (float): Arrival time of the request
+            is_timed_out (bool): Whether the request retries a timed out one
+        """
+        slot = self.acquire_slot(client_id, request_priority, time, is_timed_out)
+        # Initial and think-time arrivals come in time order and skip the heap, out of order retries do not
+        if not self.arrivals or time >= self.arrivals[-1][0]:
+            self.seq += 1
+            self.arrivals.append((time, self.seq, settings.EVENT_REQUEST_ARRIVAL, slot))
+        else:
+            self.schedule(settings.EVENT_REQUEST_ARRIVAL, slot, time)
+
+    def push_in_queue(self, slot:int, server:Server, tier:int, current_time:float):
+        """Pushes request in queue
+
+        Args:
+            slot (int): Slot of the request
+            server (Server): Application or Db server
+            tier (int): Tier of the server
+            current_time (float): Current time
+
+        Returns:
+            bool: False if the queue was full and the request was dropped
+        """
+        if server.queue.append(slot, slot, self.request_priority[slot], current_time):
+            self.tier[slot] = tier
+            return True
+        if self.trace is not None:
+            self.trace.record(current_time, settings.TRACE_REQUEST_DROPPED, self.request_id[slot], tier, 
+                              len(self.application_server.queue), len(self.db_server.queue))
+        self.handle_request_failure(slot, current_time)   # Request dropped due to queue overflow
+        return False
+
+    def serve_next_request(self, server:Server, event_type:int, current_time:float):
+        """Start serving the next waiting request of a server, if any
+
+        Args:
+            server (Server): Application or Db server with a free core
+            event_type (int): Completion event type of the server
+            current_time (float): Current time
+        """
+        slot = server.queue.popleft(current_time)
+        if slot is not None:
+            self.tier[slot] = settings.NO_TIER
+            self.schedule(event_type, slot, current_time + self.service_time(server, self.client_id[slot]))
+            server.acquire_core(self.request_priority[slot], current_time)
+
+    def handle_request_arrival(self, slot:int, current_time:float):
+        """Request arrives at the application server
+
+        Args:
+            slot (int): Slot of the request
+            current_time (float): current time of the simulation
+        """
+        # Timout for the current request
+        self.timeout_entry[slot] = self.timeouts.schedule(slot, current_time, self.request_timeout)
+
+        # Schedule the request if the cores are available
+        if self.application_server.busy_cores < self.application_server.core_count:
+            self.schedule(settings.EVENT_REQUEST_COMPLETE_FROM_APP_SERVER, slot, current_time + self.service_time(self.application_server, self.client_id[slot]))
+            self.application_server.acquire_core(self.request_priority[slot], current_time)
+
+        # Add the request in the waiting queue
+        else:
+            self.push_in_queue(slot, self.application_server, settings.APPLICATION_SERVER, current_time)
+
+    def handle_request_complete_from_app_server(self, slot:int, current_time:float):
+        """Request completed from the app server
+
+        Args:
+            slot (int): Slot of the request
+            current_time (float): current time of the simulation
+        """
+        self.application_server.release_core(self.request_priority[slot], current_time)
+
+        # If request has not been timed out yet
+        if self.state[slot] == settings.REQUEST_IN_SERVICE:
+            response_time = current_time - self.arrival_time[slot]
+            self.response_time_sum_of_app_server += response_time
+            self.app_server_sketches[self.request_priority[slot]].add(response_time)
+
+            # If request was timed out before
+            if self.is_timed_out[slot]:
+                self.request_completed_from_app_counter_for_badput += 1
+            else:
+                self.request_completed_from_app_counter_for_goodput += 1
+
+            # Request moves from app to db server
+            if get_probablity(self.app_to_db_prob, self.random_streams.client(self.client_id[slot]).routing):
+                is_dropped = False
+                if self.db_server.busy_cores < self.db_server.core_count:
+                    self.schedule(settings.EVENT_REQUEST_COMPLETE_FROM_DB_SERVER, slot, current_time + self.service_time(self.db_server, self.client_id[slot]))
+                    self.db_server.acquire_core(self.request_priority[slot], current_time)
+                else:
+                    is_dropped = not self.push_in_queue(slot, self.db_server, settings.DB_SERVER, current_time)
+
+                # App server core waits for the db call, unless the call was dropped
+                if self.db_call_is_synchronous and not is_dropped:
+                    self.application_server.acquire_core(self.request_priority[slot], current_time)
+                    self.holds_app_core[slot] = True
+
+            # Request completed from the system
+            else:
+                self.state[slot] = settings.REQUEST_COMPLETED
+                self.timeouts.cancel(self.timeout_entry[slot])
+                self.schedule_arrival(
+                    client_id = self.client_id[slot],
+                    request_priority = int(get_probablity(self.priority_prob, self.random_streams.client(self.client_id[slot]).priority)),
+                    time = current_time + self.think_time
+                )
+                response_time = current_time - self.arrival_time[slot]
+                self.response_time_sum_of_system += response_time
+                self.system_sketches[self.request_priority[slot]].add(response_time)
+
+                # If request was timed out before
+                if self.is_timed_out[slot]:
+                    self.request_completed_from_system_for_badput += 1
+                else:
+                    self.request_completed_from_system_for_goodput += 1
+                self.release_slot(slot)
+
+                if self.output_analysis is not None and self.output_analysis.observe(response_time, current_time):
+                    self.reset_statistics(current_time)
+
+        # Request timed out while being served, nothing refers to it anymore
+        else:
+            self.release_slot(slot)
+
+        # Schedule next request if core became free
+        if self.application_server.busy_cores < self.application_server.core_count:
+            self.serve_next_request(self.application_server, settings.EVENT_REQUEST_COMPLETE_FROM_APP_SERVER, current_time)
+
+    def handle_request_complete_from_db_server(self, slot:int, current_time:float):
+        """Request processing completed from the db server
+
+        Args:
+            slot (int): Slot of the request
+            current_time (float): current simulation time
+        """
+        self.db_server.release_core(self.request_priority[slot], current_time)
+        held_app_core = self.holds_app_core[slot]    # Synchronous call, whatever the current mode
+        if held_app_core:
+            self.application_server.release_core(self.request_priority[slot], current_time)
+            self.holds_app_core[slot] = False
+
+        # If request has not been timed out yet
+        is_failed = self.state[slot] != settings.REQUEST_IN_SERVICE
+        if is_failed:   # Request timed out while being served, nothing refers to it anymore
+            self.release_slot(slot)
+        else:
+            response_time = current_time - self.arrival_time[slot]
+            self.response_time_sum_of_db_server += response_time
+            self.db_server_sketches[self.request_priority[slot]].add(response_time)
+
+            # If request was not timed out before
+            if self.is_timed_out[slot]:
+                self.request_completed_from_db_counter_for_badput += 1
+            else:
+                self.request_completed_from_db_counter_for_goodput += 1
+
+            # If call was synchronous, application server is already waiting
+            if held_app_core:
+                self.schedule(settings.EVENT_REQUEST_COMPLETE_FROM_APP_SERVER, slot, current_time + self.service_time(self.application_server, self.client_id[slot]))
+                self.application_server.acquire_core(self.request_priority[slot], current_time)
+
+            # If call was async, then request moves to application server and waits for its turn
+            elif self.application_server.busy_cores < self.application_server.core_count:
+                self.schedule(settings.EVENT_REQUEST_COMPLETE_FROM_APP_SERVER, slot, current_time + self.service_time(self.application_server, self.client_id[slot]))
+                self.application_server.acquire_core(self.request_priority[slot], current_time)
+            else:
+                self.push_in_queue(slot, self.application_server, settings.APPLICATION_SERVER, current_time)
+
+        # Schedule new request
+        self.serve_next_request(self.db_server, settings.EVENT_REQUEST_COMPLETE_FROM_DB_SERVER, current_time)
+
+        # Core of the app server held for a timed out synchronous db call became free
+        if is_failed and held_app_core:
+            self.serve_next_request(self.application_server, settings.EVENT_REQUEST_COMPLETE_FROM_APP_SERVER, current_time)
+
+    def handle_request_failure(self, slot:int, current_time:float, is_timeout:bool = False):
+        """Request timed out or dropped because the buffer queue is full
+
+        Args:
+            slot (int): Slot of the request
+            current_time (float): current time of the simulation
+            is_timeout (bool): Whether the request timed out
+        """
+        request_priority = self.request_priority[slot]
+        if not is_timeout:
+            if request_priority == settings.HIGH_PRIORITY:
+                self.priority_request_dropped += 1
+            else:
+                self.regular_request_dropped += 1
+            self.state[slot] = settings.REQUEST_DROPPED
+            self.timeouts.cancel(self.timeout_entry[slot])   # Client retries now, not again at the timeout
+        else:
+            self.state[slot] = settings.REQUEST_TIMED_OUT
+            self.request_timed_out += 1
+
+        # Timed out request leaves the waiting queue right away
+        tier = self.tier[slot]
+        if tier != settings.NO_TIER:
+            server = self.application_server if tier == settings.APPLICATION_SERVER else self.db_server
+            server.queue.remove(slot, request_priority, current_time)
+            self.tier[slot] = settings.NO_TIER
+
+            # Core of the app server held for the synchronous db call becomes free
+            if self.holds_app_core[slot]:
+                self.application_server.release_core(request_priority, current_time)
+                self.holds_app_core[slot] = False
+                self.serve_next_request(self.application_server, settings.EVENT_REQUEST_COMPLETE_FROM_APP_SERVER, current_time)
+
+        self.schedule_arrival(
+            client_id = self.client_id[slot],
+            request_priority = request_priority,
+            time = current_time + get_retry_delay(self.retry_delay, self.random_streams.client(self.client_id[slot]).retry),
+            is_timed_out = is_timeout
+        )
+
+        # Requests timed out while being served are released once their service completes
+        if not is_timeout or tier != settings.NO_TIER:
+            self.release_slot(slot)
+
+    def handle_request_timeout(self, slot:int, current_time:float):
+        """Timeout of a request raised, timeouts of completed requests are cancelled
+
+        Args:
+            slot (int): Slot of the request
+            current_time (float): current time of the simulation
+        """
+        self.handle_request_failure(slot, current_time, is_timeout = True)
+
+    def traced(self, event_type:int, handler):
+        """Wrap an event handler so that it records the event in the trace first
+
+        Args:
+            event_type (int): Type of the events handled
+            handler (callable): Event handler
+
+        Returns:
+            callable: Handler recording its events
+        """
+        tiers = {
+            settings.EVENT_REQUEST_ARRIVAL : settings.APPLICATION_SERVER,
+            settings.EVENT_REQUEST_COMPLETE_FROM_APP_SERVER : settings.APPLICATION_SERVER,
+            settings.EVENT_REQUEST_COMPLETE_FROM_DB_SERVER : settings.DB_SERVER
+        }
+
+        def traced_handler(slot:int, current_time:float):
+            tier = tiers.get(event_type, self.tier[slot])   # Timeouts take the tier the request waits at
+            self.trace.record(current_time, event_type, self.request_id[slot], tier, 
+                              len(self.application_server.queue), len(self.db_server.queue))
+            handler(slot, current_time)
+        return traced_handler
+
+    def instrumented(self, event_type:int, handler):
+        """Wrap an event handler so that it counts and times its events
+
+        Args:
+            event_type (int): Type of the events handled
+            handler (callable): Event handler
+
+        Returns:
+            callable: Instrumented handler
+        """
+        is_completion = event_type in (settings.EVENT_REQUEST_COMPLETE_FROM_APP_SERVER, settings.EVENT_REQUEST_COMPLETE_FROM_DB_SERVER)
+        return self.instrumentation.instrument(
+            handler,
+            event_type_of = lambda slot: event_type,
+            is_stale = lambda slot: is_completion and self.state[slot] != settings.REQUEST_IN_SERVICE,  # Request timed out meanwhile
+            event_list = self.event_queue,
+            arrivals = self.arrivals,
+            timeouts = self.timeouts,
+            queues = self.queues()
+        )
+
+    def run_until(self, end_time:float, current_time:float, max_events:int = None):
+        """Handle events in time order up to, not including, end_time
+
+        Args:
+            end_time (float): Simulation time to run until
+            current_time (float): Current simulation time
+            max_events (int): Stop after this many events, None for no limit
+
+        Returns:
+            (float, int): Time of the last handled event, number of events handled
+        """
+        event_queue = self.event_queue
+        pop_event = self.pop_event
+        timeouts = self.timeouts
+        arrivals = self.arrivals
+        handlers = {
+            settings.EVENT_REQUEST_ARRIVAL : self.handle_request_arrival,
+            settings.EVENT_REQUEST_COMPLETE_FROM_APP_SERVER : self.handle_request_complete_from_app_server,
+            settings.EVENT_REQUEST_COMPLETE_FROM_DB_SERVER : self.handle_request_complete_from_db_server,
+            settings.EVENT_TIMEOUT : self.handle_request_timeout
+        }
+        if self.trace is not None:
+            handlers = {event_type: self.traced(event_type, handler) for event_type, handler in handlers.items()}
+        if self.instrumentation is not None:
+            handlers = {event_type: self.instrumented(event_type, handler) for event_type, handler in handlers.items()}
+
+        events_processed = 0
+        max_events = -1 if max_events is None else max_events   # Never reached by the count
+        while True:
+            # Earliest of the event list, the arrival FIFO and the next timeout, events from end_time on are left for later
+            next_timeout = timeouts.next_time()
+            event = event_queue[0] if event_queue else None
+            from_arrivals = arrivals and (event is None or arrivals[0] < event)
+            if from_arrivals:
+                event = arrivals[0]
+            if event is not None and event[0] <= next_timeout:
+                if event[0] >= end_time:
+                    break
+                current_time, _, event_type, slot = arrivals.popleft() if from_arrivals else pop_event()
+            else:
+                if next_timeout >= end_time:
+                    break
+                current_time, slot = timeouts.pop()
+                event_type = settings.EVENT_TIMEOUT
+            handlers[event_type](slot, current_time)
+            events_processed += 1
+            if events_processed == max_events:
+                break
+        return current_time, events_processed
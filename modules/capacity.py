@@ -0,0 +1,172 @@
+import settings
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from modules.replication import REPLICATION_METRICS, confidence_interval, replication_seeds
+from modules.simulator import Simulator
+
+
+# Metric name -> column of the results row, targets are upper bounds
+CAPACITY_METRICS = dict(
+    REPLICATION_METRICS,
+    **{f"p{percentile}_response_time" : f"system_p{percentile}_response_time" for percentile in settings.RESPONSE_TIME_PERCENTILES}
+)
+
+# Simulator argument -> whether the search looks for its largest value meeting the target,
+# clients load the system, servers relieve it and the smallest sufficient count is searched
+CAPACITY_PARAMETERS = {
+    "clients" : True,
+    "application_server_count" : False,
+    "db_server_count" : False
+}
+
+
+def run_candidate(config:dict):
+    """Simulate one replication of a candidate point, in a worker process
+
+    Args:
+        config (dict): Simulator arguments of the replication
+
+    Returns:
+        (dict, int): Results row and number of simulated events
+    """
+    result = Simulator(**config).run()
+    return result.row, result.events_processed
+
+def meets_target(values:list, target:float, confidence:float, max_replications:int):
+    """Whether replications of a point meet an upper bound on a metric
+
+    Args:
+        values (list): Metric of every replication
+        target (float): Upper bound on the metric
+        confidence (float): Confidence level of the interval
+        max_replications (int): Replications after which the mean decides alone
+
+    Returns:
+        bool: True or False once the confidence interval is on one side of the target, None if more replications are needed
+    """
+    mean, half_width = confidence_interval(values, confidence)
+    if mean + half_width <= target:
+        return True
+    if mean - half_width > target:
+        return False
+    if len(values) >= max_replications:
+        return bool(mean <= target)
+    return None
+
+def interior_points(good:int, bad:int, count:int):
+    """Evenly spaced integers strictly between the two ends of the bracket
+
+    Args:
+        good (int): End of the bracket meeting the target
+        bad (int): End of the bracket missing the target
+        count (int): Number of points wanted
+
+    Returns:
+        list: Sorted distinct points, fewer than count if the bracket is narrow
+    """
+    low, high = min(good, bad), max(good, bad)
+    points = {low + round(index * (high - low) / (count + 1)) for index in range(1, count + 1)}
+    return sorted(point for point in points if low < point < high)
+
+def search_capacity(config:dict, parameter:str, low:int, high:int, metric:str, target:float, resolution:int = 1,
+                    points:int = None, min_replications:int = 3, max_replications:int = 10, confidence:float = 0.95,
+                    workers:int = None, seed:int = None, largest:bool = None):
+    """Search the largest clients, or smallest server count, meeting a target, instead of sweeping a grid
+
+    Every round simulates several points of the bracket between the last value known to meet the
+    target and the first value known to miss it (k-section, bisection for a single point), in
+    parallel. A point gets min_replications replications, and more while the confidence interval
+    of its metric still contains the target, up to max_replications after which its mean decides.
+    Every point uses the same replication seeds, so neighbouring points differ less than
+    independent runs would. The metric is assumed to be monotone in the parameter.
+
+    Args:
+        config (dict): Simulator arguments, without the parameter and seed
+        parameter (str): Simulator argument searched, e.g. one of CAPACITY_PARAMETERS
+        low (int): Smallest value of the parameter searched
+        high (int): Largest value of the parameter searched
+        metric (str): Metric name of CAPACITY_METRICS or column of the results row
+        target (float): Upper bound on the metric, e.g. a p99 response time in seconds
+        resolution (int): Stop once the bracket is at most this wide
+        points (int): Points simulated per round, enough to keep the workers busy by default
+        min_replications (int): Replications of every point
+        max_replications (int): Replications of a point whose interval contains the target
+        confidence (float): Confidence level of the intervals
+        workers (int): Number of worker processes, one per CPU by default
+        seed (int): Seed of the search, drawn from the OS when None
+        largest (bool): Whether the largest value meeting the target is searched, from CAPACITY_PARAMETERS by default
+
+    Returns:
+        dict: "value" (best value meeting the target, None if none does), "bracket" (value meeting and value
+              missing the target, out of [low, high] if never simulated), "points" (value -> metric mean, half-width,
+              replications and verdict), "rounds", "events" (simulated events), "grid_points" and "grid_events"
+              (estimated events of a grid sweep of [low, high] with step resolution and min_replications replications)
+    """
+    column = CAPACITY_METRICS.get(metric, metric)
+    if largest is None:
+        largest = CAPACITY_PARAMETERS[parameter]
+    workers = workers or os.cpu_count() or 1
+    min_replications = max(2, min(min_replications, max_replications))
+    points = points or max(1, workers // min_replications)
+    resolution = max(1, resolution)
+    seeds = replication_seeds(seed, max_replications)
+
+    # Ends out of the range are never simulated, they only mark that no value met or missed the target
+    good, bad = (low - 1, high + 1) if largest else (high + 1, low - 1)
+    samples = {}    # Value -> (results row, events) of its replications
+    verdicts = {}
+    rounds = 0
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        while abs(bad - good) > resolution:
+            candidates = interior_points(good, bad, points)
+            undecided = list(candidates)
+            for value in candidates:
+                samples.setdefault(value, [])
+            while undecided:
+                # Replications of every undecided point, enough to keep the workers busy
+                batch = max(1, math.ceil(workers / len(undecided)))
+                jobs = []
+                for value in undecided:
+                    count = len(samples[value])
+                    wanted = max(min_replications, count + batch)
+                    jobs += [(value, index) for index in range(count, min(wanted, max_replications))]
+                configs = [dict(config, **{parameter : value}, seed = seeds[index]) for value, index in jobs]
+                for (value, _), result in zip(jobs, executor.map(run_candidate, configs)):
+                    samples[value].append(result)
+                for value in undecided:
+                    verdicts[value] = meets_target([row[column] for row, _ in samples[value]], target, confidence, max_replications)
+                undecided = [value for value in undecided if verdicts[value] is None]
+
+            # Narrow the bracket to the closest points on either side of the target
+            misses = [value for value in candidates if not verdicts[value]]
+            if misses:
+                bad = min(misses) if largest else max(misses)
+            meets = [value for value in candidates if verdicts[value] and (value < bad if largest else value > bad)]
+            if meets:
+                good = max(meets) if largest else min(meets)
+            rounds += 1
+
+    summary = {}
+    for value in sorted(samples):
+        mean, half_width = confidence_interval([row[column] for row, _ in samples[value]], confidence)
+        summary[value] = {"mean" : mean, "half_width" : half_width, "replications" : len(samples[value]), "meets" : verdicts[value]}
+
+    # Events of the grid sweep, interpolated from the events per replication of the simulated points
+    grid = np.arange(low, high + 1, resolution)
+    values = sorted(samples)
+    events_per_replication = [np.mean([events for _, events in samples[value]]) for value in values]
+    grid_events = float(np.interp(grid, values, events_per_replication).sum() * min_replications) if values else 0.0
+    return {
+        "value" : good if low <= good <= high else None,
+        "bracket" : (good, bad),
+        "points" : summary,
+        "rounds" : rounds,
+        "events" : sum(events for value in samples for _, events in samples[value]),
+        "grid_points" : len(grid),
+        "grid_events" : grid_events
+    }
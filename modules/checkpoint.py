@@ -0,0 +1,115 @@
+import settings
+
+import gzip
+import os
+import pickle
+
+from modules.request import Request
+
+
+CHECKPOINT_VERSION = 5  # Bumped whenever the pickled state of the simulator changes
+FORKABLE_PARAMETERS = {     # Parameter -> objects holding it, the simulator, its event handler or both
+    "simulation_time" : ("simulator",),
+    "request_timeout" : ("simulator", "event_handler"),
+    "db_call_is_synchronous" : ("event_handler",),
+    "think_time" : ("event_handler",),
+    "retry_delay" : ("event_handler",),
+    "app_to_db_prob" : ("event_handler",),
+    "priority_prob" : ("event_handler",)
+}
+
+
+def snapshot(sim):
+    """Compressed state of a simulator between two events
+
+    The event heap, arrival FIFO, timeouts, server queues, counters, random generators and Request.counter
+    are kept. The trace and time series files are not, a restored simulator runs without them.
+
+    Args:
+        sim (Simulator): Simulator, not running
+
+    Returns:
+        bytes: Snapshot to be passed to restore
+    """
+    state = {"version" : CHECKPOINT_VERSION, "request_counter" : Request.counter, "simulator" : sim}
+    return gzip.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), compresslevel=settings.CHECKPOINT_COMPRESSION_LEVEL)
+
+def restore(data:bytes):
+    """Simulator rebuilt from a snapshot
+
+    Args:
+        data (bytes): Output of snapshot
+
+    Returns:
+        Simulator: Simulator resuming at the time of the snapshot
+    """
+    state = pickle.loads(gzip.decompress(data))
+    if state["version"] != CHECKPOINT_VERSION:
+        raise ValueError(f"Checkpoint version {state['version']} does not match {CHECKPOINT_VERSION}")
+    Request.counter = max(Request.counter, state["request_counter"])  # Ids stay unique in this process
+    return state["simulator"]
+
+def save_checkpoint(sim, path:str):
+    """Write the snapshot of a simulator to a file
+
+    Args:
+        sim (Simulator): Simulator, not running
+        path (str): Path of the checkpoint file
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok = True)
+    with open(path, "wb") as file:
+        file.write(snapshot(sim))
+
+def load_checkpoint(path:str):
+    """Simulator restored from a checkpoint file, e.g. to resume a run after a crash
+
+    Args:
+        path (str): Path of the checkpoint file
+
+    Returns:
+        Simulator: Simulator resuming at the time of the checkpoint
+    """
+    with open(path, "rb") as file:
+        return restore(file.read())
+
+def fork(data:bytes, reset_statistics:bool = True, **changes):
+    """What-if continuation of a warm simulator
+
+    Requests in flight keep their pending timeouts and, for a synchronous db call, their app
+    server core. The changes apply to everything that happens after the fork.
+
+    Args:
+        data (bytes): Output of snapshot
+        reset_statistics (bool): Measure the continuation only, from the time of the snapshot
+        **changes: New values of parameters in FORKABLE_PARAMETERS
+
+    Returns:
+        Simulator: Independent simulator resuming at the time of the snapshot
+    """
+    unknown = set(changes) - set(FORKABLE_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Cannot fork with {', '.join(sorted(unknown))}, expected some of {', '.join(FORKABLE_PARAMETERS)}")
+    sim = restore(data)
+    missing = sorted(name for name in changes if "event_handler" in FORKABLE_PARAMETERS[name] and not hasattr(sim.event_handler, name))
+    if missing:     # e.g. the db call parameters, which a topology declares per route
+        raise ValueError(f"Cannot fork a {type(sim).__name__} with {', '.join(missing)}")
+    for name, value in changes.items():
+        for owner in FORKABLE_PARAMETERS[name]:
+            setattr(sim if owner == "simulator" else sim.event_handler, name, value)
+    if reset_statistics:
+        sim.event_handler.reset_statistics(sim.end_time)
+    return sim
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Resume a simulation from a checkpoint')
+    parser.add_argument('path', type=str, help='path of the checkpoint file')
+    parser.add_argument('--simulation_time', type=float, default=None, help='run until this time instead of the original simulation time')
+    args = parser.parse_args()
+
+    sim = load_checkpoint(args.path) if args.simulation_time is None else fork(
+        open(args.path, "rb").read(), reset_statistics = False, simulation_time = args.simulation_time
+    )
+    sim.run(write_results = True, verbose = True)
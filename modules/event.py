@@ -2,11 +2,14 @@ from modules.request import Request
 
 
 class Event:
+    __slots__ = ("type", "request", "time")
+    free_list = []  # Released events, reused by acquire
+
     def __init__(self, type:int, request:Request, time:float) -> None:
         """Instance of an event in the simulator
 
         Args:
-            type (int): Type of event (1, 2, 3)
+            type (int): Type of event (1, 2, 3, 4)
             request (Request): Request associated with the event
             time (float): Execution time of the event
         """
@@ -14,6 +17,32 @@ class Event:
         self.request = request
         self.time = time
 
+    @classmethod
+    def acquire(cls, type:int, request:Request, time:float):
+        """Event taken from the free list, or a new one if the list is empty
+
+        Args:
+            type (int): Type of event (1, 2, 3, 4)
+            request (Request): Request associated with the event
+            time (float): Execution time of the event
+
+        Returns:
+            Event: Event ready to be scheduled
+        """
+        if cls.free_list:
+            event = cls.free_list.pop()
+            event.type = type
+            event.request = request
+            event.time = time
+            return event
+        return cls(type, request, time)
+
+    def release(self):
+        """Put the handled event back on the free list
+        """
+        self.request = None
+        Event.free_list.append(self)
+
     def __lt__(self, other):
         """Comparator function for priority queue
 
@@ -30,5 +59,7 @@ class Event:
             return f"EVENT_REQUEST_ARRIVAL : {self.request.id} : {self.time}"
         elif self.type == 2:
             return f"EVENT_REQUEST_COMPLETE_FROM_APP_SERVER : {self.request.id} : {self.time}"
+        elif self.type == 3:
+            return f"EVENT_REQUEST_COMPLETE_FROM_DB_SERVER : {self.request.id} : {self.time}"
         else:
-            return f"EVENT_REQUEST_COMPLETE_FROM_DB_SERVER : {self.request.id} : {self.time}"
\ No newline at end of file
+            return f"EVENT_TIMEOUT : {self.request.id} : {self.time}"
@@ -1,23 +1,34 @@
 import settings
 
-import heapq
-from typing import List
+from collections import deque
+import numpy as np
 import logging
 
 from modules.event import Event
+from modules.event_list import HeapEventList
 from modules.server import Server
 from modules.request import Request
-from utils.probability_gen import get_probablity, calculate_average_response_time, calculate_number_in_the_server, get_retry_delay
+from modules.timeout_manager import TimeoutManager
+from utils.probability_gen import get_probablity, get_retry_delay
+from utils.random_streams import RandomStreams
+from utils.trace import TraceRecorder
+from utils.output_analysis import OutputAnalysis
+from utils.quantile_sketch import QuantileSketch
+from utils.time_series import TimeSeriesRecorder
+from utils.instrumentation import Instrumentation
 
 
 class EventHandler:
-    def __init__(self, event_queue:List[Event], application_server:Server, db_server:Server, app_to_db_prob:float, 
+    def __init__(self, event_queue:HeapEventList, application_server:Server, db_server:Server, app_to_db_prob:float, 
                  think_time:float, priority_prob:float, logger:logging.Logger, app_server_queue_length:int, 
-                 db_server_queue_length:int, retry_delay:float, request_timeout:float, db_call_is_synchronous:bool) -> None:
+                 db_server_queue_length:int, retry_delay:float, request_timeout:float, db_call_is_synchronous:bool, 
+                 random_streams:RandomStreams, timeouts:TimeoutManager, arrivals:deque = None, trace:TraceRecorder = None, 
+                 output_analysis:OutputAnalysis = None, time_series:TimeSeriesRecorder = None,
+                 instrumentation:Instrumentation = None) -> None:
         """Instance of event handler for the simulator
 
         Args:
-            event_queue (List[Event]): Event queue for the simulator
+            event_queue (HeapEventList): Future event list of the simulator, any of modules.event_list
             application_server (Server): Application server instance
             db_server (Server): Db server instance
             app_to_db_prob (float): Probability request will go from app server to db server
@@ -29,12 +40,26 @@ class EventHandler:
             retry_delay (float): Retry sending packet after failure
             request_timeout (float): Timeout value for requests
             db_call_is_synchronous (bool): Flag to run the simulation with synchronous db calls
+            random_streams (RandomStreams): Random streams of the run
+            timeouts (TimeoutManager): Pending request timeouts
+            arrivals (deque): FIFO of arrival events scheduled in time order, kept outside the event queue
+            trace (TraceRecorder): Event trace, None when tracing is off
+            output_analysis (OutputAnalysis): Warm-up detection and batch means of response times, None when off
+            time_series (TimeSeriesRecorder): Fixed-interval metrics, None when off
+            instrumentation (Instrumentation): Counters and timers of the event loop, None when off
         """
         self.logger = logger
+        self.random_streams = random_streams
         
         self.application_server = application_server
         self.db_server = db_server
         self.event_queue = event_queue
+        self.push_event, self.pop_event = event_queue.operations()
+        self.timeouts = timeouts
+        self.arrivals = arrivals if arrivals is not None else deque()
+        self.trace = trace
+        if trace is not None:   # Record every event before handling it, untraced runs pay nothing
+            self.handle_event = self.handle_event_traced
         self.app_to_db_prob = app_to_db_prob
         self.think_time = think_time
         self.priority_prob = priority_prob
@@ -43,9 +68,34 @@ class EventHandler:
         self.retry_delay = retry_delay
         self.request_timeout = request_timeout
         self.db_call_is_synchronous = db_call_is_synchronous
+        self.output_analysis = output_analysis
+        self.instrumentation = instrumentation
 
-        self.request_failure_dict = {}
-        self.request_completed_dict = {}
+        self.time_series = None     # Nothing to keep at the first reset
+        self.reset_statistics(0)
+        self.time_series = time_series
+
+    def __getstate__(self):
+        """State kept by a checkpoint, without the trace and time series files
+
+        Returns:
+            dict: Attributes of the handler
+        """
+        state = self.__dict__.copy()
+        state.pop("handle_event", None)     # Traced dispatch
+        state["trace"] = None
+        state["time_series"] = None
+        return state
+
+    def reset_statistics(self, current_time:float):
+        """Discard the statistics collected so far, e.g. at the end of the warm-up
+
+        Args:
+            current_time (float): Current simulation time, start of the measurement window
+        """
+        if self.time_series is not None:
+            self.time_series.rebase(self.cumulative_metrics(current_time))
+        self.statistics_start_time = current_time
 
         self.request_completed_from_app_counter_for_goodput = 0
         self.request_completed_from_db_counter_for_goodput = 0
@@ -57,36 +107,103 @@ class EventHandler:
 
         self.priority_request_dropped = 0
         self.regular_request_dropped = 0
+        self.request_timed_out = 0
 
-        self.average_response_time_of_system = 0
-        self.average_response_time_of_app_server = 0
-        self.average_response_time_of_db_server = 0
+        # Response times are summed, averages are taken once at the end
+        self.response_time_sum_of_system = 0.0
+        self.response_time_sum_of_app_server = 0.0
+        self.response_time_sum_of_db_server = 0.0
 
-        self.temporal_data = {}
-        
-        self.number_in_app_server = calculate_number_in_the_server(self.application_server)
-        self.number_in_db_server = calculate_number_in_the_server(self.db_server)
-        self.number_in_system = self.number_in_app_server + self.number_in_db_server
+        # Response time distributions per priority class, for the percentiles
+        self.system_sketches = [QuantileSketch() for _ in range(settings.PRIORITY_CLASSES)]
+        self.app_server_sketches = [QuantileSketch() for _ in range(settings.PRIORITY_CLASSES)]
+        self.db_server_sketches = [QuantileSketch() for _ in range(settings.PRIORITY_CLASSES)]
+
+        # Time integrals of the busy cores and queue lengths
+        self.application_server.reset_statistics(current_time)
+        self.db_server.reset_statistics(current_time)
+
+    def schedule_arrival(self, client_id:int, request_priority:int, time:float, is_timed_out:bool = False):
+        """Schedule the arrival of a new request at the application server
+
+        Args:
+            client_id (int): Client sending the request
+            request_priority (int): Priority of the request
+            time (float): Arrival time of the request
+            is_timed_out (bool): Whether the request retries a timed out one
+        """
+        event = Event.acquire(
+            type = settings.EVENT_REQUEST_ARRIVAL,
+            request = Request.acquire(
+                client_id = client_id,
+                request_priority = request_priority,
+                request_timeout = self.request_timeout,
+                need_server = settings.APPLICATION_SERVER,
+                arrival_time = time,
+                is_timed_out = is_timed_out
+            ),
+            time = time
+        )
+        # Initial and think-time arrivals come in time order and skip the heap, out of order retries do not
+        if not self.arrivals or time >= self.arrivals[-1].time:
+            self.arrivals.append(event)
+        else:
+            self.push_event(event)
 
-    def push_in_queue(self, event:Event, server:Server, queue_length:int, current_time:float):
+    def service_time(self, server:Server, client_id:int):
+        """Service time of a request, from the streams of its client with common random numbers
+
+        Args:
+            server (Server): Application or Db server
+            client_id (int): Client of the request
+
+        Returns:
+            float: Service time
+        """
+        if self.random_streams.common_random_numbers:
+            streams = self.random_streams.client(client_id)
+            return server.get_service_time(streams.app_service if server is self.application_server else streams.db_service)
+        return server.get_service_time()
+
+    def push_in_queue(self, event:Event, server:Server, current_time:float):
         """Pushes event in queue
 
         Args:
             event (Event): Event to be served
             server (Server): Application or Db server
-            queue_length (int): Max queue length
             current_time (float): Current time
+
+        Returns:
+            bool: False if the queue was full and the request was dropped
         """
-        if event.request.request_priority == settings.HIGH_PRIORITY:
-            if len(server.priority_queue) < queue_length:
-                server.priority_queue.append(event.request)
-            else:
-                self.handle_event_request_failure(event, current_time)  # Request dropped due to queue overflow
-        else:
-            if len(server.regular_queue) < queue_length:
-                server.regular_queue.append(event.request)
-            else:
-                self.handle_event_request_failure(event, current_time)  # Request dropped due to queue overflow
+        if server.queue.append(event.request, event.request.id, event.request.request_priority, current_time):
+            event.request.waiting_server = server
+            return True
+        if self.trace is not None:
+            self.trace.record(current_time, settings.TRACE_REQUEST_DROPPED, event.request.id, self.tier_of(server), 
+                              len(self.application_server.queue), len(self.db_server.queue))
+        self.handle_event_request_failure(event, current_time)  # Request dropped due to queue overflow
+        return False
+
+    def serve_next_request(self, server:Server, event_type:int, current_time:float):
+        """Start serving the next waiting request of a server, if any
+
+        Args:
+            server (Server): Application or Db server with a free core
+            event_type (int): Completion event type of the server
+            current_time (float): Current time
+        """
+        new_request = server.queue.popleft(current_time)
+        if new_request is not None:
+            new_request.waiting_server = None
+            self.push_event(
+                Event.acquire(     # Start processing the event
+                    type = event_type,
+                    request = new_request,
+                    time = current_time + self.service_time(server, new_request.client_id)
+                )
+            )
+            server.acquire_core(new_request.request_priority, current_time)
 
     def handle_event_request_arrival(self, event:Event, current_time:float):
         """Event generated when request arrives at the application server
@@ -95,36 +212,23 @@ class EventHandler:
             event (Event): Event to be handled
             current_time (float): current time of the simulation
         """
-        # Timout event for the current request
-        heapq.heappush(
-            self.event_queue, 
-            Event( 
-                type = settings.EVENT_TIMEOUT,
-                request = event.request,
-                time = current_time + self.request_timeout
-            )
-        )
+        # Timout for the current request
+        event.request.timeout_entry = self.timeouts.schedule(event.request, current_time, self.request_timeout)
 
         # Schedule the request if the cores are available
         if self.application_server.busy_cores < self.application_server.core_count:  # cores are available
-            heapq.heappush(
-                self.event_queue, 
-                Event(     # Start processing the event
+            self.push_event(
+                Event.acquire(     # Start processing the event
                     type = settings.EVENT_REQUEST_COMPLETE_FROM_APP_SERVER,
                     request = event.request,
-                    time = current_time + self.application_server.get_service_time()
+                    time = current_time + self.service_time(self.application_server, event.request.client_id)
                 )
             )
-            self.application_server.busy_cores += 1
+            self.application_server.acquire_core(event.request.request_priority, current_time)
 
         # Add the request in the waiting queue
         else:
-            self.push_in_queue(event, self.application_server, self.app_server_queue_length, current_time)
-        
-        # Update statistics
-        self.number_in_app_server = calculate_number_in_the_server(self.application_server)
-        self.number_in_db_server = calculate_number_in_the_server(self.db_server)
-        self.number_in_system = self.number_in_app_server + self.number_in_db_server
+            self.push_in_queue(event, self.application_server, current_time)
 
     def handle_event_request_complete_from_app_server(self, event:Event, current_time:float):
         """Event handled when request gets completed from the app server
@@ -133,15 +237,13 @@ class EventHandler:
             event (Event): Event to be handled
             current_time (float): current time of the simulation
         """
-        self.application_server.busy_cores -= 1
+        self.application_server.release_core(event.request.request_priority, current_time)
 
         # If request has not been timed out yet
-        if event.request.id not in self.request_failure_dict.keys():
+        if event.request.state == settings.REQUEST_IN_SERVICE:
             response_time = current_time - event.request.arrival_time
-            self.average_response_time_of_app_server = calculate_average_response_time(
-                self.average_response_time_of_app_server, 
-                (self.request_completed_from_app_counter_for_goodput + self.request_completed_from_app_counter_for_badput), 
-                response_time)
+            self.response_time_sum_of_app_server += response_time
+            self.app_server_sketches[event.request.request_priority].add(response_time)
             
             # If request was timed out before
             if event.request.is_timed_out:
@@ -150,86 +252,59 @@ class EventHandler:
                 self.request_completed_from_app_counter_for_goodput += 1
             
             # Request moves from app to db server
-            if get_probablity(self.app_to_db_prob):
+            if get_probablity(self.app_to_db_prob, self.random_streams.client(event.request.client_id).routing):
                 # If db server has available cores
+                is_dropped = False
                 if self.db_server.busy_cores < self.db_server.core_count:
-                    heapq.heappush(
-                        self.event_queue,
-                        Event(
+                    self.push_event(
+                        Event.acquire(
                             type = settings.EVENT_REQUEST_COMPLETE_FROM_DB_SERVER,
                             request = event.request,
-                            time = current_time + self.db_server.get_service_time()
+                            time = current_time + self.service_time(self.db_server, event.request.client_id)
                         )
                     )
-                    self.db_server.busy_cores += 1
+                    self.db_server.acquire_core(event.request.request_priority, current_time)
 
                 # Request moves to queue
                 else:   
-                    self.push_in_queue(event, self.db_server, self.db_server_queue_length, current_time)
+                    is_dropped = not self.push_in_queue(event, self.db_server, current_time)
                 
-                if self.db_call_is_synchronous:
-                    self.application_server.busy_cores += 1
+                # App server core waits for the db call, unless the call was dropped
+                if self.db_call_is_synchronous and not is_dropped:
+                    self.application_server.acquire_core(event.request.request_priority, current_time)
+                    event.request.holds_app_core = True
 
             # Request completed from the system
             else:
-                self.request_completed_dict[event.request.id] = 1
+                event.request.state = settings.REQUEST_COMPLETED
+                self.timeouts.cancel(event.request.timeout_entry)
                 # New arrival event after think time
-                heapq.heappush(
-                        self.event_queue,
-                        Event(
-                            type = settings.EVENT_REQUEST_ARRIVAL,
-                            request = Request(
-                                request_priority = int(get_probablity(self.priority_prob)),
-                                request_timeout = self.request_timeout,
-                                need_server = settings.APPLICATION_SERVER,
-                                arrival_time = current_time + self.think_time
-                            ),
-                            time = current_time + self.think_time
-                        )
-                    )
+                self.schedule_arrival(
+                    client_id = event.request.client_id,
+                    request_priority = int(get_probablity(self.priority_prob, self.random_streams.client(event.request.client_id).priority)),
+                    time = current_time + self.think_time
+                )
                 response_time = (current_time - event.request.arrival_time)
-                self.average_response_time_of_system = calculate_average_response_time(
-                    self.average_response_time_of_system, 
-                    (self.request_completed_from_system_for_goodput + self.request_completed_from_system_for_badput), 
-                    response_time)
+                self.response_time_sum_of_system += response_time
+                self.system_sketches[event.request.request_priority].add(response_time)
                 
                 # If request was timed out before
                 if event.request.is_timed_out:
                     self.request_completed_from_system_for_badput += 1
                 else:
                     self.request_completed_from_system_for_goodput += 1
+                event.request.release()
+
+                if self.output_analysis is not None and self.output_analysis.observe(response_time, current_time):
+                    self.reset_statistics(current_time)
+
+        # Request timed out while being served, nothing refers to it anymore
+        else:
+            event.request.release()
             
         # Schedule next request if core became free
         if self.application_server.busy_cores < self.application_server.core_count:
-            while True:
-                if len(self.application_server.priority_queue) != 0:    # Priority request waiting
-                    new_request = self.application_server.priority_queue.pop(0)
-
-                elif len(self.application_server.regular_queue) != 0:   # Regular request waiting
-                    new_request = self.application_server.regular_queue.pop(0)
-
-                else:   # No request available for scheduling
-                    break
-
-                # If request has not timed out yet
-                if new_request.id not in self.request_failure_dict.keys():
-                    after_service_time = current_time + self.application_server.get_service_time()
-
-                    heapq.heappush(
-                        self.event_queue, 
-                        Event(     # Start processing the event
-                            type = settings.EVENT_REQUEST_COMPLETE_FROM_APP_SERVER,
-                            request = new_request,
-                            time = after_service_time
-                        )
-                    )
-                    self.application_server.busy_cores += 1
-                    break
-        
-        # Update statistics
-        self.number_in_app_server = calculate_number_in_the_server(self.application_server)
-        self.number_in_db_server = calculate_number_in_the_server(self.db_server)
-        self.number_in_system = self.number_in_app_server + self.number_in_db_server
+            self.serve_next_request(self.application_server, settings.EVENT_REQUEST_COMPLETE_FROM_APP_SERVER, current_time)
 
     def handle_event_request_complete_from_db_server(self, event:Event, current_time:float):
         """Event handled when request processing is completed from the db server
@@ -238,17 +313,20 @@ class EventHandler:
             event (Event): Event to be handled
             current_time (float): current simulation time
         """
-        self.db_server.busy_cores -= 1
-        if self.db_call_is_synchronous:
-            self.application_server.busy_cores -= 1
+        self.db_server.release_core(event.request.request_priority, current_time)
+        held_app_core = event.request.holds_app_core  # Synchronous call, whatever the current mode
+        if held_app_core:
+            self.application_server.release_core(event.request.request_priority, current_time)
+            event.request.holds_app_core = False
 
         # If request has not been timed out yet
-        if event.request.id not in self.request_failure_dict.keys():
+        is_failed = event.request.state != settings.REQUEST_IN_SERVICE
+        if is_failed:   # Request timed out while being served, nothing refers to it anymore
+            event.request.release()
+        else:
             response_time = current_time - event.request.arrival_time
-            self.average_response_time_of_db_server = calculate_average_response_time(
-                self.average_response_time_of_db_server, 
-                (self.request_completed_from_db_counter_for_goodput + self.request_completed_from_db_counter_for_badput), 
-                response_time)
+            self.response_time_sum_of_db_server += response_time
+            self.db_server_sketches[event.request.request_priority].add(response_time)
             
             # If request was not timed out before
             if event.request.is_timed_out:
@@ -257,68 +335,39 @@ class EventHandler:
                 self.request_completed_from_db_counter_for_goodput += 1
             
             # If call was synchronous, application server is already waiting
-            if self.db_call_is_synchronous:
-                heapq.heappush(
-                    self.event_queue, 
-                    Event(     # Start processing the event
+            if held_app_core:
+                self.push_event(
+                    Event.acquire(     # Start processing the event
                         type = settings.EVENT_REQUEST_COMPLETE_FROM_APP_SERVER,
                         request = event.request,
-                        time = current_time + self.application_server.get_service_time()
+                        time = current_time + self.service_time(self.application_server, event.request.client_id)
                     )
                 )
-                self.application_server.busy_cores += 1
+                self.application_server.acquire_core(event.request.request_priority, current_time)
             
             # If call was async, then request moves to application server and waits for its turn
             else:
                 # If cores are available, start executing
                 if self.application_server.busy_cores < self.application_server.core_count:
-                    heapq.heappush(
-                        self.event_queue, 
-                        Event(     # Start processing the event
+                    self.push_event(
+                        Event.acquire(     # Start processing the event
                             type = settings.EVENT_REQUEST_COMPLETE_FROM_APP_SERVER,
                             request = event.request,
-                            time = current_time + self.application_server.get_service_time()
+                            time = current_time + self.service_time(self.application_server, event.request.client_id)
                         )
                     )
-                    self.application_server.busy_cores += 1
+                    self.application_server.acquire_core(event.request.request_priority, current_time)
                 
                 # Push in waiting queue
                 else:
-                    self.push_in_queue(event, self.application_server, self.app_server_queue_length, current_time)
+                    self.push_in_queue(event, self.application_server, current_time)
 
         # Schedule new request
-        while True:
-            if len(self.db_server.priority_queue) != 0:    # Priority request waiting
-                new_request = self.db_server.priority_queue.pop(0)
-            elif len(self.db_server.regular_queue) != 0:   # Regular request waiting
-                new_request = self.db_server.regular_queue.pop(0)
-            else:   # No request available for scheduling
-                break
-
-            # If request has not timed out yet
-            if new_request.id not in self.request_failure_dict.keys():
-                after_service_time = current_time + self.db_server.get_service_time()
+        self.serve_next_request(self.db_server, settings.EVENT_REQUEST_COMPLETE_FROM_DB_SERVER, current_time)
 
-                heapq.heappush(
-                    self.event_queue, 
-                    Event(     # Start processing the event
-                        type = settings.EVENT_REQUEST_COMPLETE_FROM_DB_SERVER,
-                        request = new_request,
-                        time = after_service_time
-                    )
-                )
-                self.db_server.busy_cores += 1
-                break
-
-            # Request was timed out
-            else:
-                if self.db_call_is_synchronous:
-                    self.application_server.busy_cores -= 1
-    
-        # Update statistics
-        self.number_in_app_server = calculate_number_in_the_server(self.application_server)
-        self.number_in_db_server = calculate_number_in_the_server(self.db_server)
-        self.number_in_system = self.number_in_app_server + self.number_in_db_server
+        # Core of the app server held for a timed out synchronous db call became free
+        if is_failed and held_app_core:
+            self.serve_next_request(self.application_server, settings.EVENT_REQUEST_COMPLETE_FROM_APP_SERVER, current_time)
 
     def handle_event_request_failure(self, event:Event, current_time:float, is_timeout:bool=False):
         """Event handled when timeout is raised or buffer queue is full
@@ -327,52 +376,40 @@ class EventHandler:
             event (Event): Event to be handled
             current_time (float): current time of the simulation
         """
-        
+        request = event.request
         if not is_timeout:
-            self.logger.critical(f"REQUEST_DROPPED : {event.request.id} : {current_time}")
-            if event.request.request_priority == settings.HIGH_PRIORITY:
+            if request.request_priority == settings.HIGH_PRIORITY:
                 self.priority_request_dropped += 1
             else:
                 self.regular_request_dropped += 1
+            request.state = settings.REQUEST_DROPPED
+            self.timeouts.cancel(request.timeout_entry)    # Client retries now, not again at the timeout
         else:
-            self.logger.critical(f"REQUEST_TIMEDOUT : {event.request.id} : {current_time}")
-
-        self.request_failure_dict[event.request.id] = 1
-
-        if int(current_time/10)*10 in self.temporal_data.keys():
-            self.temporal_data[int(current_time/10)*10] += 1
-        else:
-            self.temporal_data[int(current_time/10)*10] = 1
+            request.state = settings.REQUEST_TIMED_OUT
+            self.request_timed_out += 1
+
+        # Timed out request leaves the waiting queue right away
+        waiting_server = request.waiting_server
+        if waiting_server is not None:
+            waiting_server.queue.remove(request.id, request.request_priority, current_time)
+            request.waiting_server = None
+
+            # Core of the app server held for the synchronous db call becomes free
+            if request.holds_app_core:
+                self.application_server.release_core(request.request_priority, current_time)
+                request.holds_app_core = False
+                self.serve_next_request(self.application_server, settings.EVENT_REQUEST_COMPLETE_FROM_APP_SERVER, current_time)
+
+        self.schedule_arrival(
+            client_id = request.client_id,
+            request_priority = request.request_priority,
+            time = current_time + get_retry_delay(self.retry_delay, self.random_streams.client(request.client_id).retry),
+            is_timed_out = is_timeout
+        )
 
-        if not is_timeout:
-            heapq.heappush(
-            self.event_queue,
-            Event(
-                type = settings.EVENT_REQUEST_ARRIVAL,
-                request = Request(
-                    request_priority = event.request.request_priority,
-                    request_timeout = self.request_timeout,
-                    need_server = settings.APPLICATION_SERVER,
-                    arrival_time = current_time + get_retry_delay(self.retry_delay) 
-                ),
-                time = current_time + get_retry_delay(self.retry_delay) 
-                )
-            )
-        else:
-            heapq.heappush(
-            self.event_queue,
-            Event(
-                type = settings.EVENT_REQUEST_ARRIVAL,
-                request = Request(
-                    request_priority = event.request.request_priority,
-                    request_timeout = self.request_timeout,
-                    need_server = settings.APPLICATION_SERVER,
-                    arrival_time = current_time + get_retry_delay(self.retry_delay),
-                    is_timed_out = True 
-                ),
-                time = current_time + get_retry_delay(self.retry_delay) 
-                )
-            )
+        # Requests timed out while being served are released once their service completes
+        if not is_timeout or waiting_server is not None:
+            request.release()
 
     def handle_event(self, event:Event, current_time:float):
         """Event handle function
@@ -381,7 +418,6 @@ class EventHandler:
             event (Event): Event object
             current_time (float): simulation time
         """
-        self.logger.critical(event)
         if event.type == settings.EVENT_REQUEST_ARRIVAL:    # When a request arrives at the application server
             self.handle_event_request_arrival(event=event, current_time=current_time)
 
@@ -391,6 +427,135 @@ class EventHandler:
         elif event.type == settings.EVENT_REQUEST_COMPLETE_FROM_DB_SERVER:
                 self.handle_event_request_complete_from_db_server(event=event, current_time=current_time)
 
-        elif event.type == settings.EVENT_TIMEOUT:
-            if event.request.id not in self.request_completed_dict.keys():  # Completed
-                self.handle_event_request_failure(event=event, current_time=current_time, is_timeout=True)
\ No newline at end of file
+        elif event.type == settings.EVENT_TIMEOUT:  # Timeouts of completed requests are cancelled
+            self.handle_event_request_failure(event=event, current_time=current_time, is_timeout=True)
+
+    def cumulative_metrics(self, current_time:float):
+        """Counters and time integrals since the statistics were reset, sampled by the time series
+
+        Args:
+            current_time (float): Current simulation time
+
+        Returns:
+            np.ndarray: Goodput and badput completions, drops, timeouts, then busy cores and queue length
+                        integrals of the app and db servers
+        """
+        return np.array([
+            self.request_completed_from_system_for_goodput,
+            self.request_completed_from_system_for_badput,
+            self.priority_request_dropped + self.regular_request_dropped,
+            self.request_timed_out,
+            self.application_server.busy_integral(current_time),
+            self.application_server.queue.length_integral(current_time),
+            self.db_server.busy_integral(current_time),
+            self.db_server.queue.length_integral(current_time)
+        ], dtype=float)
+
+    def response_time_sketches(self):
+        """Response time sketches of every tier and priority class
+
+        Returns:
+            dict: Tier name ("system", "app_server" or "db_server") -> list of sketches indexed by priority
+        """
+        return {
+            "system" : self.system_sketches,
+            "app_server" : self.app_server_sketches,
+            "db_server" : self.db_server_sketches
+        }
+
+    def tier_of(self, server:Server):
+        """Tier code of a server
+
+        Args:
+            server (Server): Application server, db server or None
+
+        Returns:
+            int: settings.APPLICATION_SERVER, settings.DB_SERVER or settings.NO_TIER
+        """
+        if server is self.application_server:
+            return settings.APPLICATION_SERVER
+        if server is self.db_server:
+            return settings.DB_SERVER
+        return settings.NO_TIER
+
+    def handle_event_traced(self, event:Event, current_time:float):
+        """Record the event in the trace, then handle it
+
+        Args:
+            event (Event): Event object
+            current_time (float): simulation time
+        """
+        if event.type == settings.EVENT_REQUEST_COMPLETE_FROM_DB_SERVER:
+            tier = settings.DB_SERVER
+        elif event.type == settings.EVENT_TIMEOUT:  # Tier the request waits at
+            tier = self.tier_of(event.request.waiting_server)
+        else:
+            tier = settings.APPLICATION_SERVER
+        self.trace.record(current_time, event.type, event.request.id, tier, 
+                          len(self.application_server.queue), len(self.db_server.queue))
+        EventHandler.handle_event(self, event, current_time)
+
+    def queues(self):
+        """Waiting queues of the servers, by name
+
+        Returns:
+            dict: "app_server" and "db_server" -> RequestQueue
+        """
+        return {"app_server" : self.application_server.queue, "db_server" : self.db_server.queue}
+
+    def run_until(self, end_time:float, current_time:float, max_events:int = None):
+        """Handle events in time order up to, not including, end_time
+
+        Args:
+            end_time (float): Simulation time to run until
+            current_time (float): Current simulation time
+            max_events (int): Stop after this many events, None for no limit
+
+        Returns:
+            (float, int): Time of the last handled event, number of events handled
+        """
+        event_queue = self.event_queue
+        pop_event = self.pop_event
+        timeouts = self.timeouts
+        arrivals = self.arrivals
+        handle_event = self.handle_event
+        if self.instrumentation is not None:    # Completions of requests that timed out meanwhile are stale
+            handle_event = self.instrumentation.instrument(
+                handle_event,
+                event_type_of = lambda event: event.type,
+                is_stale = lambda event: event.type in (settings.EVENT_REQUEST_COMPLETE_FROM_APP_SERVER, settings.EVENT_REQUEST_COMPLETE_FROM_DB_SERVER)
+                                         and event.request.state != settings.REQUEST_IN_SERVICE,
+                event_list = event_queue,
+                arrivals = arrivals,
+                timeouts = timeouts,
+                queues = self.queues()
+            )
+
+        events_processed = 0
+        max_events = -1 if max_events is None else max_events   # Never reached by the count
+        while True:
+            # Earliest of the event list, the arrival FIFO and the next timeout, events from end_time on are left for later
+            next_timeout = timeouts.next_time()
+            event = event_queue[0] if event_queue else None
+            from_arrivals = arrivals and (event is None or arrivals[0].time < event.time)
+            if from_arrivals:
+                event = arrivals[0]
+            if event is not None and event.time <= next_timeout:
+                if event.time >= end_time:
+                    break
+                event = arrivals.popleft() if from_arrivals else pop_event()
+            else:
+                if next_timeout >= end_time:
+                    break
+                deadline, request = timeouts.pop()
+                event = Event.acquire(type = settings.EVENT_TIMEOUT, request = request, time = deadline)
+            current_time = event.time
+            handle_event(
+                event = event,
+                current_time = current_time
+            )
+            event.release()
+            events_processed += 1
+            if events_processed == max_events:
+                break
+        return current_time, events_processed
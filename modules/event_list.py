@@ -0,0 +1,281 @@
+import settings
+
+import bisect
+import heapq
+import math
+from functools import partial
+from operator import attrgetter, itemgetter
+
+
+class HeapEventList(list):
+    def __init__(self, time_of = itemgetter(0)) -> None:
+        """Binary heap of events, O(log n) per hold, the default future event list
+
+        A plain list driven by heapq, so pushes and pops run in C. Every event list indexes its
+        earliest event as [0], like a heap, and hands out its push and pop functions through
+        operations, which the engines bind once.
+
+        Args:
+            time_of (callable): Time of an event, unused by the heap which compares events
+        """
+        super().__init__()
+
+    def operations(self):
+        """Push and pop functions of the event list
+
+        Returns:
+            (callable, callable): Push of an event, pop of the earliest event
+        """
+        return partial(heapq.heappush, self), partial(heapq.heappop, self)
+
+
+class CalendarEventList:
+    def __init__(self, time_of = itemgetter(0)) -> None:
+        """Calendar queue of events (Brown 1988), O(1) amortized per hold
+
+        Events are hashed by time into a circular array of sorted buckets, a day each, so the
+        earliest event is found by scanning forward from the day of the last one. The number of
+        buckets follows the number of events and the day width the mean gap between the first
+        events, recomputed when the calendar is resized.
+
+        Args:
+            time_of (callable): Time of an event, itemgetter(0) for tuples
+        """
+        self.time_of = time_of
+        self.size = 0
+        self.width = 1.0    # Simulated seconds per bucket
+        self.buckets = [[] for _ in range(settings.CALENDAR_MIN_BUCKETS)]
+        self.day = 0    # Absolute bucket of the earliest event, bucket day % len(buckets)
+
+    def operations(self):
+        """Push and pop functions of the event list
+
+        Returns:
+            (callable, callable): Push of an event, pop of the earliest event
+        """
+        return self.push, self.pop
+
+    def push(self, event):
+        """Add an event
+
+        Args:
+            event (tuple | Event): Event to schedule
+        """
+        day = int(self.time_of(event) / self.width)
+        bisect.insort(self.buckets[day % len(self.buckets)], event)
+        if day < self.day:  # Earlier than the event the scan stopped at
+            self.day = day
+        self.size += 1
+        if self.size > 2 * len(self.buckets):
+            self.resize(2 * len(self.buckets))
+
+    def locate(self):
+        """Bucket holding the earliest event, moving the current day to it
+
+        Returns:
+            list: Sorted bucket whose first event is the earliest one
+        """
+        if not self.size:
+            raise IndexError("empty event list")
+        buckets = self.buckets
+        count = len(buckets)
+        width = self.width
+        time_of = self.time_of
+        for day in range(self.day, self.day + count):
+            bucket = buckets[day % count]
+            if bucket and int(time_of(bucket[0]) / width) <= day:
+                self.day = day
+                return bucket
+
+        # Nothing within a year, the earliest of the bucket heads is
+        bucket = min((bucket for bucket in buckets if bucket), key = lambda bucket: bucket[0])
+        self.day = int(time_of(bucket[0]) / width)
+        return bucket
+
+    def pop(self):
+        """Remove the earliest event
+
+        Returns:
+            tuple | Event: Earliest event
+        """
+        event = self.locate().pop(0)
+        self.size -= 1
+        if self.size < len(self.buckets) // 2 and len(self.buckets) > settings.CALENDAR_MIN_BUCKETS:
+            self.resize(len(self.buckets) // 2)
+        return event
+
+    def resize(self, count:int):
+        """Rebuild the calendar with a new number of buckets and day width
+
+        Args:
+            count (int): Number of buckets
+        """
+        events = sorted(event for bucket in self.buckets for event in bucket)
+        times = [self.time_of(event) for event in events[:settings.CALENDAR_WIDTH_SAMPLE]]
+        gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+        if gaps:
+            # Mean gap without the outliers, three of them per day
+            mean = sum(gaps) / len(gaps)
+            close = [gap for gap in gaps if gap <= 2 * mean]
+            if close and sum(close) > 0:
+                self.width = 3 * sum(close) / len(close)
+        self.buckets = [[] for _ in range(count)]
+        for event in events:
+            self.buckets[int(self.time_of(event) / self.width) % count].append(event)  # Appended in order, buckets stay sorted
+        self.day = int(times[0] / self.width) if times else 0
+
+    def __getitem__(self, index:int):
+        return self.locate()[0]     # Earliest event, the only one indexed
+
+    def __len__(self):
+        return self.size
+
+
+class LadderEventList:
+    def __init__(self, time_of = itemgetter(0)) -> None:
+        """Ladder queue of events (Tang, Goh and Thng 2005), O(1) amortized per hold
+
+        Far events are appended unsorted to the top. When the bottom runs out, the top is spread
+        over the buckets of a rung, and the first non-empty bucket of the lowest rung is either
+        sorted into the bottom or, when it holds more than LADDER_THRESHOLD events, spread over a
+        finer rung below. Only the few events of the bottom are ever kept sorted.
+
+        Args:
+            time_of (callable): Time of an event, itemgetter(0) for tuples
+        """
+        self.time_of = time_of
+        self.size = 0
+        self.top = []
+        self.top_start = -math.inf   # Events from this time on go to the top
+        self.top_min = math.inf
+        self.top_max = -math.inf
+        self.rungs = []     # [start, width, buckets, next bucket, events], the lowest rung last
+        self.bottom = []    # Sorted events, the earliest at bottom_index
+        self.bottom_index = 0
+
+    def operations(self):
+        """Push and pop functions of the event list
+
+        Returns:
+            (callable, callable): Push of an event, pop of the earliest event
+        """
+        return self.push, self.pop
+
+    def push(self, event):
+        """Add an event
+
+        Args:
+            event (tuple | Event): Event to schedule
+        """
+        self.size += 1
+        time = self.time_of(event)
+        if time >= self.top_start:
+            self.top.append(event)
+            self.top_min = min(self.top_min, time)
+            self.top_max = max(self.top_max, time)
+            return
+        for rung in self.rungs:
+            start, width, buckets, current, _ = rung
+            index = min(int((time - start) / width), len(buckets) - 1)
+            if index >= current:
+                buckets[index].append(event)
+                rung[4] += 1
+                return
+        bisect.insort(self.bottom, event, self.bottom_index)
+
+    def spread(self, events:list, start:float, width:float, count:int):
+        """Add a rung holding events over count buckets from start
+
+        Args:
+            events (list): Events of the rung
+            start (float): Time of the start of the first bucket
+            width (float): Simulated seconds per bucket
+            count (int): Number of buckets
+        """
+        buckets = [[] for _ in range(count)]
+        time_of = self.time_of
+        for event in events:
+            buckets[min(int((time_of(event) - start) / width), count - 1)].append(event)
+        self.rungs.append([start, width, buckets, 0, len(events)])
+
+    def refill(self):
+        """Sort the next events into the bottom, from the lowest rung or else from the top
+        """
+        while self.bottom_index == len(self.bottom):
+            while self.rungs and self.rungs[-1][4] == 0:
+                self.rungs.pop()
+            if not self.rungs:
+                if not self.top:
+                    raise IndexError("empty event list")
+                # Top becomes the first rung, events arriving later start a new top
+                events, low, high = self.top, self.top_min, self.top_max
+                self.top, self.top_min, self.top_max = [], math.inf, -math.inf
+                self.top_start = high
+                if len(events) <= settings.LADDER_THRESHOLD or high == low:
+                    self.bottom, self.bottom_index = sorted(events), 0
+                else:
+                    self.spread(events, low, (high - low) / len(events), len(events))
+                continue
+
+            rung = self.rungs[-1]
+            start, width, buckets, current, _ = rung
+            while not buckets[current]:
+                current += 1
+            events = buckets[current]
+            buckets[current] = []
+            rung[3] = current + 1
+            rung[4] -= len(events)
+
+            # A crowded bucket gets a finer rung, unless its events share their time or the ladder is full
+            low = start + current * width
+            if len(events) > settings.LADDER_THRESHOLD and len(self.rungs) < settings.LADDER_MAX_RUNGS:
+                times = [self.time_of(event) for event in events]
+                if min(times) < max(times):
+                    self.spread(events, low, width / len(events), len(events))
+                    continue
+            self.bottom, self.bottom_index = sorted(events), 0
+
+    def pop(self):
+        """Remove the earliest event
+
+        Returns:
+            tuple | Event: Earliest event
+        """
+        if self.bottom_index == len(self.bottom):
+            self.refill()
+        event = self.bottom[self.bottom_index]
+        self.bottom[self.bottom_index] = None   # Handled events are not kept alive
+        self.bottom_index += 1
+        self.size -= 1
+        return event
+
+    def __getitem__(self, index:int):
+        if self.bottom_index == len(self.bottom):
+            self.refill()
+        return self.bottom[self.bottom_index]   # Earliest event, the only one indexed
+
+    def __len__(self):
+        return self.size
+
+
+# Name -> event list class, selected per run with the event_list argument
+EVENT_LISTS = {
+    "heap" : HeapEventList,     # heapq binary heap
+    "calendar" : CalendarEventList,     # Calendar queue
+    "ladder" : LadderEventList  # Ladder queue
+}
+
+
+def make_event_list(name:str, engine:str):
+    """Empty event list of a run
+
+    Args:
+        name (str): Event list of EVENT_LISTS
+        engine (str): Engine of the run, its events are Event objects or tuples starting with their time
+
+    Returns:
+        HeapEventList | CalendarEventList | LadderEventList: Empty event list
+    """
+    if name not in EVENT_LISTS:
+        raise ValueError(f"Unknown event list {name}, expected one of {', '.join(EVENT_LISTS)}")
+    return EVENT_LISTS[name](time_of = attrgetter("time") if engine == "object" else itemgetter(0))
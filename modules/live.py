@@ -0,0 +1,135 @@
+import settings
+
+import asyncio
+import queue
+import threading
+from multiprocessing import get_context
+
+from modules.simulator import Simulator
+from modules.topology_simulator import TopologySimulator
+
+
+def watch_simulation(config:dict, interval:float, until:float, stop_when_saturated:bool, messages, stop):
+    """Run a simulation in steps, posting its snapshots then its result, in a worker thread or process
+
+    Args:
+        config (dict): Simulator arguments, a TopologySimulator is run when they have a topology
+        interval (float): Simulated seconds between snapshots
+        until (float): Simulation time of the last snapshot, simulation_time when None
+        stop_when_saturated (bool): Stop after SATURATION_SNAPSHOTS saturated snapshots in a row
+        messages (queue.Queue | multiprocessing.Queue): Receives ("snapshot", MetricSnapshot) messages,
+                                                       then ("result", SimulationResult) or ("error", exception)
+        stop (threading.Event | multiprocessing.Event): Set to stop the simulation at its next snapshot
+    """
+    try:
+        simulator = (TopologySimulator if "topology" in config else Simulator)(**config)
+        for snapshot in simulator.snapshots(interval, until, stop_when_saturated):
+            messages.put(("snapshot", snapshot))
+            if stop.is_set():
+                break
+        messages.put(("result", simulator.finish()))
+    except Exception as error:
+        messages.put(("error", error))
+
+
+class LiveSimulation:
+    def __init__(self, config:dict, interval:float, until:float = None, stop_when_saturated:bool = False, process:bool = False) -> None:
+        """Simulation running in a worker thread or process, its snapshots consumed with async for
+
+        The event loop only waits on the snapshots, in an executor thread, so a controller or a
+        dashboard stays responsive while the simulation runs. Leaving the async for, or stop, ends
+        the simulation at its next snapshot, and its result then covers the time simulated so far.
+
+            live = LiveSimulation(config, interval = 10, stop_when_saturated = True)
+            async for snapshot in live:
+                print(snapshot.summary())
+            result = await live.wait()
+
+        Args:
+            config (dict): Simulator arguments, a TopologySimulator is run when they have a topology
+            interval (float): Simulated seconds between snapshots
+            until (float): Simulation time of the last snapshot, simulation_time by default
+            stop_when_saturated (bool): Stop after SATURATION_SNAPSHOTS saturated snapshots in a row
+            process (bool): Run in a spawned process rather than a thread, so it does not hold the GIL of the event loop
+        """
+        self.config = config
+        self.interval = interval
+        self.until = until
+        self.stop_when_saturated = stop_when_saturated
+        self.process = process
+        self.worker = None
+        self.messages = None
+        self.stop_event = None
+        self.result = None  # SimulationResult, once the simulation has finished
+        self.error = None   # Exception raised by the simulation
+
+    def start(self):
+        """Start the simulation, done by the first async for otherwise
+        """
+        if self.worker is not None:
+            return
+        if self.process:
+            context = get_context("spawn")
+            self.messages, self.stop_event = context.Queue(), context.Event()
+            self.worker = context.Process(
+                target = watch_simulation,
+                args = (self.config, self.interval, self.until, self.stop_when_saturated, self.messages, self.stop_event),
+                daemon = True
+            )
+        else:
+            self.messages, self.stop_event = queue.Queue(), threading.Event()
+            self.worker = threading.Thread(
+                target = watch_simulation,
+                args = (self.config, self.interval, self.until, self.stop_when_saturated, self.messages, self.stop_event),
+                name = "live-simulation",
+                daemon = True
+            )
+        self.worker.start()
+
+    def stop(self):
+        """Stop the simulation at its next snapshot
+        """
+        if self.stop_event is not None:
+            self.stop_event.set()
+
+    def receive(self):
+        """Next message of the worker, waiting for it
+
+        Returns:
+            (str, object): "snapshot", "result" or "error", and its payload
+        """
+        while True:
+            try:
+                return self.messages.get(timeout = settings.LIVE_POLL_INTERVAL)
+            except queue.Empty:
+                if not self.worker.is_alive() and self.messages.empty():
+                    return "error", RuntimeError(f"The simulation worker exited without a result, exit code {getattr(self.worker, 'exitcode', None)}")
+
+    async def __aiter__(self):
+        self.start()
+        loop = asyncio.get_running_loop()
+        try:
+            while self.result is None:
+                if self.error is not None:
+                    raise self.error
+                kind, payload = await loop.run_in_executor(None, self.receive)
+                if kind == "snapshot":
+                    yield payload
+                elif kind == "result":
+                    self.result = payload
+                    await loop.run_in_executor(None, self.worker.join)
+                else:
+                    self.error = payload
+        finally:
+            if self.result is None:     # The consumer left early
+                self.stop()
+
+    async def wait(self):
+        """Result of the simulation, skipping the snapshots not consumed yet
+
+        Returns:
+            SimulationResult: Results row and response time sketches of the run
+        """
+        async for _ in self:
+            pass
+        return self.result
@@ -0,0 +1,407 @@
+import settings
+
+import importlib.util
+
+import numpy as np
+
+from modules.event_handler import EventHandler
+from modules.request_queue import RequestQueue
+from utils.quantile_sketch import QuantileSketch
+
+
+def numba_unsupported_reason(common_random_numbers:bool = False, trace = None, output_analysis = None, instrumentation = None):
+    """Why a run cannot use the numba engine
+
+    Args:
+        common_random_numbers (bool): Whether clients have their own random streams
+        trace (TraceRecorder): Event trace, None when tracing is off
+        output_analysis (OutputAnalysis): Warm-up detection and batch means, None when off
+        instrumentation (Instrumentation): Counters and timers of the event loop, None when off
+
+    Returns:
+        str: Reason, None if the numba engine can run it
+    """
+    if importlib.util.find_spec("numba") is None:
+        return "numba is not installed"
+    if common_random_numbers:
+        return "common random numbers are not supported"
+    if trace is not None or output_analysis is not None or instrumentation is not None:
+        return "traces, output analysis and instrumentation are not supported"
+    return None
+
+
+class KernelRequestQueue(RequestQueue):
+    def __init__(self, priority_classes:int, capacity:int, handler:"NumbaEventHandler", tier:int) -> None:
+        """Waiting queue of a server whose requests wait in the linked lists of the numba kernel
+
+        The class lengths and time integrals are copied after every run_until, the FIFOs are only
+        rebuilt from the kernel when they are read, so that a step or a snapshot costs the same
+        whatever the length of the queue.
+
+        Args:
+            priority_classes (int): Number of priority classes
+            capacity (int): Maximum number of waiting requests per priority class
+            handler (NumbaEventHandler): Handler running the kernel
+            tier (int): Tier of the server in the kernel
+        """
+        super().__init__(priority_classes, capacity)
+        self.handler = handler
+        self.tier = tier
+        self.class_lengths = [0] * priority_classes
+        self.stale = False  # Whether the kernel ran since the FIFOs were last rebuilt
+
+    @property
+    def fifos(self):
+        if self.stale:
+            self.stale = False
+            self.handler.fill_fifos(self.tier, self.kernel_fifos)
+        return self.kernel_fifos
+
+    @fifos.setter
+    def fifos(self, fifos:list):
+        self.kernel_fifos = fifos
+
+    def class_length(self, request_priority:int):
+        """Number of waiting requests of a priority class, as of the last run_until
+
+        Args:
+            request_priority (int): Priority class
+
+        Returns:
+            int: Number of waiting requests
+        """
+        return self.class_lengths[request_priority]
+
+
+class NumbaEventHandler(EventHandler):
+    def __init__(self, **kwargs) -> None:
+        """Event handler running the two-tier model in a numba-compiled kernel, see modules.numba_kernel
+
+        Events, timeouts, queues and requests live in numpy arrays handled by the kernel, which
+        mirrors ArrayEventHandler and draws the same variates in the same order, so both engines
+        give the same results for the same seed. The counters, servers and sketches of the handler
+        are brought up to date after every run_until, in time for the time series. Takes the same
+        arguments as EventHandler, without trace, output analysis, instrumentation or common random
+        numbers.
+        """
+        super().__init__(**kwargs)
+        from modules import numba_kernel as kernel
+
+        reason = numba_unsupported_reason(self.random_streams.common_random_numbers, self.trace, self.output_analysis, self.instrumentation)
+        if reason is not None and reason != "numba is not installed":   # Runs interpreted without numba, e.g. in checks
+            raise ValueError(f"Numba engine: {reason}")
+
+        sketch = QuantileSketch()
+        params = np.zeros(kernel.PARAM_COUNT)
+        for server in [self.application_server, self.db_server]:
+            tier = self.tier_of(server)
+            server.queue = KernelRequestQueue(settings.PRIORITY_CLASSES, server.queue.capacity, self, tier)
+            params[kernel.SERVICE_TIME + tier] = server.average_service_time
+            params[kernel.CORES + tier] = server.core_count
+            params[kernel.QUEUE_CAPACITY + tier] = server.queue.capacity
+        params[kernel.SKETCH_INVERSE_LOG_GAMMA] = sketch.inverse_log_gamma
+        params[kernel.SKETCH_OFFSET] = sketch.offset
+        params[kernel.SKETCH_MIN_VALUE] = sketch.min_value
+
+        shape = (2, settings.PRIORITY_CLASSES)     # Servers, indexed by tier, and priority classes
+        self.state = kernel.KernelState(
+            counters = np.zeros(kernel.COUNTER_COUNT, dtype = np.int64),
+            sums = np.zeros(kernel.SUM_COUNT),
+            params = params,
+            fields = np.zeros((0, kernel.FIELD_COUNT), dtype = np.int64),
+            arrival_time = np.zeros(0),
+            free_slots = np.zeros(0, dtype = np.int64),
+            heap_time = np.zeros(0),
+            heap_entry = np.zeros((0, 3), dtype = np.int64),
+            timeout_deadline = np.zeros((0, 0)),
+            timeout_slot = np.zeros((0, 0), dtype = np.int64),
+            timeout_duration = np.zeros(0),
+            timeout_head = np.zeros(0, dtype = np.int64),
+            timeout_tail = np.zeros(0, dtype = np.int64),
+            busy = np.zeros(shape, dtype = np.int64),
+            busy_area = np.zeros(shape),
+            busy_since = np.zeros(shape),
+            queue_head = np.full(shape, -1, dtype = np.int64),
+            queue_tail = np.full(shape, -1, dtype = np.int64),
+            queue_length = np.zeros(shape, dtype = np.int64),
+            queue_area = np.zeros(shape),
+            queue_since = np.zeros(shape),
+            sketch_counts = np.zeros((kernel.SKETCH_COUNT, settings.PRIORITY_CLASSES, len(sketch.counts)), dtype = np.int64),
+            sketch_zero = np.zeros((kernel.SKETCH_COUNT, settings.PRIORITY_CLASSES), dtype = np.int64),
+            variates = np.zeros((kernel.STREAM_COUNT, 0)),
+            variate_position = np.zeros(kernel.STREAM_COUNT, dtype = np.int64)
+        )
+        self.sync_params()
+        self.grow(settings.NUMBA_INITIAL_CAPACITY)
+        self.pending_arrivals = []  # Arrivals scheduled from python, handed to the kernel by run_until
+
+    def sync_params(self):
+        """Copy the model parameters of the handler to the kernel, which may have changed since, e.g. in a fork
+        """
+        from modules import numba_kernel as kernel
+
+        params = self.state.params
+        params[kernel.APP_TO_DB_PROB] = self.app_to_db_prob
+        params[kernel.THINK_TIME] = self.think_time
+        params[kernel.PRIORITY_PROB] = self.priority_prob
+        params[kernel.RETRY_DELAY] = self.retry_delay
+        params[kernel.REQUEST_TIMEOUT] = self.request_timeout
+        params[kernel.SYNCHRONOUS] = bool(self.db_call_is_synchronous)
+        self.state.counters[kernel.CURRENT_TIMEOUT_FIFO] = self.timeout_fifo(self.request_timeout)
+
+    def timeout_fifo(self, duration:float):
+        """FIFO of the kernel for the timeouts of a duration, as in TimeoutManager
+
+        Deadlines of one duration are scheduled in order, so each duration gets its own FIFO. An
+        empty FIFO is reused for a new duration, a FIFO is only added when none is empty.
+
+        Args:
+            duration (float): Timeout duration
+
+        Returns:
+            int: Index of the FIFO
+        """
+        state = self.state
+        same = np.flatnonzero(state.timeout_duration == duration)
+        if len(same):
+            return int(same[0])
+        empty = np.flatnonzero(state.timeout_head == state.timeout_tail)
+        if len(empty):
+            fifo = int(empty[0])
+        else:
+            fifo = len(state.timeout_head)
+            width = state.timeout_slot.shape[1]
+            self.state = state._replace(
+                timeout_deadline = np.vstack([state.timeout_deadline, np.zeros((1, width))]),
+                timeout_slot = np.vstack([state.timeout_slot, np.full((1, width), -1, dtype = np.int64)]),
+                timeout_duration = np.append(state.timeout_duration, duration),
+                timeout_head = np.append(state.timeout_head, 0),
+                timeout_tail = np.append(state.timeout_tail, 0)
+            )
+        self.state.timeout_duration[fifo] = duration
+        return fifo
+
+    def reset_statistics(self, current_time:float):
+        """Discard the statistics collected so far
+
+        Args:
+            current_time (float): Current simulation time, start of the measurement window
+        """
+        super().reset_statistics(current_time)
+        state = getattr(self, "state", None)
+        if state is None:   # Nothing collected yet
+            return
+        from modules import numba_kernel as kernel
+
+        state.counters[kernel.SYSTEM_GOODPUT:kernel.TIMED_OUT + 1] = 0
+        state.sums[:] = 0.0
+        state.busy_area[:] = 0.0
+        state.busy_since[:] = current_time
+        state.queue_area[:] = 0.0
+        state.queue_since[:] = current_time
+        state.sketch_counts[:] = 0
+        state.sketch_zero[:] = 0
+
+    def streams(self):
+        """Random streams the kernel draws from, in the order of its stream indices
+
+        Returns:
+            list: App service, db service, routing, priority and retry streams
+        """
+        streams = self.random_streams
+        return [streams.app_service, streams.db_service, streams.routing, streams.priority, streams.retry]
+
+    def refill_variates(self, leftovers:list):
+        """Give the kernel a fresh block of every random stream, after the variates left over
+
+        Blocks are drawn straight from the generators of the streams, which return the same
+        sequence whatever the block sizes, so the kernel sees the variates RandomStream would.
+
+        Args:
+            leftovers (list): Variates of every stream not drawn yet, in order
+        """
+        width = max(settings.NUMBA_BLOCK_SIZE, max(len(leftover) for leftover in leftovers))
+        variates = np.empty((len(leftovers), width))
+        for index, (stream, leftover) in enumerate(zip(self.streams(), leftovers)):
+            variates[index, :len(leftover)] = leftover
+            variates[index, len(leftover):] = getattr(stream.generator, stream.distribution)(size = width - len(leftover), **stream.parameters)
+        self.state = self.state._replace(variates = variates)
+        self.state.variate_position[:] = 0
+
+    def grow(self, slots:int):
+        """Make room for at least this many requests, with their events and timeouts
+
+        Args:
+            slots (int): Number of request slots needed
+        """
+        state = self.state
+        capacity = len(state.arrival_time)
+        if capacity >= slots and state.timeout_slot.shape[1] - np.max(state.timeout_tail - state.timeout_head, initial = 0) > 2:
+            return
+        capacity = max(slots, 2 * capacity)
+
+        def resized(column, length):
+            grown = np.zeros((length,) + column.shape[1:], dtype = column.dtype)
+            grown[:len(column)] = column
+            return grown
+
+        # Pending timeouts keep their absolute positions, at new places modulo the power of 2 capacity
+        timeout_capacity = 1 << int(max(capacity, 2 * state.timeout_slot.shape[1]) - 1).bit_length()
+        timeout_deadline = np.zeros((len(state.timeout_head), timeout_capacity))
+        timeout_slot = np.full((len(state.timeout_head), timeout_capacity), -1, dtype = np.int64)
+        for fifo, (head, tail) in enumerate(zip(state.timeout_head, state.timeout_tail)):
+            positions = np.arange(head, tail)
+            timeout_deadline[fifo, positions % timeout_capacity] = state.timeout_deadline[fifo, positions % state.timeout_slot.shape[1]]
+            timeout_slot[fifo, positions % timeout_capacity] = state.timeout_slot[fifo, positions % state.timeout_slot.shape[1]]
+
+        self.state = state._replace(
+            fields = resized(state.fields, capacity),
+            arrival_time = resized(state.arrival_time, capacity),
+            free_slots = resized(state.free_slots, capacity),
+            heap_time = resized(state.heap_time, capacity),
+            heap_entry = resized(state.heap_entry, capacity),
+            timeout_deadline = timeout_deadline,
+            timeout_slot = timeout_slot
+        )
+
+    def schedule_arrival(self, client_id:int, request_priority:int, time:float, is_timed_out:bool = False):
+        """Schedule the arrival of a new request at the application server
+
+        Args:
+            client_id (int): Client sending the request
+            request_priority (int): Priority of the request
+            time (float): Arrival time of the request
+            is_timed_out (bool): Whether the request retries a timed out one
+        """
+        self.pending_arrivals.append((client_id, request_priority, time, int(is_timed_out)))
+
+    def in_flight(self):
+        """Number of requests currently holding a slot
+
+        Returns:
+            int: Requests in flight
+        """
+        from modules import numba_kernel as kernel
+
+        return int(self.state.counters[kernel.SLOT_COUNT] - self.state.counters[kernel.FREE_COUNT])
+
+    def pending_events(self):
+        """Events waiting in the kernel heap, arrivals not handed to it yet included, and timeouts pending
+
+        Returns:
+            (int, int): Number of events, number of timeouts neither cancelled nor fired
+        """
+        from modules import numba_kernel as kernel
+
+        state = self.state
+        timeouts = 0
+        for fifo, (head, tail) in enumerate(zip(state.timeout_head, state.timeout_tail)):
+            positions = np.arange(head, tail) % state.timeout_slot.shape[1]
+            timeouts += int(np.count_nonzero(state.timeout_slot[fifo, positions] >= 0))
+        return int(state.counters[kernel.HEAP_SIZE]) + len(self.pending_arrivals), timeouts
+
+    def run_until(self, end_time:float, current_time:float, max_events:int = None):
+        """Handle events in time order up to, not including, end_time, in the kernel
+
+        Args:
+            end_time (float): Simulation time to run until
+            current_time (float): Current simulation time
+            max_events (int): Stop after this many events, None for no limit
+
+        Returns:
+            (float, int): Time of the last handled event, number of events handled
+        """
+        from modules import numba_kernel as kernel
+
+        self.sync_params()
+        # Arrivals scheduled from python go in first, with room for them and the events they lead to
+        arrival_fields = np.array([(client_id, request_priority, is_timed_out) for client_id, request_priority, _, is_timed_out
+                                   in self.pending_arrivals], dtype = np.int64).reshape(-1, 3)
+        arrival_times = np.array([time for _, _, time, _ in self.pending_arrivals], dtype = np.float64)
+        self.grow(self.in_flight() + len(self.pending_arrivals) + 2)
+        self.pending_arrivals = []
+
+        # The kernel holds the variates left in the streams while it runs, and hands them back after. Streams
+        # still reading the rows handed back last time just give their positions back, without a copy
+        streams = self.streams()
+        if all(isinstance(stream.block, np.ndarray) and stream.block.base is self.state.variates for stream in streams):
+            self.state.variate_position[:] = [stream.index for stream in streams]
+        else:
+            self.refill_variates([stream.block[stream.index:] for stream in streams])
+        for stream in streams:
+            stream.block, stream.index = [], 0
+
+        events_before = self.state.counters[kernel.EVENTS]
+        event_limit = -1 if max_events is None else events_before + max_events
+        while True:
+            status, current_time = kernel.run_events(self.state, arrival_fields, arrival_times, end_time, current_time, event_limit)
+            arrival_fields, arrival_times = arrival_fields[:0], arrival_times[:0]
+            if status == kernel.DONE:
+                break
+            if status == kernel.REFILL:
+                self.refill_variates([self.state.variates[index, position:] for index, position in enumerate(self.state.variate_position)])
+            else:
+                self.grow(2 * len(self.state.arrival_time))
+
+        for index, stream in enumerate(streams):
+            stream.block, stream.index = self.state.variates[index], int(self.state.variate_position[index])
+        self.state.variate_position[:] = self.state.variates.shape[1]
+        self.sync_statistics()
+        return current_time, int(self.state.counters[kernel.EVENTS] - events_before)
+
+    def fill_fifos(self, tier:int, fifos:list):
+        """Rebuild the FIFOs of a server queue from the linked lists of the kernel
+
+        Args:
+            tier (int): Tier of the server
+            fifos (list): Ordered dict of every priority class, slot -> slot
+        """
+        from modules import numba_kernel as kernel
+
+        state = self.state
+        for request_priority, fifo in enumerate(fifos):
+            fifo.clear()
+            slot = state.queue_head[tier, request_priority]
+            while slot >= 0:
+                fifo[int(slot)] = int(slot)
+                slot = state.fields[slot, kernel.NEXT]
+
+    def sync_statistics(self):
+        """Bring the counters, servers, queue lengths and sketches of the handler up to date with the kernel
+        """
+        from modules import numba_kernel as kernel
+
+        state = self.state
+        counters = state.counters
+        self.request_completed_from_system_for_goodput = int(counters[kernel.SYSTEM_GOODPUT])
+        self.request_completed_from_system_for_badput = int(counters[kernel.SYSTEM_BADPUT])
+        self.request_completed_from_app_counter_for_goodput = int(counters[kernel.APP_GOODPUT])
+        self.request_completed_from_app_counter_for_badput = int(counters[kernel.APP_BADPUT])
+        self.request_completed_from_db_counter_for_goodput = int(counters[kernel.DB_GOODPUT])
+        self.request_completed_from_db_counter_for_badput = int(counters[kernel.DB_BADPUT])
+        self.priority_request_dropped = int(counters[kernel.PRIORITY_DROPPED])
+        self.regular_request_dropped = int(counters[kernel.REGULAR_DROPPED])
+        self.request_timed_out = int(counters[kernel.TIMED_OUT])
+        self.request_counter = int(counters[kernel.REQUEST_COUNTER])
+        self.response_time_sum_of_system = float(state.sums[kernel.SYSTEM_RESPONSE_TIME])
+        self.response_time_sum_of_app_server = float(state.sums[kernel.APP_RESPONSE_TIME])
+        self.response_time_sum_of_db_server = float(state.sums[kernel.DB_RESPONSE_TIME])
+
+        for server in [self.application_server, self.db_server]:
+            tier = self.tier_of(server)
+            server.class_busy_cores = state.busy[tier].tolist()
+            server.busy_cores = sum(server.class_busy_cores)
+            server.busy_area = state.busy_area[tier].tolist()
+            server.busy_since = state.busy_since[tier].tolist()
+            queue = server.queue
+            queue.area = state.queue_area[tier].tolist()
+            queue.since = state.queue_since[tier].tolist()
+            queue.class_lengths = state.queue_length[tier].tolist()
+            queue.length = sum(queue.class_lengths)
+            queue.stale = True
+
+        for sketch_index, sketches in enumerate([self.system_sketches, self.app_server_sketches, self.db_server_sketches]):
+            for request_priority, sketch in enumerate(sketches):
+                sketch.counts = state.sketch_counts[sketch_index, request_priority].tolist()
+                sketch.zero_count = int(state.sketch_zero[sketch_index, request_priority])
+                sketch.count = sum(sketch.counts) + sketch.zero_count
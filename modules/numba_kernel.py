@@ -0,0 +1,488 @@
+import settings
+
+import math
+from collections import namedtuple
+
+try:
+    import numba
+    jit = numba.njit(cache = True)
+    NUMBA_AVAILABLE = True
+except ImportError:     # The kernel still runs, interpreted, e.g. to check it against the other engines
+    def jit(function):
+        return function
+    NUMBA_AVAILABLE = False
+
+
+# Kernel state, numpy arrays only so that numba compiles every function once
+KernelState = namedtuple("KernelState", [
+    "counters",     # int64[COUNTER_COUNT], see the counter indices below
+    "sums",         # float64[SUM_COUNT], response time sums
+    "params",       # float64[PARAM_COUNT], configuration of the model
+    "fields",       # int64[slots, FIELD_COUNT], integer columns of the requests
+    "arrival_time",     # float64[slots]
+    "free_slots",   # int64[slots], stack of free slots
+    "heap_time",    # float64[capacity], binary heap of events on (time, seq)
+    "heap_entry",   # int64[capacity, 3], seq, type and slot of every event
+    "timeout_deadline",     # float64[fifos, capacity], FIFOs of timeouts, absolute positions modulo a power of 2 capacity
+    "timeout_slot",     # int64[fifos, capacity], -1 once cancelled
+    "timeout_duration",     # float64[fifos], timeout duration of every FIFO, as in TimeoutManager
+    "timeout_head",     # int64[fifos], absolute position of the first timeout of every FIFO
+    "timeout_tail",     # int64[fifos], absolute position after the last timeout of every FIFO
+    "busy",         # int64[servers, classes], busy cores
+    "busy_area",    # float64[servers, classes], time integral of the busy cores
+    "busy_since",   # float64[servers, classes], time the busy cores last changed
+    "queue_head",   # int64[servers, classes], first waiting slot, -1 if none
+    "queue_tail",   # int64[servers, classes], last waiting slot, -1 if none
+    "queue_length",     # int64[servers, classes]
+    "queue_area",   # float64[servers, classes], time integral of the queue lengths
+    "queue_since",  # float64[servers, classes], time the queue lengths last changed
+    "sketch_counts",    # int64[SKETCH_COUNT, classes, buckets], log-bucket counts as in QuantileSketch
+    "sketch_zero",  # int64[SKETCH_COUNT, classes], values below the smallest bucket
+    "variates",     # float64[STREAM_COUNT, block], pre-drawn variates of every random stream
+    "variate_position"  # int64[STREAM_COUNT], next variate of every stream
+])
+
+# Counters
+SEQ = 0
+REQUEST_COUNTER = 1
+HEAP_SIZE = 2
+FREE_COUNT = 3
+SLOT_COUNT = 4
+CURRENT_TIMEOUT_FIFO = 5   # FIFO of the timeouts scheduled in this run, the one of the current timeout duration
+SYSTEM_GOODPUT = 6
+SYSTEM_BADPUT = 7
+APP_GOODPUT = 8
+APP_BADPUT = 9
+DB_GOODPUT = 10
+DB_BADPUT = 11
+PRIORITY_DROPPED = 12
+REGULAR_DROPPED = 13
+TIMED_OUT = 14
+EVENTS = 15
+COUNTER_COUNT = 16
+
+# Response time sums
+SYSTEM_RESPONSE_TIME = 0
+APP_RESPONSE_TIME = 1
+DB_RESPONSE_TIME = 2
+SUM_COUNT = 3
+
+# Parameters, service times, cores and queue capacities are indexed by server
+SERVICE_TIME = 0
+CORES = 2
+QUEUE_CAPACITY = 4
+APP_TO_DB_PROB = 6
+THINK_TIME = 7
+PRIORITY_PROB = 8
+RETRY_DELAY = 9
+REQUEST_TIMEOUT = 10
+SYNCHRONOUS = 11
+SKETCH_INVERSE_LOG_GAMMA = 12
+SKETCH_OFFSET = 13
+SKETCH_MIN_VALUE = 14
+PARAM_COUNT = 15
+
+# Request fields
+CLIENT = 0
+PRIORITY = 1
+IS_TIMED_OUT = 2
+STATE = 3
+TIER = 4
+HOLDS_APP_CORE = 5
+TIMEOUT = 6     # Absolute position of the pending timeout, -1 if none
+TIMEOUT_FIFO = 7    # FIFO of the pending timeout
+NEXT = 8    # Next slot in the waiting queue
+PREVIOUS = 9    # Previous slot in the waiting queue
+FIELD_COUNT = 10
+
+# Sketches
+SYSTEM_SKETCH = 0
+APP_SKETCH = 1
+DB_SKETCH = 2
+SKETCH_COUNT = 3
+
+# Random streams, in the order of STREAM_PURPOSES
+APP_SERVICE = 0
+DB_SERVICE = 1
+ROUTING = 2
+PRIORITY_DRAW = 3
+RETRY = 4
+STREAM_COUNT = 5
+DRAWS_PER_EVENT = 4     # Most variates of a stream one event can draw
+
+# Status of run_events
+DONE = 0
+REFILL = 1  # A random stream is running out of variates
+GROW = 2    # Slots, events or timeouts are running out of room
+
+APPLICATION_SERVER = settings.APPLICATION_SERVER
+DB_SERVER = settings.DB_SERVER
+NO_TIER = settings.NO_TIER
+HIGH_PRIORITY = settings.HIGH_PRIORITY
+PRIORITY_CLASSES = settings.PRIORITY_CLASSES
+EVENT_REQUEST_ARRIVAL = settings.EVENT_REQUEST_ARRIVAL
+EVENT_REQUEST_COMPLETE_FROM_APP_SERVER = settings.EVENT_REQUEST_COMPLETE_FROM_APP_SERVER
+EVENT_REQUEST_COMPLETE_FROM_DB_SERVER = settings.EVENT_REQUEST_COMPLETE_FROM_DB_SERVER
+REQUEST_IN_SERVICE = settings.REQUEST_IN_SERVICE
+REQUEST_COMPLETED = settings.REQUEST_COMPLETED
+REQUEST_TIMED_OUT = settings.REQUEST_TIMED_OUT
+REQUEST_DROPPED = settings.REQUEST_DROPPED
+
+
+
+
+@jit
+def run_events(s, arrival_fields, arrival_times, end_time, current_time, event_limit):
+    """Schedule the given arrivals, then handle events in time order up to, not including, end_time
+
+    Mirrors ArrayEventHandler event by event, with the same draws in the same order. Helpers are
+    closures over the arrays of the state, which numba compiles into this single function, so no
+    array changes hands between compiled functions in the event loop.
+
+    Args:
+        s (KernelState): State of the simulation, updated in place
+        arrival_fields (np.ndarray): Client, priority and is_timed_out of the arrivals to schedule first, int64[n, 3]
+        arrival_times (np.ndarray): Times of the arrivals to schedule first, float64[n]
+        end_time (float): Simulation time to run until
+        current_time (float): Current simulation time
+        event_limit (int): Stop once the event counter reaches it, -1 for no limit
+
+    Returns:
+        (int, float): DONE, or REFILL / GROW when the state must be refilled or grown before going on,
+                      and the time of the last handled event
+    """
+    counters, sums, params, fields, arrival_time = s.counters, s.sums, s.params, s.fields, s.arrival_time
+    free_slots, heap_time, heap_entry = s.free_slots, s.heap_time, s.heap_entry
+    timeout_deadline, timeout_slot, timeout_head, timeout_tail = s.timeout_deadline, s.timeout_slot, s.timeout_head, s.timeout_tail
+    busy, busy_area, busy_since = s.busy, s.busy_area, s.busy_since
+    queue_head, queue_tail, queue_length, queue_area, queue_since = s.queue_head, s.queue_tail, s.queue_length, s.queue_area, s.queue_since
+    sketch_counts, sketch_zero, variates, variate_position = s.sketch_counts, s.sketch_zero, s.variates, s.variate_position
+    timeout_mask = timeout_slot.shape[1] - 1
+    bucket_count = sketch_counts.shape[2]
+
+    def draw(stream):
+        position = variate_position[stream]
+        variate_position[stream] = position + 1
+        return variates[stream, position]
+
+    def push_event(event_type, slot, time):
+        counters[SEQ] += 1
+        seq = counters[SEQ]
+        index = counters[HEAP_SIZE]
+        counters[HEAP_SIZE] = index + 1
+        while index > 0:
+            parent = (index - 1) >> 1
+            if heap_time[parent] < time or (heap_time[parent] == time and heap_entry[parent, 0] < seq):
+                break
+            heap_time[index] = heap_time[parent]
+            heap_entry[index, 0] = heap_entry[parent, 0]
+            heap_entry[index, 1] = heap_entry[parent, 1]
+            heap_entry[index, 2] = heap_entry[parent, 2]
+            index = parent
+        heap_time[index] = time
+        heap_entry[index, 0] = seq
+        heap_entry[index, 1] = event_type
+        heap_entry[index, 2] = slot
+
+    def pop_event():
+        time = heap_time[0]
+        event_type = heap_entry[0, 1]
+        slot = heap_entry[0, 2]
+        size = counters[HEAP_SIZE] - 1
+        counters[HEAP_SIZE] = size
+        last_time = heap_time[size]
+        last_seq = heap_entry[size, 0]
+        index = 0
+        while True:
+            child = 2 * index + 1
+            if child >= size:
+                break
+            if child + 1 < size and (heap_time[child + 1] < heap_time[child] or
+                                     (heap_time[child + 1] == heap_time[child] and heap_entry[child + 1, 0] < heap_entry[child, 0])):
+                child += 1
+            if last_time < heap_time[child] or (last_time == heap_time[child] and last_seq < heap_entry[child, 0]):
+                break
+            heap_time[index] = heap_time[child]
+            heap_entry[index, 0] = heap_entry[child, 0]
+            heap_entry[index, 1] = heap_entry[child, 1]
+            heap_entry[index, 2] = heap_entry[child, 2]
+            index = child
+        heap_time[index] = last_time
+        heap_entry[index, 0] = last_seq
+        heap_entry[index, 1] = heap_entry[size, 1]
+        heap_entry[index, 2] = heap_entry[size, 2]
+        return time, event_type, slot
+
+    def next_timeout():
+        # Deadlines only come in order within a FIFO, the earliest head wins, the first FIFO on a tie
+        earliest, earliest_fifo = end_time, -1     # No timeout before the end
+        for fifo in range(len(timeout_head)):
+            while timeout_head[fifo] < timeout_tail[fifo] and timeout_slot[fifo, timeout_head[fifo] & timeout_mask] < 0:
+                timeout_head[fifo] += 1     # Drop cancelled timeouts
+            if timeout_head[fifo] < timeout_tail[fifo] and timeout_deadline[fifo, timeout_head[fifo] & timeout_mask] < earliest:
+                earliest, earliest_fifo = timeout_deadline[fifo, timeout_head[fifo] & timeout_mask], fifo
+        return earliest, earliest_fifo
+
+    def cancel_timeout(slot):
+        position = fields[slot, TIMEOUT]
+        fifo = fields[slot, TIMEOUT_FIFO]
+        if position >= 0 and position >= timeout_head[fifo]:
+            timeout_slot[fifo, position & timeout_mask] = -1
+
+    def acquire_core(server, request_priority, time):
+        busy_area[server, request_priority] += busy[server, request_priority] * (time - busy_since[server, request_priority])
+        busy_since[server, request_priority] = time
+        busy[server, request_priority] += 1
+
+    def release_core(server, request_priority, time):
+        busy_area[server, request_priority] += busy[server, request_priority] * (time - busy_since[server, request_priority])
+        busy_since[server, request_priority] = time
+        busy[server, request_priority] -= 1
+
+    def has_free_core(server):
+        total = 0
+        for request_priority in range(PRIORITY_CLASSES):
+            total += busy[server, request_priority]
+        return total < params[CORES + server]
+
+    def queue_append(server, slot, request_priority, time):
+        if queue_length[server, request_priority] >= params[QUEUE_CAPACITY + server]:
+            return False
+        queue_area[server, request_priority] += queue_length[server, request_priority] * (time - queue_since[server, request_priority])
+        queue_since[server, request_priority] = time
+        tail = queue_tail[server, request_priority]
+        fields[slot, PREVIOUS] = tail
+        fields[slot, NEXT] = -1
+        if tail < 0:
+            queue_head[server, request_priority] = slot
+        else:
+            fields[tail, NEXT] = slot
+        queue_tail[server, request_priority] = slot
+        queue_length[server, request_priority] += 1
+        return True
+
+    def queue_remove(server, slot, request_priority, time):
+        queue_area[server, request_priority] += queue_length[server, request_priority] * (time - queue_since[server, request_priority])
+        queue_since[server, request_priority] = time
+        previous = fields[slot, PREVIOUS]
+        following = fields[slot, NEXT]
+        if previous < 0:
+            queue_head[server, request_priority] = following
+        else:
+            fields[previous, NEXT] = following
+        if following < 0:
+            queue_tail[server, request_priority] = previous
+        else:
+            fields[following, PREVIOUS] = previous
+        queue_length[server, request_priority] -= 1
+
+    def add_response_time(sketch, request_priority, value):
+        if value > params[SKETCH_MIN_VALUE]:
+            index = math.ceil(math.log(value) * params[SKETCH_INVERSE_LOG_GAMMA]) - int(params[SKETCH_OFFSET])
+            sketch_counts[sketch, request_priority, min(index, bucket_count - 1)] += 1
+        else:
+            sketch_zero[sketch, request_priority] += 1
+
+    def schedule_arrival(client_id, request_priority, time, is_timed_out):
+        counters[REQUEST_COUNTER] += 1
+        if counters[FREE_COUNT] > 0:
+            counters[FREE_COUNT] -= 1
+            slot = free_slots[counters[FREE_COUNT]]
+        else:
+            slot = counters[SLOT_COUNT]
+            counters[SLOT_COUNT] = slot + 1
+        fields[slot, CLIENT] = client_id
+        fields[slot, PRIORITY] = request_priority
+        fields[slot, IS_TIMED_OUT] = is_timed_out
+        fields[slot, STATE] = REQUEST_IN_SERVICE
+        fields[slot, TIER] = NO_TIER
+        fields[slot, HOLDS_APP_CORE] = 0
+        fields[slot, TIMEOUT] = -1
+        arrival_time[slot] = time
+        push_event(EVENT_REQUEST_ARRIVAL, slot, time)
+
+    def release_slot(slot):
+        fields[slot, TIMEOUT] = -1
+        free_slots[counters[FREE_COUNT]] = slot
+        counters[FREE_COUNT] += 1
+
+    def start_service(slot, server, time):
+        if server == APPLICATION_SERVER:
+            push_event(EVENT_REQUEST_COMPLETE_FROM_APP_SERVER, slot, time + params[SERVICE_TIME + server] * draw(APP_SERVICE))
+        else:
+            push_event(EVENT_REQUEST_COMPLETE_FROM_DB_SERVER, slot, time + params[SERVICE_TIME + server] * draw(DB_SERVICE))
+        acquire_core(server, fields[slot, PRIORITY], time)
+
+    def serve_next_request(server, time):
+        for request_priority in range(PRIORITY_CLASSES - 1, -1, -1):
+            slot = queue_head[server, request_priority]
+            if slot >= 0:
+                queue_remove(server, slot, request_priority, time)
+                fields[slot, TIER] = NO_TIER
+                start_service(slot, server, time)
+                return
+
+    def handle_request_failure(slot, time, is_timeout):
+        request_priority = fields[slot, PRIORITY]
+        if not is_timeout:
+            if request_priority == HIGH_PRIORITY:
+                counters[PRIORITY_DROPPED] += 1
+            else:
+                counters[REGULAR_DROPPED] += 1
+            fields[slot, STATE] = REQUEST_DROPPED
+            cancel_timeout(slot)    # Client retries now, not again at the timeout
+        else:
+            fields[slot, STATE] = REQUEST_TIMED_OUT
+            counters[TIMED_OUT] += 1
+
+        # Timed out request leaves the waiting queue right away
+        tier = fields[slot, TIER]
+        if tier != NO_TIER:
+            queue_remove(tier, slot, request_priority, time)
+            fields[slot, TIER] = NO_TIER
+
+            # Core of the app server held for the synchronous db call becomes free
+            if fields[slot, HOLDS_APP_CORE]:
+                release_core(APPLICATION_SERVER, request_priority, time)
+                fields[slot, HOLDS_APP_CORE] = 0
+                serve_next_request(APPLICATION_SERVER, time)
+
+        schedule_arrival(fields[slot, CLIENT], request_priority, time + abs(params[RETRY_DELAY] + draw(RETRY)), 1 if is_timeout else 0)
+
+        # Requests timed out while being served are released once their service completes
+        if not is_timeout or tier != NO_TIER:
+            release_slot(slot)
+
+    def push_in_queue(slot, server, time):
+        if queue_append(server, slot, fields[slot, PRIORITY], time):
+            fields[slot, TIER] = server
+            return True
+        handle_request_failure(slot, time, False)   # Request dropped due to queue overflow
+        return False
+
+    def handle_request_arrival(slot, time):
+        fifo = counters[CURRENT_TIMEOUT_FIFO]
+        position = timeout_tail[fifo]
+        timeout_tail[fifo] = position + 1
+        timeout_deadline[fifo, position & timeout_mask] = time + params[REQUEST_TIMEOUT]
+        timeout_slot[fifo, position & timeout_mask] = slot
+        fields[slot, TIMEOUT] = position
+        fields[slot, TIMEOUT_FIFO] = fifo
+        if has_free_core(APPLICATION_SERVER):
+            start_service(slot, APPLICATION_SERVER, time)
+        else:
+            push_in_queue(slot, APPLICATION_SERVER, time)
+
+    def handle_request_complete_from_app_server(slot, time):
+        request_priority = fields[slot, PRIORITY]
+        release_core(APPLICATION_SERVER, request_priority, time)
+
+        if fields[slot, STATE] == REQUEST_IN_SERVICE:
+            response_time = time - arrival_time[slot]
+            sums[APP_RESPONSE_TIME] += response_time
+            add_response_time(APP_SKETCH, request_priority, response_time)
+            if fields[slot, IS_TIMED_OUT]:
+                counters[APP_BADPUT] += 1
+            else:
+                counters[APP_GOODPUT] += 1
+
+            # Request moves from app to db server
+            if draw(ROUTING) < params[APP_TO_DB_PROB]:
+                is_dropped = False
+                if has_free_core(DB_SERVER):
+                    start_service(slot, DB_SERVER, time)
+                else:
+                    is_dropped = not push_in_queue(slot, DB_SERVER, time)
+
+                # App server core waits for the db call, unless the call was dropped
+                if params[SYNCHRONOUS] and not is_dropped:
+                    acquire_core(APPLICATION_SERVER, request_priority, time)
+                    fields[slot, HOLDS_APP_CORE] = 1
+
+            # Request completed from the system
+            else:
+                fields[slot, STATE] = REQUEST_COMPLETED
+                cancel_timeout(slot)
+                schedule_arrival(fields[slot, CLIENT], 1 if draw(PRIORITY_DRAW) < params[PRIORITY_PROB] else 0, time + params[THINK_TIME], 0)
+                sums[SYSTEM_RESPONSE_TIME] += response_time
+                add_response_time(SYSTEM_SKETCH, request_priority, response_time)
+                if fields[slot, IS_TIMED_OUT]:
+                    counters[SYSTEM_BADPUT] += 1
+                else:
+                    counters[SYSTEM_GOODPUT] += 1
+                release_slot(slot)
+
+        # Request timed out while being served, nothing refers to it anymore
+        else:
+            release_slot(slot)
+
+        if has_free_core(APPLICATION_SERVER):
+            serve_next_request(APPLICATION_SERVER, time)
+
+    def handle_request_complete_from_db_server(slot, time):
+        request_priority = fields[slot, PRIORITY]
+        release_core(DB_SERVER, request_priority, time)
+        held_app_core = fields[slot, HOLDS_APP_CORE]
+        if held_app_core:
+            release_core(APPLICATION_SERVER, request_priority, time)
+            fields[slot, HOLDS_APP_CORE] = 0
+
+        is_failed = fields[slot, STATE] != REQUEST_IN_SERVICE
+        if is_failed:   # Request timed out while being served, nothing refers to it anymore
+            release_slot(slot)
+        else:
+            response_time = time - arrival_time[slot]
+            sums[DB_RESPONSE_TIME] += response_time
+            add_response_time(DB_SKETCH, request_priority, response_time)
+            if fields[slot, IS_TIMED_OUT]:
+                counters[DB_BADPUT] += 1
+            else:
+                counters[DB_GOODPUT] += 1
+
+            # Synchronous call returns to the waiting app core, an asynchronous one waits for its turn
+            if held_app_core or has_free_core(APPLICATION_SERVER):
+                start_service(slot, APPLICATION_SERVER, time)
+            else:
+                push_in_queue(slot, APPLICATION_SERVER, time)
+
+        serve_next_request(DB_SERVER, time)
+
+        # Core of the app server held for a timed out synchronous db call became free
+        if is_failed and held_app_core:
+            serve_next_request(APPLICATION_SERVER, time)
+
+    for index in range(len(arrival_times)):
+        schedule_arrival(arrival_fields[index, 0], arrival_fields[index, 1], arrival_times[index], arrival_fields[index, 2])
+
+    while True:
+        # Room for the draws and the new request of one more event
+        for stream in range(STREAM_COUNT):
+            if variate_position[stream] + DRAWS_PER_EVENT > variates.shape[1]:
+                return REFILL, current_time
+        if ((counters[FREE_COUNT] < 2 and counters[SLOT_COUNT] + 2 > len(arrival_time)) or counters[HEAP_SIZE] + 2 > len(heap_time)
+                or timeout_tail[counters[CURRENT_TIMEOUT_FIFO]] - timeout_head[counters[CURRENT_TIMEOUT_FIFO]] + 2 > timeout_slot.shape[1]):
+            return GROW, current_time
+
+        # Earliest of the next event and the next timeout, events from end_time on are left for later
+        timeout_time, fifo = next_timeout()
+        if counters[HEAP_SIZE] > 0 and heap_time[0] <= timeout_time:
+            if heap_time[0] >= end_time:
+                break
+            current_time, event_type, slot = pop_event()
+            if event_type == EVENT_REQUEST_ARRIVAL:
+                handle_request_arrival(slot, current_time)
+            elif event_type == EVENT_REQUEST_COMPLETE_FROM_APP_SERVER:
+                handle_request_complete_from_app_server(slot, current_time)
+            else:
+                handle_request_complete_from_db_server(slot, current_time)
+        else:
+            if timeout_time >= end_time:
+                break
+            current_time = timeout_time
+            slot = timeout_slot[fifo, timeout_head[fifo] & timeout_mask]
+            timeout_head[fifo] += 1
+            handle_request_failure(slot, current_time, True)
+        counters[EVENTS] += 1
+        if counters[EVENTS] == event_limit:
+            break
+    return DONE, current_time
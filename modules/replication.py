@@ -0,0 +1,196 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from modules.simulator import merge_response_time_sketches, percentile_columns
+from modules.sweep import run_point
+
+
+# Metric name -> column of the results row
+REPLICATION_METRICS = {
+    "throughput" : "system_throughput",
+    "goodput" : "system_goodput",
+    "response_time" : "system_average_response_time",
+    "drop_fraction" : "fraction_of_requests_dropped"
+}
+
+
+def confidence_interval(values:list, confidence:float = 0.95):
+    """Student-t confidence interval of the mean of independent observations
+
+    Args:
+        values (list): Observations
+        confidence (float): Confidence level
+
+    Returns:
+        (float, float): Mean and half-width of the interval, half-width is infinite for fewer than 2 values
+    """
+    from scipy import stats
+
+    values = np.asarray(values, dtype=float)
+    mean = values.mean()
+    if len(values) < 2:
+        return mean, float("inf")
+    half_width = stats.t.ppf((1 + confidence) / 2, len(values) - 1) * values.std(ddof=1) / np.sqrt(len(values))
+    return mean, half_width
+
+def summarize(rows:list, confidence:float = 0.95, metrics:dict = None):
+    """Mean and confidence interval of every metric over replications
+
+    Args:
+        rows (list): Results rows of the replications
+        confidence (float): Confidence level
+        metrics (dict): Metric name -> column of the results row
+
+    Returns:
+        dict: Metric name -> {"mean", "half_width", "relative_half_width"}
+    """
+    summary = {}
+    for name, column in (metrics or REPLICATION_METRICS).items():
+        mean, half_width = confidence_interval([row[column] for row in rows], confidence)
+        summary[name] = {
+            "mean" : mean,
+            "half_width" : half_width,
+            "relative_half_width" : half_width / abs(mean) if mean else (0.0 if half_width == 0 else float("inf"))
+        }
+    return summary
+
+def is_precise(summary:dict, relative_precision:float):
+    """Whether every metric reached the relative precision
+
+    Args:
+        summary (dict): Output of summarize
+        relative_precision (float): Target half-width relative to the mean
+
+    Returns:
+        bool: True if every metric is precise enough
+    """
+    return all(metric["relative_half_width"] <= relative_precision for metric in summary.values())
+
+def replication_seeds(seed:int, count:int):
+    """Seeds of independent replications
+
+    Args:
+        seed (int): Seed of the whole experiment, drawn from the OS when None
+        count (int): Number of replications
+
+    Returns:
+        list: Seed of every replication, valid Simulator seeds
+    """
+    entropy = np.random.SeedSequence(seed).entropy
+    return [[entropy, index] for index in range(count)]
+
+def run_replications(config:dict, max_replications:int = 30, min_replications:int = 3, relative_precision:float = None,
+                     confidence:float = 0.95, workers:int = None, seed:int = None, metrics:dict = None):
+    """Run independent replications in parallel until the metrics are precise enough
+
+    Replications are started in index order and the stopping rule is checked on the longest
+    prefix of finished replications, so the replications used only depend on the seed, not on
+    the order in which workers finish.
+
+    Args:
+        config (dict): Simulator arguments, without seed
+        max_replications (int): Maximum number of replications
+        min_replications (int): Replications run before the stopping rule is checked
+        relative_precision (float): Stop once every confidence half-width is within this fraction of its mean,
+                                    None runs max_replications
+        confidence (float): Confidence level of the intervals
+        workers (int): Number of worker processes, one per CPU by default
+        seed (int): Seed of the experiment, drawn from the OS when None
+        metrics (dict): Metric name -> column of the results row
+
+    Returns:
+        dict: "summary" (output of summarize), "replications" (number used), "rows" (their results rows),
+              "precise" (whether relative_precision was reached), "sketches" (their merged response time
+              sketches) and "percentiles" (percentile columns of the merged sketches)
+    """
+    seeds = replication_seeds(seed, max_replications)
+    workers = min(workers or os.cpu_count() or 1, max_replications)
+    min_replications = max(2, min(min_replications, max_replications))
+
+    finished = {}   # Replication index -> (results row, response time sketches)
+    prefix = []     # Rows of replications 0..k-1, all finished
+    sketch_sets = []
+    precise = False
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        running = {}
+        next_index = 0
+        while True:
+            # Keep every worker busy until the stopping rule holds
+            while not precise and next_index < max_replications and len(running) < workers:
+                running[executor.submit(run_point, dict(config, seed = seeds[next_index]))] = next_index
+                next_index += 1
+            if not running:
+                break
+
+            done, _ = wait(running, return_when = FIRST_COMPLETED)
+            for future in done:
+                finished[running.pop(future)] = future.result()
+            while len(prefix) in finished and not precise:
+                row, sketches = finished[len(prefix)]
+                prefix.append(row)
+                sketch_sets.append(sketches)
+                if relative_precision is not None and len(prefix) >= min_replications:
+                    precise = is_precise(summarize(prefix, confidence, metrics), relative_precision)
+
+            if precise:
+                for future in running:
+                    future.cancel()
+                break
+
+    sketches = merge_response_time_sketches(sketch_sets)
+    return {
+        "summary" : summarize(prefix, confidence, metrics),
+        "replications" : len(prefix),
+        "rows" : prefix,
+        "precise" : precise,
+        "sketches" : sketches,
+        "percentiles" : percentile_columns(sketches)
+    }
+
+def run_paired_replications(config:dict, alternative:dict, replications:int = 10, confidence:float = 0.95, 
+                            workers:int = None, seed:int = None, metrics:dict = None, common_random_numbers:bool = True):
+    """Compare two configurations on paired replications with common random numbers
+
+    Both configurations of a replication run with the same seed and per-client random streams,
+    so they see the same workload and the noise mostly cancels out of their difference. The
+    confidence interval of the difference comes from the paired differences of every replication.
+
+    Args:
+        config (dict): Simulator arguments of the baseline, without seed
+        alternative (dict): Simulator arguments that differ in the alternative configuration
+        replications (int): Number of paired replications
+        confidence (float): Confidence level of the intervals
+        workers (int): Number of worker processes, one per CPU by default
+        seed (int): Seed of the experiment, drawn from the OS when None
+        metrics (dict): Metric name -> column of the results row
+        common_random_numbers (bool): False runs the alternative on independent seeds, for reference
+
+    Returns:
+        dict: "baseline", "alternative" and "difference" (alternative - baseline, outputs of summarize),
+              "replications" (number of pairs) and "rows" (baseline and alternative results rows)
+    """
+    metrics = metrics or REPLICATION_METRICS
+    replications = max(2, replications)
+    configs = []
+    for replication_seed in replication_seeds(seed, replications):
+        baseline_config = dict(config, seed = replication_seed, common_random_numbers = common_random_numbers)
+        alternative_seed = replication_seed if common_random_numbers else replication_seed + [1]
+        configs += [baseline_config, dict(baseline_config, seed = alternative_seed, **alternative)]
+
+    workers = min(workers or os.cpu_count() or 1, len(configs))
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        rows = [row for row, _ in executor.map(run_point, configs)]
+    baseline_rows, alternative_rows = rows[0::2], rows[1::2]
+    differences = [
+        {column : alternative_row[column] - baseline_row[column] for column in metrics.values()}
+        for baseline_row, alternative_row in zip(baseline_rows, alternative_rows)
+    ]
+    return {
+        "baseline" : summarize(baseline_rows, confidence, metrics),
+        "alternative" : summarize(alternative_rows, confidence, metrics),
+        "difference" : summarize(differences, confidence, metrics),
+        "replications" : replications,
+        "rows" : (baseline_rows, alternative_rows)
+    }
@@ -1,9 +1,30 @@
+import settings
+
+
 class Request:
+    __slots__ = ("id", "client_id", "request_priority", "request_timeout", "need_server", "arrival_time", "is_timed_out",
+                 "state", "timeout_entry", "waiting_server", "holds_app_core")
     counter = 0
-    def __init__(self, request_priority:int, request_timeout:float, need_server:int, arrival_time:int, is_timed_out:bool = False) -> None:
+    free_list = []  # Released requests, reused by acquire
+
+    def __init__(self, client_id:int, request_priority:int, request_timeout:float, need_server:int, arrival_time:int, is_timed_out:bool = False) -> None:
         """Instance of a web server request
 
         Args:
+            client_id (int): client that sent the request
+            request_priority (int): priority of request
+            request_timeout (float): timeout value after which request is dropped
+            need_server (int): server type
+            arrival_time (int): arrival time of the request in the system
+            is_timed_out (bool): to check whether the request was failed before
+        """
+        self.initialize(client_id, request_priority, request_timeout, need_server, arrival_time, is_timed_out)
+
+    def initialize(self, client_id:int, request_priority:int, request_timeout:float, need_server:int, arrival_time:int, is_timed_out:bool = False):
+        """Set up the request as a fresh one, with a new id
+
+        Args:
+            client_id (int): client that sent the request
             request_priority (int): priority of request
             request_timeout (float): timeout value after which request is dropped
             need_server (int): server type
@@ -13,8 +34,41 @@ class Request:
         self.id = Request.counter   
         Request.counter += 1
 
+        self.client_id = client_id
         self.request_priority = request_priority
         self.request_timeout = request_timeout
         self.need_server = need_server
         self.arrival_time = arrival_time
-        self.is_timed_out = is_timed_out # to check whether the request was failed before
\ No newline at end of file
+        self.is_timed_out = is_timed_out # to check whether the request was failed before
+        self.state = settings.REQUEST_IN_SERVICE
+        self.timeout_entry = None   # Pending timeout, cancelled when the request completes
+        self.waiting_server = None  # Server whose waiting queue holds the request
+        self.holds_app_core = False # App server core held for a synchronous db call
+
+    @classmethod
+    def acquire(cls, client_id:int, request_priority:int, request_timeout:float, need_server:int, arrival_time:int, is_timed_out:bool = False):
+        """Request taken from the free list, or a new one if the list is empty
+
+        Args:
+            client_id (int): client that sent the request
+            request_priority (int): priority of request
+            request_timeout (float): timeout value after which request is dropped
+            need_server (int): server type
+            arrival_time (int): arrival time of the request in the system
+            is_timed_out (bool): to check whether the request was failed before
+
+        Returns:
+            Request: Request ready to be scheduled
+        """
+        if cls.free_list:
+            request = cls.free_list.pop()
+            request.initialize(client_id, request_priority, request_timeout, need_server, arrival_time, is_timed_out)
+            return request
+        return cls(client_id, request_priority, request_timeout, need_server, arrival_time, is_timed_out)
+
+    def release(self):
+        """Put the request back on the free list, once no event, timeout or queue refers to it anymore
+        """
+        self.timeout_entry = None
+        self.waiting_server = None
+        Request.free_list.append(self)
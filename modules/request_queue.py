@@ -0,0 +1,134 @@
+from collections import OrderedDict
+
+
+class RequestQueue:
+    def __init__(self, priority_classes:int, capacity:int) -> None:
+        """Waiting queue of a server, one FIFO per priority class
+
+        Every FIFO is an ordered dict keyed by a unique key of the request, so enqueue, dequeue
+        and removal of a given request are all O(1). Higher classes are always served first. The
+        time integral of every class length is updated whenever that length changes.
+
+        Args:
+            priority_classes (int): Number of priority classes, requests carry a priority in [0, priority_classes)
+            capacity (int): Maximum number of waiting requests per priority class
+        """
+        self.fifos = [OrderedDict() for _ in range(priority_classes)]
+        self.capacity = capacity
+        self.length = 0
+        self.area = [0.0] * priority_classes    # Integral of the length of every class over time
+        self.since = [0.0] * priority_classes   # Time the length of every class last changed
+        self.statistics_start_time = 0.0
+
+    def append(self, request, key:int, request_priority:int, current_time:float):
+        """Add a request at the back of its priority class
+
+        Args:
+            request (Request | int): Request to be queued
+            key (int): Unique key of the request, such as its id
+            request_priority (int): Priority class of the request
+            current_time (float): Current simulation time
+
+        Returns:
+            bool: False if the queue of the class is full and the request was not queued
+        """
+        fifo = self.fifos[request_priority]
+        if len(fifo) >= self.capacity:
+            return False
+        self.area[request_priority] += len(fifo) * (current_time - self.since[request_priority])
+        self.since[request_priority] = current_time
+        fifo[key] = request
+        self.length += 1
+        return True
+
+    def popleft(self, current_time:float):
+        """Remove the oldest request of the highest non-empty priority class
+
+        Args:
+            current_time (float): Current simulation time
+
+        Returns:
+            Request | int: Next request to be served, None if the queue is empty
+        """
+        if self.length:
+            for request_priority in range(len(self.fifos) - 1, -1, -1):
+                fifo = self.fifos[request_priority]
+                if fifo:
+                    self.area[request_priority] += len(fifo) * (current_time - self.since[request_priority])
+                    self.since[request_priority] = current_time
+                    self.length -= 1
+                    return fifo.popitem(last=False)[1]
+        return None
+
+    def remove(self, key:int, request_priority:int, current_time:float):
+        """Remove a waiting request from the queue
+
+        Args:
+            key (int): Key the request was queued with
+            request_priority (int): Priority class of the request
+            current_time (float): Current simulation time
+
+        Returns:
+            bool: False if the request was not waiting in the queue
+        """
+        fifo = self.fifos[request_priority]
+        if key not in fifo:
+            return False
+        self.area[request_priority] += len(fifo) * (current_time - self.since[request_priority])
+        self.since[request_priority] = current_time
+        del fifo[key]
+        self.length -= 1
+        return True
+
+    def class_length(self, request_priority:int):
+        """Number of waiting requests of a priority class
+
+        Args:
+            request_priority (int): Priority class
+
+        Returns:
+            int: Number of waiting requests
+        """
+        return len(self.fifos[request_priority])
+
+    def reset_statistics(self, current_time:float):
+        """Restart the time integrals of the class lengths
+
+        Args:
+            current_time (float): Current simulation time, start of the measurement window
+        """
+        self.statistics_start_time = current_time
+        self.area = [0.0] * len(self.area)
+        self.since = [current_time] * len(self.since)
+
+    def length_integral(self, current_time:float):
+        """Integral of the queue length over time since the statistics were reset
+
+        Args:
+            current_time (float): End of the integral
+
+        Returns:
+            float: Request-seconds of waiting
+        """
+        return sum(area + self.class_length(request_priority) * (current_time - since)
+                   for request_priority, (area, since) in enumerate(zip(self.area, self.since)))
+
+    def average_lengths(self, current_time:float):
+        """Time-average length of every priority class since the statistics were reset
+
+        Args:
+            current_time (float): End of the measurement window
+
+        Returns:
+            List[float]: Average number of waiting requests per priority class
+        """
+        elapsed = current_time - self.statistics_start_time
+        if elapsed <= 0:
+            return [float(self.class_length(request_priority)) for request_priority in range(len(self.area))]
+        return [
+            (area + self.class_length(request_priority) * (current_time - since)) / elapsed
+            for request_priority, (area, since) in enumerate(zip(self.area, self.since))
+        ]
+
+    def __len__(self):
+        return self.length
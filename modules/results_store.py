@@ -0,0 +1,219 @@
+import settings
+
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import time
+
+
+SIMULATOR_VERSION = 2   # Bumped whenever a change alters the results of a configuration, older results are ignored
+OUTPUT_ARGUMENTS = {    # Simulator arguments that only choose where extra output goes, not the results
+    "trace_mode", "trace_sample_every", "trace_path", "time_series_interval", "time_series_path",
+    "checkpoint_every", "checkpoint_path", "log_to_file"
+}
+ARGUMENT_DEFAULTS = {   # Simulator arguments that may be omitted, with the value the simulator then uses
+    "engine" : settings.DEFAULT_ENGINE,
+    "common_random_numbers" : False,
+    "detect_warmup" : False,
+    "confidence" : 0.95
+}
+
+
+def canonical_config(config:dict):
+    """Canonical json of the Simulator arguments that determine the results
+
+    Output-only arguments and None values are dropped, omitted arguments take their default, and
+    numbers and booleans are written as floats, so 1, 1.0 and True give the same configuration.
+    The seed is kept as it is.
+
+    Args:
+        config (dict): Simulator arguments
+
+    Returns:
+        str: Canonical json
+    """
+    canonical = {}
+    for name, value in dict(ARGUMENT_DEFAULTS, **config).items():
+        if name in OUTPUT_ARGUMENTS or value is None:
+            continue
+        if name != "seed" and isinstance(value, (bool, int, float)):
+            value = float(value)
+        canonical[name] = value
+    return json.dumps(canonical, sort_keys = True, separators = (",", ":"))
+
+def config_key(config:dict):
+    """Content address of a configuration, together with the simulator version
+
+    Args:
+        config (dict): Simulator arguments, with seed
+
+    Returns:
+        str: Hex sha256 digest
+    """
+    return hashlib.sha256(f"{SIMULATOR_VERSION}:{canonical_config(config)}".encode()).hexdigest()
+
+
+class ResultsStore:
+    def __init__(self, path:str = None) -> None:
+        """SQLite store of simulation results, keyed by the hash of the configuration and seed
+
+        Only seeded configurations can be looked up, results are written in batches inside one
+        transaction, and a configuration stored twice keeps its first results. Concurrent writers
+        wait for each other instead of corrupting the file.
+
+        Args:
+            path (str): Path of the database, settings.RESULTS_STORE_PATH by default
+        """
+        self.path = path or settings.RESULTS_STORE_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok = True)
+        self.connection = sqlite3.connect(self.path, timeout = settings.RESULTS_STORE_TIMEOUT)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                version INTEGER NOT NULL,
+                request_timeout REAL NOT NULL,
+                seed TEXT NOT NULL,
+                config TEXT NOT NULL,
+                row TEXT NOT NULL,
+                sketches BLOB,
+                created_at REAL NOT NULL
+            )
+        """)
+        self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Close the database
+        """
+        self.connection.close()
+
+    def get_many(self, configs:list):
+        """Stored results of configurations
+
+        Args:
+            configs (list): Simulator arguments of every configuration
+
+        Returns:
+            list: (results row, response time sketches) of every configuration, None where it is
+                  not stored or has no seed
+        """
+        keys = [config_key(config) if config.get("seed") is not None else None for config in configs]
+        stored = {}
+        wanted = [key for key in keys if key is not None]
+        for start in range(0, len(wanted), 500):    # Below the SQLite limit of bound parameters
+            chunk = wanted[start:start + 500]
+            stored.update(
+                (key, (json.loads(row), pickle.loads(sketches) if sketches is not None else None))
+                for key, row, sketches in self.connection.execute(
+                    f"SELECT key, row, sketches FROM results WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                )
+            )
+        return [stored.get(key) for key in keys]
+
+    def get(self, config:dict):
+        """Stored results of a configuration
+
+        Args:
+            config (dict): Simulator arguments
+
+        Returns:
+            (dict, dict): Results row and response time sketches, None if not stored
+        """
+        return self.get_many([config])[0]
+
+    def put_many(self, points:list):
+        """Store results in a single transaction
+
+        Args:
+            points (list): (config, results row, response time sketches) of every seeded configuration
+        """
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (config_key(config), SIMULATOR_VERSION, config["request_timeout"], json.dumps(config["seed"]),
+                     canonical_config(config), json.dumps(row, default = float),
+                     pickle.dumps(sketches, protocol = pickle.HIGHEST_PROTOCOL) if sketches is not None else None, now)
+                    for config, row, sketches in points
+                ]
+            )
+
+    def put(self, config:dict, row:dict, sketches:dict = None):
+        """Store the results of a configuration
+
+        Args:
+            config (dict): Simulator arguments, with seed
+            row (dict): Results row
+            sketches (dict): Response time sketches
+        """
+        self.put_many([(config, row, sketches)])
+
+    def rows(self, request_timeout:float = None):
+        """Results rows of the current simulator version, in the order they were stored
+
+        Args:
+            request_timeout (float): Only the rows of this request timeout, all rows when None
+
+        Returns:
+            list: (request timeout, results row) of every stored configuration
+        """
+        query = "SELECT request_timeout, row FROM results WHERE version = ?"
+        parameters = [SIMULATOR_VERSION]
+        if request_timeout is not None:
+            query += " AND request_timeout = ?"
+            parameters.append(request_timeout)
+        return [(timeout, json.loads(row)) for timeout, row in self.connection.execute(query + " ORDER BY rowid", parameters)]
+
+    def export_csv(self, directory:str = settings.RESULTS_EXPORT_DIRECTORY, overwrite:bool = False):
+        """Write the stored rows in the layout of the results directory, <directory>/RT_<t>/RT_<t>_simulation.csv
+
+        Args:
+            directory (str): Root of the layout
+            overwrite (bool): Replace csv files that already exist, a FileExistsError is raised otherwise
+
+        Returns:
+            list: Paths of the csv files written
+        """
+        import pandas as pd
+
+        by_timeout = {}
+        for request_timeout, row in self.rows():
+            by_timeout.setdefault(request_timeout, []).append(row)
+        paths = {
+            request_timeout: os.path.join(directory, f"RT_{request_timeout:g}", f"RT_{request_timeout:g}_simulation.csv")
+            for request_timeout in by_timeout
+        }
+        existing = [path for path in paths.values() if os.path.exists(path)]
+        if existing and not overwrite:
+            # Checked before writing anything so a refused export leaves the layout untouched
+            raise FileExistsError(f"Not overwriting {', '.join(existing)}, export to another directory or pass overwrite (--force)")
+        for request_timeout, rows in by_timeout.items():
+            os.makedirs(os.path.dirname(paths[request_timeout]), exist_ok = True)
+            pd.DataFrame(rows).to_csv(paths[request_timeout], index = False)
+        return list(paths.values())
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM results WHERE version = ?", (SIMULATOR_VERSION,)).fetchone()[0]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Export a results store to the RT_<request_timeout> csv layout')
+    parser.add_argument('path', type=str, help='path of the results store')
+    parser.add_argument('--export', type=str, default=settings.RESULTS_EXPORT_DIRECTORY, help='root directory of the csv layout')
+    parser.add_argument('--force', action='store_true', help='overwrite csv files that already exist')
+    args = parser.parse_args()
+
+    with ResultsStore(args.path) as store:
+        for path in store.export_csv(args.export, overwrite = args.force):
+            print(path)
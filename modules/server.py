@@ -1,25 +1,106 @@
-import numpy as np
+import settings
+
+from modules.request_queue import RequestQueue
+from utils.random_streams import RandomStream
 
 
 class Server:
-    def __init__(self, core_count:int, average_service_time:float) -> None:
+    def __init__(self, core_count:int, average_service_time:float, service_stream:RandomStream, queue_length:int) -> None:
         """Server instance, consisting of multiple cores.
 
+        Busy cores are counted per priority class, together with their time integral, which is
+        only updated when a core is taken or freed.
+
         Args:
             core_count (int): Core count in the server for multi-processing
             average_service_time (float): average service time for exponential distribution
+            service_stream (RandomStream): Stream of standard exponential variates
+            queue_length (int): Maximum length of the waiting queue of every priority class
         """
         self.core_count = core_count
         self.busy_cores = 0
+        self.class_busy_cores = [0] * settings.PRIORITY_CLASSES
+        self.busy_area = [0.0] * settings.PRIORITY_CLASSES    # Integral of the busy cores of every class over time
+        self.busy_since = [0.0] * settings.PRIORITY_CLASSES   # Time the busy cores of every class last changed
+        self.statistics_start_time = 0.0
         
-        self.regular_queue = [] # Waiting queue for normal requests
-        self.priority_queue = []    # Waiting queue for high priority requests
+        self.queue = RequestQueue(settings.PRIORITY_CLASSES, queue_length)   # Waiting queue, higher priorities first
         self.average_service_time = average_service_time    # Average service time 
+        self.service_stream = service_stream
 
-    def get_service_time(self):
+    def get_service_time(self, service_stream:RandomStream = None):
         """Generate service time from exponential distribution
 
+        Args:
+            service_stream (RandomStream): Stream of the client of the request with common random
+                                           numbers, the stream of the server by default
+
         Returns:
             float: Service time
         """
-        return np.random.exponential(self.average_service_time)
+        return self.average_service_time * (service_stream or self.service_stream).next()
+
+    def acquire_core(self, request_priority:int, current_time:float):
+        """Take a core for a request
+
+        Args:
+            request_priority (int): Priority class of the request
+            current_time (float): Current simulation time
+        """
+        busy = self.class_busy_cores[request_priority]
+        self.busy_area[request_priority] += busy * (current_time - self.busy_since[request_priority])
+        self.busy_since[request_priority] = current_time
+        self.class_busy_cores[request_priority] = busy + 1
+        self.busy_cores += 1
+
+    def release_core(self, request_priority:int, current_time:float):
+        """Free the core of a request
+
+        Args:
+            request_priority (int): Priority class of the request
+            current_time (float): Current simulation time
+        """
+        busy = self.class_busy_cores[request_priority]
+        self.busy_area[request_priority] += busy * (current_time - self.busy_since[request_priority])
+        self.busy_since[request_priority] = current_time
+        self.class_busy_cores[request_priority] = busy - 1
+        self.busy_cores -= 1
+
+    def reset_statistics(self, current_time:float):
+        """Restart the time integrals of the server and its queue
+
+        Args:
+            current_time (float): Current simulation time, start of the measurement window
+        """
+        self.statistics_start_time = current_time
+        self.busy_area = [0.0] * settings.PRIORITY_CLASSES
+        self.busy_since = [current_time] * settings.PRIORITY_CLASSES
+        self.queue.reset_statistics(current_time)
+
+    def busy_integral(self, current_time:float):
+        """Integral of the busy cores over time since the statistics were reset
+
+        Args:
+            current_time (float): End of the integral
+
+        Returns:
+            float: Core-seconds of service
+        """
+        return sum(area + busy * (current_time - since) for area, busy, since in zip(self.busy_area, self.class_busy_cores, self.busy_since))
+
+    def average_busy_cores(self, current_time:float):
+        """Time-average number of busy cores of every priority class since the statistics were reset
+
+        Args:
+            current_time (float): End of the measurement window
+
+        Returns:
+            List[float]: Average busy cores per priority class
+        """
+        elapsed = current_time - self.statistics_start_time
+        if elapsed <= 0:
+            return [float(busy) for busy in self.class_busy_cores]
+        return [
+            (area + busy * (current_time - since)) / elapsed
+            for area, busy, since in zip(self.busy_area, self.class_busy_cores, self.busy_since)
+        ]
@@ -1,36 +1,171 @@
 import settings
 
-import heapq
+import csv
 import os 
-import pandas as pd
+import time
+from collections import deque
+from dataclasses import dataclass
 from modules.server import Server
 from modules.event_handler import EventHandler
-from modules.event import Event
-from modules.request import Request
+from modules.event_list import make_event_list
+from modules.array_event_handler import ArrayEventHandler
+from modules.numba_event_handler import NumbaEventHandler, numba_unsupported_reason
+from modules.timeout_manager import TimeoutManager
 from utils.probability_gen import get_probablity
+from utils.instrumentation import Instrumentation, InstrumentationReport
 from utils.logger import get_logger
-import matplotlib.pyplot as plt
+from utils.random_streams import RandomStreams
+from utils.trace import get_trace_recorder
+from utils.output_analysis import OutputAnalysis
+from utils.quantile_sketch import merge_sketches
+from utils.time_series import TimeSeriesRecorder
+from modules.checkpoint import save_checkpoint
+
+
+ENGINES = {
+    "object" : EventHandler,    # Event and Request objects
+    "array" : ArrayEventHandler,    # Event tuples and request arrays
+    "numba" : NumbaEventHandler     # Compiled kernel over numpy arrays, falls back to array when it cannot run
+}
+
+
+@dataclass
+class SimulationResult:
+    """Outcome of a simulation run, indexable by results column like the row itself
+    """
+    row: dict   # Results row, column name -> value, as written to the csv
+    sketches: dict  # Response time sketches, tier name -> list indexed by priority
+    seed: object    # Seed that reproduces the run
+    end_time: float     # Simulated seconds
+    events_processed: int
+    wall_time: float    # Wall-clock seconds spent in run
+    instrumentation: InstrumentationReport = None   # Handler times and event loop counters, when the run is instrumented
+
+    def __getitem__(self, column:str):
+        return self.row[column]
+
+    @property
+    def throughput(self) -> float:
+        return self.row["system_throughput"]
+
+    @property
+    def goodput(self) -> float:
+        return self.row["system_goodput"]
+
+    @property
+    def response_time(self) -> float:
+        return self.row["system_average_response_time"]
+
+    @property
+    def drop_fraction(self) -> float:
+        return self.row["fraction_of_requests_dropped"]
+
+    def percentile(self, percentile:float, tier:str = "system"):
+        """Response time percentile of a tier over both priority classes
+
+        Args:
+            percentile (float): Percentile in [0, 100]
+            tier (str): "system", "app_server" or "db_server"
+
+        Returns:
+            float: Response time, within the relative accuracy of the sketches
+        """
+        return merge_sketches(self.sketches[tier]).quantiles([percentile / 100])[0]
+
+
+@dataclass
+class MetricSnapshot:
+    """Metrics of a simulation between two snapshots, cheap enough to take every few simulated seconds
+    """
+    time: float     # Simulated time of the snapshot
+    events_processed: int
+    wall_time: float    # Wall-clock seconds spent handling events so far
+    throughput: float   # Completions per second since the previous snapshot
+    goodput: float
+    response_time: float    # Mean system response time of the completions since the previous snapshot
+    drop_rate: float    # Drops per second since the previous snapshot
+    timeout_rate: float
+    utilization: dict   # Server name -> busy fraction of its cores since the previous snapshot
+    queue_lengths: dict     # Server name -> waiting requests at the time of the snapshot
+    pending_events: int     # Event list, arrival FIFO and timeouts
+
+    @property
+    def saturated(self) -> bool:
+        """Whether a server was busy all along with requests waiting, or requests were dropped
+        """
+        return self.drop_rate > 0 or any(
+            utilization >= settings.SATURATION_UTILIZATION and self.queue_lengths[name] > 0
+            for name, utilization in self.utilization.items()
+        )
+
+    def summary(self):
+        """One line report of the snapshot
+
+        Returns:
+            str: Time, rates, response time, utilization and queue length of every server
+        """
+        servers = " | ".join(f"{name} {self.utilization[name]:.1%} busy, {self.queue_lengths[name]:,} waiting" for name in self.utilization)
+        return (f"{self.time:.1f} sec : {self.throughput:.2f} reqs/sec, {self.response_time:.4f} sec, {self.drop_rate:.2f} drops/sec, "
+                f"{self.timeout_rate:.2f} timeouts/sec | {servers}{' | SATURATED' if self.saturated else ''}")
 
 
 class Simulator:
     def __init__(self, **argv) -> None:
-        """Simulator instance
+        """Simulator instance, nothing is written to disk unless a log, trace, time series or checkpoint is asked for
         """
-        self.logger = get_logger("EVENT_HANDLER")
+        self.logger = get_logger("EVENT_HANDLER", log_to_file = bool(argv.get('log_to_file')))
         
         self.simulation_time = argv['simulation_time']
+        self.random_streams = RandomStreams(
+            seed = argv.get('seed'), 
+            common_random_numbers = bool(argv.get('common_random_numbers'))
+        )
+        self.seed = self.random_streams.seed
+
         self.application_server = Server(
             core_count = argv['application_server_count'],
-            average_service_time = argv['application_service_time']
+            average_service_time = argv['application_service_time'],
+            service_stream = self.random_streams.app_service,
+            queue_length = argv["app_server_queue_length"]
         )
 
         self.db_server = Server(
             core_count = argv['db_server_count'],
-            average_service_time = argv['db_service_time']
+            average_service_time = argv['db_service_time'],
+            service_stream = self.random_streams.db_service,
+            queue_length = argv["db_server_queue_length"]
         )
 
-        self.event_queue = []   # Priority queue for event handler
-        self.event_handler = EventHandler(
+        self.trace = get_trace_recorder(
+            mode = argv.get('trace_mode', settings.TRACE_MODE),
+            path = argv.get('trace_path') or os.path.join(settings.ITER_LOGS_DIR, "trace.npy"),
+            sample_every = argv.get('trace_sample_every', settings.TRACE_SAMPLE_EVERY)
+        )
+
+        # Fixed-interval metrics, off unless an interval is given
+        self.time_series = None
+        time_series_interval = argv.get('time_series_interval', settings.TIME_SERIES_INTERVAL)
+        if time_series_interval:
+            self.time_series = TimeSeriesRecorder(
+                path = argv.get('time_series_path') or os.path.join(settings.ITER_LOGS_DIR, "time_series.npy"),
+                interval = time_series_interval,
+                app_core_count = self.application_server.core_count,
+                db_core_count = self.db_server.core_count
+            )
+
+        self.engine = argv.get('engine', settings.DEFAULT_ENGINE)
+        if self.engine not in ENGINES:
+            raise ValueError(f"Unknown engine {self.engine}, expected one of {', '.join(ENGINES)}")
+        self.initialize_run_state(argv)
+        engine = self.engine
+        if engine == "numba":
+            reason = numba_unsupported_reason(self.random_streams.common_random_numbers, self.trace, self.output_analysis, self.instrumentation)
+            if reason is not None:
+                self.logger.warning(f"NUMBA ENGINE UNAVAILABLE, {reason}, RUNNING THE ARRAY ENGINE ...")
+                engine = "array"
+            elif argv.get('event_list', settings.DEFAULT_EVENT_LIST) != "heap":
+                self.logger.warning(f"NUMBA ENGINE KEEPS ITS OWN HEAP, EVENT LIST {argv['event_list'].upper()} IGNORED ...")
+        self.event_handler = ENGINES[engine](
             event_queue = self.event_queue,
             application_server = self.application_server,
             db_server = self.db_server,
@@ -42,13 +177,54 @@ class Simulator:
             db_server_queue_length = argv["db_server_queue_length"],
             retry_delay = argv['retry_delay'],
             request_timeout = argv['request_timeout'],
-            db_call_is_synchronous = argv['db_call_is_synchronous']
+            db_call_is_synchronous = argv['db_call_is_synchronous'],
+            random_streams = self.random_streams,
+            timeouts = self.timeouts,
+            arrivals = self.arrivals,
+            trace = self.trace,
+            output_analysis = self.output_analysis,
+            time_series = self.time_series,
+            instrumentation = self.instrumentation
         )
 
+        self.initialize_simulation(priority_prob = argv['priority_prob'])
+
+    def initialize_run_state(self, argv:dict):
+        """Set up what every simulator shares around its event handler, before the handler is built
+
+        Output analysis, instrumentation, the future event list of self.engine, the timeouts and
+        arrival FIFO, checkpoints and the time and event counters.
+
+        Args:
+            argv (dict): Simulator arguments
+        """
+        # Warm-up detection and batch means, off unless asked for
+        self.target_precision = argv.get('target_precision')
+        self.output_analysis = None
+        if argv.get('detect_warmup') or self.target_precision is not None:
+            self.output_analysis = OutputAnalysis(
+                detect_warmup = bool(argv.get('detect_warmup')),
+                confidence = argv.get('confidence', 0.95)
+            )
+
+        # Handler times and event loop counters, off unless asked for, runs without them pay nothing
+        self.instrumentation = Instrumentation() if argv.get('instrument') else None
+
+        self.event_queue = make_event_list(argv.get('event_list', settings.DEFAULT_EVENT_LIST), self.engine)  # Future event list of the event handler
+        self.timeouts = TimeoutManager()    # Request timeouts, merged with the event queue in run
+        self.arrivals = deque()     # Arrivals scheduled in time order, merged with the event queue in run
+
+        # Periodic checkpoints to resume the run after a crash, off unless an interval is given
+        self.checkpoint_every = argv.get('checkpoint_every')
+        self.checkpoint_path = argv.get('checkpoint_path') or os.path.join(settings.ITER_LOGS_DIR, "checkpoint.pkl.gz")
+
         self.num_clients = argv['clients']
         self.request_timeout = argv['request_timeout']
-    
-        self.initialize_simulation(priority_prob = argv['priority_prob'])
+        self.current_time = 0
+        self.end_time = 0   # Horizon the simulation ran until
+        self.events_processed = 0
+        self.wall_time = 0.0    # Wall-clock seconds spent handling events
+        self.last_snapshot = None   # Time, counters and integrals of the previous metric snapshot
 
     def initialize_simulation(self, priority_prob):
         """Initialize the simulator with start events
@@ -58,137 +234,452 @@ class Simulator:
         """
         self.logger.info("INITIALIZING SIMULATION ...")
         
-        for i in range(self.num_clients):
-            heapq.heappush(
-                self.event_queue,
-                Event(
-                    type = settings.EVENT_REQUEST_ARRIVAL,
-                    request = Request(
-                        request_priority = int(get_probablity(priority_prob)),
-                        request_timeout = self.request_timeout,
-                        need_server = settings.APPLICATION_SERVER,
-                        arrival_time = 0
-                    ),
-                    time = 0
-                )
+        for client_id in range(self.num_clients):
+            self.event_handler.schedule_arrival(
+                client_id = client_id,
+                request_priority = int(get_probablity(priority_prob, self.random_streams.client(client_id).priority)),
+                time = 0
             )
 
-    def run(self):
+    def run(self, write_results:bool = False, verbose:bool = False):
         """Run the simulation
+
+        Args:
+            write_results (bool): Append the results row to RT_<request_timeout>_simulation.csv
+            verbose (bool): Print the configuration and results report
+
+        Returns:
+            SimulationResult: Results row and response time sketches of the run
         """
         self.logger.info("SIMULATION STARTED ...")
+        start = time.perf_counter()
 
-        current_time = 0
-        while current_time < self.simulation_time:
-            event = heapq.heappop(self.event_queue)
-            current_time = event.time
-            self.event_handler.handle_event(
-                event = event,
-                current_time = current_time
-            )
+        while self.end_time < self.simulation_time:
+            stop_time = self.simulation_time
+            if self.target_precision is not None:
+                stop_time = min(stop_time, self.end_time + settings.PRECISION_CHECK_INTERVAL)
+            if self.checkpoint_every:
+                stop_time = min(stop_time, self.end_time + self.checkpoint_every)
+            self.advance(stop_time)
+
+            if self.checkpoint_every:
+                save_checkpoint(self, self.checkpoint_path)
+            # Stop once the batch-means interval of the response time is tight enough
+            if self.target_precision is not None and self.output_analysis.relative_half_width() <= self.target_precision:
+                self.logger.info(f"TARGET PRECISION REACHED AT {self.end_time} ...")
+                break
+        return self.finish(write_results, verbose, wall_time = time.perf_counter() - start)
+
+    def finish(self, write_results:bool = False, verbose:bool = False, wall_time:float = None):
+        """Close the trace and time series and collect the results, e.g. after stepping the simulation
+
+        Args:
+            write_results (bool): Append the results row to RT_<request_timeout>_simulation.csv
+            verbose (bool): Print the configuration and results report
+            wall_time (float): Wall-clock seconds of the run, the time spent handling events by default
+
+        Returns:
+            SimulationResult: Results row and response time sketches of the run
+        """
+        if self.trace is not None:
+            self.trace.close()
+        if self.time_series is not None:
+            self.time_series.record(self.end_time, self.event_handler.cumulative_metrics(self.end_time))     # Last partial interval
+            self.time_series.close()
+
+        results = self.collect_results()
+        if write_results:
+            save_results([results], self.request_timeout)
+        if verbose:
+            self.print_report(results)
+        return SimulationResult(
+            row = results,
+            sketches = self.event_handler.response_time_sketches(),
+            seed = self.seed,
+            end_time = self.end_time,
+            events_processed = self.events_processed,
+            wall_time = self.wall_time if wall_time is None else wall_time,
+            instrumentation = self.instrumentation.report() if self.instrumentation is not None else None
+        )
+
+    def run_until(self, end_time:float):
+        """Process the events before end_time and carry on from there at the next call
+
+        Args:
+            end_time (float): Simulation time to run until, may be past simulation_time
+
+        Returns:
+            MetricSnapshot: Metrics since the previous snapshot
+        """
+        if end_time < self.end_time:
+            raise ValueError(f"Cannot run until {end_time}, the simulation is already at {self.end_time}")
+        self.advance(end_time)
+        return self.metric_snapshot()
+
+    def step(self, n_events:int = 1):
+        """Process the next n_events events, fewer if simulation_time comes first
+
+        Args:
+            n_events (int): Number of events
+
+        Returns:
+            MetricSnapshot: Metrics since the previous snapshot, at the time of the last event
+        """
+        target = self.events_processed + n_events
+        while self.events_processed < target and self.end_time < self.simulation_time:
+            end_time = self.simulation_time
+            if self.time_series is not None:
+                end_time = min(end_time, self.time_series.next_time)
+            self.run_events(end_time, max_events = target - self.events_processed)
+            if self.time_series is not None and self.end_time >= self.time_series.next_time:
+                self.time_series.record(self.end_time, self.event_handler.cumulative_metrics(self.end_time))
+        return self.metric_snapshot()
+
+    def snapshots(self, interval:float, until:float = None, stop_when_saturated:bool = False):
+        """Run in steps of interval simulated seconds, yielding the metrics of every step
+
+        The simulation carries on from where it stands, and closing the generator leaves it there,
+        ready for run, finish or more steps. Checkpoints and the target precision are left to run.
 
-        results = pd.DataFrame({
-            "num_clients" : [self.num_clients],
-            "app_servers" : [self.event_handler.application_server.core_count],
-            "db_servers" : [self.event_handler.db_server.core_count],
-            "app_server_service_time" : [self.event_handler.application_server.average_service_time],
-            "db_server_service_time" : [self.event_handler.db_server.average_service_time],
-            "app_to_db_server_probability" : [self.event_handler.app_to_db_prob],
-            "priority_probability" : [self.event_handler.priority_prob],
-            "app_server_queue_length" : [self.event_handler.app_server_queue_length],
-            "db_server_queue_length" : [self.event_handler.db_server_queue_length],
-            "db_call_is_synchronous": [bool(self.event_handler.db_call_is_synchronous)],
-
-            # "system_throughput" : [self.event_handler.request_completed_from_system/self.simulation_time],
-            # "app_server_throughput" : [self.event_handler.request_completed_from_app_counter/self.simulation_time],
-            # "db_server_throughput" : [self.event_handler.request_completed_from_db_counter/self.simulation_time],
-
-            "system_throughput" : [(self.event_handler.request_completed_from_system_for_goodput + self.event_handler.request_completed_from_system_for_badput)/self.simulation_time],
-            "app_server_throughput" : [(self.event_handler.request_completed_from_app_counter_for_goodput + self.event_handler.request_completed_from_app_counter_for_badput)/self.simulation_time],
-            "db_server_throughput" : [(self.event_handler.request_completed_from_db_counter_for_goodput + self.event_handler.request_completed_from_db_counter_for_badput)/self.simulation_time],
-
-            "system_goodput" : [self.event_handler.request_completed_from_system_for_goodput/self.simulation_time],
-            "app_server_goodput" : [self.event_handler.request_completed_from_app_counter_for_goodput/self.simulation_time],
-            "db_server_goodput" : [self.event_handler.request_completed_from_db_counter_for_goodput/self.simulation_time],
-
-            "system_badput" : [self.event_handler.request_completed_from_system_for_badput/self.simulation_time],
-            "app_server_badput" : [self.event_handler.request_completed_from_app_counter_for_badput/self.simulation_time],
-            "db_server_badput" : [self.event_handler.request_completed_from_db_counter_for_badput/self.simulation_time],
-
-            "system_average_response_time" : [self.event_handler.average_response_time_of_system],
-            "app_server_average_response_time" : [self.event_handler.average_response_time_of_app_server],
-            "db_server_average_response_time" : [self.event_handler.average_response_time_of_db_server],
-
-            "number_in_system" : [self.event_handler.number_in_system],
-            "number_in_app_server" : [self.event_handler.number_in_app_server],
-            "number_in_db_app_server" : [self.event_handler.number_in_db_server],
-
-            "priority_requests_dropped" : [self.event_handler.priority_request_dropped],
-            "regular_requests_dropped" : [self.event_handler.regular_request_dropped],
-            "total_requests_served" : [(self.event_handler.request_completed_from_system_for_goodput + self.event_handler.request_completed_from_system_for_badput)],
-            "fraction_of_requests_dropped" : [round((self.event_handler.priority_request_dropped + self.event_handler.regular_request_dropped)/(self.event_handler.request_completed_from_system_for_goodput + self.event_handler.request_completed_from_system_for_badput + self.event_handler.priority_request_dropped + self.event_handler.regular_request_dropped),3)],
-
-            "app_server_utilization" : [self.event_handler.application_server.busy_cores/self.event_handler.application_server.core_count],
-            "db_server_utlization": [self.event_handler.db_server.busy_cores/self.event_handler.db_server.core_count]
-        })
-
-        # if file does not exist write header 
-        if not os.path.isfile('RT_{}_simulation.csv'.format(self.request_timeout)):
-            results.to_csv('RT_{}_simulation.csv'.format(self.request_timeout), header='column_names', index=False)
-        else: # else it exists so append without writing the header
-            results.to_csv('RT_{}_simulation.csv'.format(self.request_timeout), mode='a', header=False, index=False)
-
-
-        # plt.plot(self.event_handler.temporal_data.keys(), self.event_handler.temporal_data.values(), label="Number of Requests timedout")
-        # plt.title("Request Timeout -- Time Series ")
-        # plt.xlabel("System Time")
-        # plt.ylabel("Number of requests timedout")
-        # plt.legend()
-        # plt.savefig("./{}/throughput_comparison_curve.jpg".format(filename), bbox_inches="tight")
-        # plt.show()
+        Args:
+            interval (float): Simulated seconds between snapshots
+            until (float): Simulation time of the last snapshot, simulation_time by default
+            stop_when_saturated (bool): Stop after SATURATION_SNAPSHOTS saturated snapshots in a row
+
+        Yields:
+            MetricSnapshot: Metrics of every interval
+        """
+        until = self.simulation_time if until is None else until
+        saturated = 0
+        while self.end_time < until:
+            snapshot = self.run_until(min(until, self.end_time + interval))
+            yield snapshot
+            saturated = saturated + 1 if snapshot.saturated else 0
+            if stop_when_saturated and saturated >= settings.SATURATION_SNAPSHOTS:
+                self.logger.info(f"SATURATED AT {self.end_time}, STOPPING ...")
+                break
+
+    def servers(self):
+        """Servers of the simulation, by name
+
+        Returns:
+            dict: "app_server" and "db_server" -> Server
+        """
+        return {"app_server" : self.event_handler.application_server, "db_server" : self.event_handler.db_server}
+
+    def metric_snapshot(self):
+        """Metrics since the previous snapshot, or since the statistics were last reset
+
+        Returns:
+            MetricSnapshot: Metrics at the current end_time
+        """
+        handler = self.event_handler
+        servers = self.servers()
+        counters = [
+            handler.request_completed_from_system_for_goodput,
+            handler.request_completed_from_system_for_badput,
+            handler.priority_request_dropped + handler.regular_request_dropped,
+            handler.request_timed_out,
+            handler.response_time_sum_of_system
+        ] + [server.busy_integral(self.end_time) for server in servers.values()]
+
+        # Counters restart from zero when the statistics are reset, e.g. at the end of the warm-up
+        last_time, last_counters = self.last_snapshot or (0.0, None)
+        if last_counters is None or handler.statistics_start_time > last_time:
+            last_time, last_counters = handler.statistics_start_time, [0] * len(counters)
+        self.last_snapshot = (self.end_time, counters)
+
+        elapsed = self.end_time - last_time
+        goodput, badput, dropped, timed_out, response_time_sum, *busy = [now - then for now, then in zip(counters, last_counters)]
+        rate = 1 / elapsed if elapsed > 0 else 0.0
+        return MetricSnapshot(
+            time = self.end_time,
+            events_processed = self.events_processed,
+            wall_time = self.wall_time,
+            throughput = (goodput + badput) * rate,
+            goodput = goodput * rate,
+            response_time = response_time_sum / (goodput + badput) if goodput + badput else 0.0,
+            drop_rate = dropped * rate,
+            timeout_rate = timed_out * rate,
+            utilization = {name : area * rate / server.core_count for (name, server), area in zip(servers.items(), busy)},
+            queue_lengths = {name : len(server.queue) for name, server in servers.items()},
+            pending_events = len(self.event_queue) + len(self.arrivals) + len(self.timeouts)
+        )
+
+    def __getstate__(self):
+        """State kept by a checkpoint, without the trace and time series files
+
+        Returns:
+            dict: Attributes of the simulator
+        """
+        state = self.__dict__.copy()
+        state["trace"] = None
+        state["time_series"] = None
+        return state
+
+    def advance(self, end_time:float):
+        """Process the events before end_time, recording the time series intervals ending on the way
+
+        Args:
+            end_time (float): Simulation time to run until
+        """
+        if self.time_series is not None:
+            while self.time_series.next_time <= end_time:
+                self.run_events(self.time_series.next_time)
+                self.time_series.record(self.end_time, self.event_handler.cumulative_metrics(self.end_time))
+        self.run_events(end_time)
+
+    def run_events(self, end_time:float, max_events:int = None):
+        """Process the events before end_time
+
+        Args:
+            end_time (float): Simulation time to run until
+            max_events (int): Stop after this many events, at the time of the last one, None for no limit
+        """
+        start = time.perf_counter()
+        self.current_time, events_processed = self.event_handler.run_until(end_time, self.current_time, max_events)
+        elapsed = time.perf_counter() - start
+        self.wall_time += elapsed
+        if self.instrumentation is not None:
+            self.instrumentation.add_loop_time(elapsed)
+        self.events_processed += events_processed
+        self.end_time = self.current_time if events_processed == max_events else end_time
+
+    def collect_results(self):
+        """Results row of the simulation
+
+        Returns:
+            dict: Column name -> value
+        """
+        handler = self.event_handler
+        completed_from_system = handler.request_completed_from_system_for_goodput + handler.request_completed_from_system_for_badput
+        dropped = handler.priority_request_dropped + handler.regular_request_dropped
+        measured_time = self.end_time - handler.statistics_start_time  # Rates exclude a detected warm-up
+        completed_from_app = handler.request_completed_from_app_counter_for_goodput + handler.request_completed_from_app_counter_for_badput
+        completed_from_db = handler.request_completed_from_db_counter_for_goodput + handler.request_completed_from_db_counter_for_badput
+
+        # Time averages per priority class
+        app_busy = handler.application_server.average_busy_cores(self.end_time)
+        db_busy = handler.db_server.average_busy_cores(self.end_time)
+        app_queue = handler.application_server.queue.average_lengths(self.end_time)
+        db_queue = handler.db_server.queue.average_lengths(self.end_time)
+        number_in_app_server = [busy + waiting for busy, waiting in zip(app_busy, app_queue)]
+        number_in_db_server = [busy + waiting for busy, waiting in zip(db_busy, db_queue)]
+        results = {
+            "num_clients" : self.num_clients,
+            "app_servers" : handler.application_server.core_count,
+            "db_servers" : handler.db_server.core_count,
+            "app_server_service_time" : handler.application_server.average_service_time,
+            "db_server_service_time" : handler.db_server.average_service_time,
+            "app_to_db_server_probability" : handler.app_to_db_prob,
+            "priority_probability" : handler.priority_prob,
+            "app_server_queue_length" : handler.app_server_queue_length,
+            "db_server_queue_length" : handler.db_server_queue_length,
+            "db_call_is_synchronous": bool(handler.db_call_is_synchronous),
+
+            "system_throughput" : completed_from_system/measured_time,
+            "app_server_throughput" : completed_from_app/measured_time,
+            "db_server_throughput" : completed_from_db/measured_time,
+
+            "system_goodput" : handler.request_completed_from_system_for_goodput/measured_time,
+            "app_server_goodput" : handler.request_completed_from_app_counter_for_goodput/measured_time,
+            "db_server_goodput" : handler.request_completed_from_db_counter_for_goodput/measured_time,
+
+            "system_badput" : handler.request_completed_from_system_for_badput/measured_time,
+            "app_server_badput" : handler.request_completed_from_app_counter_for_badput/measured_time,
+            "db_server_badput" : handler.request_completed_from_db_counter_for_badput/measured_time,
+
+            "system_average_response_time" : handler.response_time_sum_of_system/completed_from_system if completed_from_system else 0.0,
+            "app_server_average_response_time" : handler.response_time_sum_of_app_server/completed_from_app if completed_from_app else 0.0,
+            "db_server_average_response_time" : handler.response_time_sum_of_db_server/completed_from_db if completed_from_db else 0.0,
+
+            "number_in_system" : sum(number_in_app_server) + sum(number_in_db_server),
+            "number_in_app_server" : sum(number_in_app_server),
+            "number_in_db_app_server" : sum(number_in_db_server),
+            "priority_number_in_system" : number_in_app_server[settings.HIGH_PRIORITY] + number_in_db_server[settings.HIGH_PRIORITY],
+            "regular_number_in_system" : number_in_app_server[settings.LOW_PRIORITY] + number_in_db_server[settings.LOW_PRIORITY],
+            "app_server_average_queue_length" : sum(app_queue),
+            "db_server_average_queue_length" : sum(db_queue),
 
+            "priority_requests_dropped" : handler.priority_request_dropped,
+            "regular_requests_dropped" : handler.regular_request_dropped,
+            "requests_timed_out" : handler.request_timed_out,
+            "total_requests_served" : completed_from_system,
+            "fraction_of_requests_dropped" : round(dropped/(completed_from_system + dropped), 3) if completed_from_system + dropped else 0.0,
+
+            "app_server_utilization" : sum(app_busy)/handler.application_server.core_count,
+            "db_server_utlization": sum(db_busy)/handler.db_server.core_count,
+            "priority_app_server_utilization" : app_busy[settings.HIGH_PRIORITY]/handler.application_server.core_count,
+            "priority_db_server_utilization" : db_busy[settings.HIGH_PRIORITY]/handler.db_server.core_count
+        }
+        results.update(percentile_columns(handler.response_time_sketches()))
+        results.update(self.output_analysis_columns())
+        return results
+
+    def output_analysis_columns(self):
+        """Warm-up and batch-means columns of the results row
+
+        Returns:
+            dict: Column name -> value, empty when output analysis is off
+        """
+        if self.output_analysis is None:
+            return {}
+        mean, half_width = self.output_analysis.interval()
+        return {
+            "warmup_time" : self.event_handler.statistics_start_time,
+            "measured_time" : self.end_time - self.event_handler.statistics_start_time,
+            "system_response_time_batch_mean" : mean,
+            "system_response_time_half_width" : half_width,
+            "batch_count" : len(self.output_analysis.batch_means.means)
+        }
+
+    def print_report(self, results:dict):
+        """Print the configuration and results of the simulation
+
+        Args:
+            results (dict): Results row of the simulation
+        """
         print(f"""
 -- SYSTEM CONFIGURATION --
-num clients : {self.num_clients}
-app servers : {self.event_handler.application_server.core_count}
-db servers : {self.event_handler.db_server.core_count}
-app server service time : {self.event_handler.application_server.average_service_time} seconds
-db server service time : {self.event_handler.db_server.average_service_time} seconds
-app to db server probability : {self.event_handler.app_to_db_prob}
-priority probability : {self.event_handler.priority_prob}
-app server queue length : {self.event_handler.app_server_queue_length}
-db server queue length : {self.event_handler.db_server_queue_length}
-synchronous db calls: {bool(self.event_handler.db_call_is_synchronous)}
-
--- Temporal Data --
-{self.event_handler.temporal_data}
+seed : {self.seed}
+common random numbers : {self.random_streams.common_random_numbers}
+num clients : {results["num_clients"]}
+app servers : {results["app_servers"]}
+db servers : {results["db_servers"]}
+app server service time : {results["app_server_service_time"]} seconds
+db server service time : {results["db_server_service_time"]} seconds
+app to db server probability : {results["app_to_db_server_probability"]}
+priority probability : {results["priority_probability"]}
+app server queue length : {results["app_server_queue_length"]}
+db server queue length : {results["db_server_queue_length"]}
+synchronous db calls: {results["db_call_is_synchronous"]}
 
 -- RESULTS --
-system throughput : {(self.event_handler.request_completed_from_system_for_goodput + self.event_handler.request_completed_from_system_for_badput)/self.simulation_time} reqs/sec
-app server throughput : {(self.event_handler.request_completed_from_app_counter_for_goodput + self.event_handler.request_completed_from_app_counter_for_badput)/self.simulation_time} reqs/sec
-db server throughput : {(self.event_handler.request_completed_from_db_counter_for_goodput + self.event_handler.request_completed_from_db_counter_for_badput)/self.simulation_time} reqs/sec
-
-system goodput : {(self.event_handler.request_completed_from_system_for_goodput)/self.simulation_time} reqs/sec
-app server goodput : {(self.event_handler.request_completed_from_app_counter_for_goodput)/self.simulation_time} reqs/sec
-db server goodput : {(self.event_handler.request_completed_from_db_counter_for_goodput)/self.simulation_time} reqs/sec
-
-system badput : {(self.event_handler.request_completed_from_system_for_badput)/self.simulation_time} reqs/sec
-app server badput : {(self.event_handler.request_completed_from_app_counter_for_badput)/self.simulation_time} reqs/sec
-db server badput : {(self.event_handler.request_completed_from_db_counter_for_badput)/self.simulation_time} reqs/sec
-
-system average response time : {self.event_handler.average_response_time_of_system} sec
-app server average response time : {self.event_handler.average_response_time_of_app_server} sec
-db server average response time : {self.event_handler.average_response_time_of_db_server} sec
-
-number in system : {self.event_handler.number_in_system}
-number in app server : {self.event_handler.number_in_app_server}
-number in db app server : {self.event_handler.number_in_db_server}
-
-priority requests dropped : {self.event_handler.priority_request_dropped}
-regular requests dropped : {self.event_handler.regular_request_dropped}
-total requests served : {self.event_handler.request_completed_from_system_for_goodput + self.event_handler.request_completed_from_system_for_badput}
-fraction of requests dropped : {round((self.event_handler.priority_request_dropped + self.event_handler.regular_request_dropped)/(self.event_handler.request_completed_from_system_for_goodput + self.event_handler.request_completed_from_system_for_badput + self.event_handler.priority_request_dropped + self.event_handler.regular_request_dropped),3)}
-
-app server utilization : {self.event_handler.application_server.busy_cores/self.event_handler.application_server.core_count}
-db server utlization: {self.event_handler.db_server.busy_cores/self.event_handler.db_server.core_count}
-        """)
\ No newline at end of file
+system throughput : {results["system_throughput"]} reqs/sec
+app server throughput : {results["app_server_throughput"]} reqs/sec
+db server throughput : {results["db_server_throughput"]} reqs/sec
+
+system goodput : {results["system_goodput"]} reqs/sec
+app server goodput : {results["app_server_goodput"]} reqs/sec
+db server goodput : {results["db_server_goodput"]} reqs/sec
+
+system badput : {results["system_badput"]} reqs/sec
+app server badput : {results["app_server_badput"]} reqs/sec
+db server badput : {results["db_server_badput"]} reqs/sec
+
+system average response time : {results["system_average_response_time"]} sec
+app server average response time : {results["app_server_average_response_time"]} sec
+db server average response time : {results["db_server_average_response_time"]} sec
+
+number in system : {results["number_in_system"]}
+number in app server : {results["number_in_app_server"]}
+number in db app server : {results["number_in_db_app_server"]}
+priority number in system : {results["priority_number_in_system"]}
+regular number in system : {results["regular_number_in_system"]}
+app server average queue length : {results["app_server_average_queue_length"]}
+db server average queue length : {results["db_server_average_queue_length"]}
+
+priority requests dropped : {results["priority_requests_dropped"]}
+regular requests dropped : {results["regular_requests_dropped"]}
+requests timed out : {results["requests_timed_out"]}
+total requests served : {results["total_requests_served"]}
+fraction of requests dropped : {results["fraction_of_requests_dropped"]}
+
+system p95 / p99 response time : {results["system_p95_response_time"]} / {results["system_p99_response_time"]} sec
+priority p95 / p99 response time : {results["priority_system_p95_response_time"]} / {results["priority_system_p99_response_time"]} sec
+app server p95 / p99 response time : {results["app_server_p95_response_time"]} / {results["app_server_p99_response_time"]} sec
+db server p95 / p99 response time : {results["db_server_p95_response_time"]} / {results["db_server_p99_response_time"]} sec
+
+app server utilization : {results["app_server_utilization"]}
+db server utlization: {results["db_server_utlization"]}
+priority app server utilization : {results["priority_app_server_utilization"]}
+priority db server utilization : {results["priority_db_server_utilization"]}
+        """)
+        self.print_output_analysis(results)
+
+    def print_output_analysis(self, results:dict):
+        """Print the warm-up and batch-means interval of the simulation, if output analysis is on, and the instrumentation
+
+        Args:
+            results (dict): Results row of the simulation
+        """
+        if self.output_analysis is not None:
+            print(f"""-- OUTPUT ANALYSIS --
+warm-up : {results["warmup_time"]} sec
+measured time : {results["measured_time"]} sec
+system response time : {results["system_response_time_batch_mean"]} +/- {results["system_response_time_half_width"]} sec ({results["batch_count"]} batches)
+        """)
+        if self.instrumentation is not None:
+            print(f"-- INSTRUMENTATION --\n{self.instrumentation.report().summary()}\n")
+
+
+def percentile_columns(sketches:dict):
+    """Response time percentile columns of the results row
+
+    Args:
+        sketches (dict): Tier name -> list of quantile sketches indexed by priority
+
+    Returns:
+        dict: <tier>_p<percentile>_response_time over both classes, and the same prefixed with priority_ or regular_
+    """
+    quantiles = [percentile / 100 for percentile in settings.RESPONSE_TIME_PERCENTILES]
+    columns = {}
+    for tier, class_sketches in sketches.items():
+        for prefix, sketch in (
+            ("", merge_sketches(class_sketches)),
+            ("priority_", class_sketches[settings.HIGH_PRIORITY]),
+            ("regular_", class_sketches[settings.LOW_PRIORITY])
+        ):
+            for percentile, value in zip(settings.RESPONSE_TIME_PERCENTILES, sketch.quantiles(quantiles)):
+                columns[f"{prefix}{tier}_p{percentile}_response_time"] = value
+    return columns
+
+def merge_response_time_sketches(sketch_sets:list):
+    """Merge the response time sketches of several runs, e.g. replications of one configuration
+
+    Args:
+        sketch_sets (list): Tier name -> list of quantile sketches indexed by priority, of every run
+
+    Returns:
+        dict: Tier name -> list of merged sketches indexed by priority
+    """
+    return {
+        tier : [merge_sketches([sketches[tier][priority] for sketches in sketch_sets]) for priority in range(settings.PRIORITY_CLASSES)]
+        for tier in sketch_sets[0]
+    }
+
+def save_results(rows:list, request_timeout:float, directory:str = ".", kind:str = "simulation"):
+    """Append results rows to RT_<request_timeout>_<kind>.csv in a single write
+
+    Rows are only appended under a header with the same columns. When the file was written with
+    other columns, e.g. by an older version, they go to RT_<request_timeout>_<kind>_2.csv, or the
+    first numbered file whose header matches or that does not exist yet.
+
+    Args:
+        rows (list): Results rows, column name -> value
+        request_timeout (float): Request timeout of the rows
+        directory (str): Directory of the csv file
+        kind (str): "simulation", "analytic" for Mean Value Analysis rows or "topology" for TopologySimulator rows
+
+    Returns:
+        str: Path of the csv file written
+    """
+    import pandas as pd
+
+    results = pd.DataFrame(rows)
+    columns = [str(column) for column in results.columns]
+    path = os.path.join(directory, 'RT_{}_{}.csv'.format(request_timeout, kind))
+    number = 1
+    while os.path.isfile(path):
+        with open(path, newline='') as file:
+            header = next(csv.reader(file), [])
+        if header == columns:
+            # it exists with the same columns so append without writing the header
+            results.to_csv(path, mode='a', header=False, index=False)
+            return path
+        number += 1
+        path = os.path.join(directory, 'RT_{}_{}_{}.csv'.format(request_timeout, kind, number))
+
+    # if file does not exist write header
+    results.to_csv(path, header='column_names', index=False)
+    return path
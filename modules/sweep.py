@@ -0,0 +1,93 @@
+import settings
+
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from modules.simulator import Simulator, save_results
+from modules.results_store import ResultsStore
+
+
+def expand_grid(grid:dict, base_config:dict):
+    """Configurations of every point of a parameter grid
+
+    Args:
+        grid (dict): Simulator argument -> list of values to sweep
+        base_config (dict): Simulator arguments shared by every point
+
+    Returns:
+        list: Simulator arguments of every point, the last grid argument varying fastest
+    """
+    names = list(grid)
+    return [
+        dict(base_config, **dict(zip(names, values)))
+        for values in itertools.product(*(grid[name] for name in names))
+    ]
+
+def run_point(config:dict):
+    """Simulate one sweep point, in a worker process
+
+    Args:
+        config (dict): Simulator arguments of the point
+
+    Returns:
+        (dict, dict): Results row of the point and its response time sketches (tier name -> list indexed by
+                      priority), which merge with those of other points or replications
+    """
+    result = Simulator(**config).run()
+    return result.row, result.sketches
+
+def run_sweep(grid:dict, base_config:dict, workers:int = None, store:ResultsStore = None):
+    """Simulate every point of a parameter grid in parallel
+
+    With a results store, points already stored are not simulated again, and new points are
+    stored in batches as they finish. Points without a seed then get a fresh one, so that their
+    results can be reproduced.
+
+    Args:
+        grid (dict): Simulator argument -> list of values to sweep
+        base_config (dict): Simulator arguments shared by every point
+        workers (int): Number of worker processes, one per CPU by default
+        store (ResultsStore): Results store looked up first and filled with the new points
+
+    Returns:
+        list: (config, results row, response time sketches) of every point, in grid order
+    """
+    configs = expand_grid(grid, base_config)
+    if store is None:
+        results = [None] * len(configs)
+    else:
+        configs = [config if config.get("seed") is not None else dict(config, seed = np.random.SeedSequence().entropy)
+                   for config in configs]
+        results = store.get_many(configs)
+    missing = [index for index, result in enumerate(results) if result is None]
+
+    if missing:
+        workers = min(workers or os.cpu_count() or 1, len(missing))
+        pending = []    # New points not stored yet
+        with ProcessPoolExecutor(max_workers = workers) as executor:
+            for index, result in zip(missing, executor.map(run_point, [configs[index] for index in missing])):
+                results[index] = result
+                if store is not None:
+                    pending.append((configs[index], *result))
+                    if len(pending) >= settings.RESULTS_STORE_BATCH_SIZE:
+                        store.put_many(pending)
+                        pending = []
+        if pending:
+            store.put_many(pending)
+    return [(config, row, sketches) for config, (row, sketches) in zip(configs, results)]
+
+def save_sweep(points:list, directory:str = "."):
+    """Write sweep results, one RT_<request_timeout>_simulation.csv batch per request timeout
+
+    Args:
+        points (list): (config, results row, response time sketches) of every point
+        directory (str): Directory of the csv files
+    """
+    by_timeout = {}
+    for config, row, _ in points:
+        by_timeout.setdefault(config["request_timeout"], []).append(row)
+    for request_timeout, rows in by_timeout.items():
+        save_results(rows, request_timeout, directory)
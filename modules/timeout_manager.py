@@ -0,0 +1,83 @@
+from collections import deque
+
+
+class TimeoutManager:
+    def __init__(self) -> None:
+        """Pending request timeouts, kept outside the event queue
+
+        The payload of a timeout is whatever identifies the request for the engine, a Request
+        object or a slot of the request arrays.
+
+        Timeouts of the same duration are scheduled at non-decreasing times, so each duration
+        gets its own FIFO whose head is always its earliest deadline. Cancelling only clears the
+        entry, cleared entries are skipped once they reach the head of their FIFO.
+        """
+        self.fifos = {}   # Timeout duration -> FIFO of [deadline, payload] entries
+        self.pending = 0    # Timeouts neither cancelled nor popped, cleared entries still in the FIFOs excluded
+
+    def schedule(self, payload, current_time:float, timeout:float):
+        """Schedule the timeout of a request
+
+        Args:
+            payload (Request | int): Request to be timed out
+            current_time (float): Current time of the simulation
+            timeout (float): Timeout duration
+
+        Returns:
+            list: Entry of the timeout, to be passed to cancel
+        """
+        entry = [current_time + timeout, payload]
+        fifo = self.fifos.get(timeout)
+        if fifo is None:
+            fifo = self.fifos[timeout] = deque()
+        fifo.append(entry)
+        self.pending += 1
+        return entry
+
+    def cancel(self, entry:list):
+        """Cancel a scheduled timeout in O(1), cancelling it again or once popped does nothing
+
+        Args:
+            entry (list): Entry returned by schedule
+        """
+        if entry[1] is not None:
+            entry[1] = None
+            self.pending -= 1
+
+    def next_fifo(self):
+        """FIFO holding the earliest pending timeout
+
+        Returns:
+            deque: FIFO of the earliest timeout, None if no timeout is pending
+        """
+        earliest = None
+        for fifo in self.fifos.values():
+            while fifo and fifo[0][1] is None:  # Drop cancelled timeouts
+                fifo.popleft()
+            if fifo and (earliest is None or fifo[0][0] < earliest[0][0]):
+                earliest = fifo
+        return earliest
+
+    def next_time(self):
+        """Time of the earliest pending timeout
+
+        Returns:
+            float: Deadline of the earliest timeout, infinity if no timeout is pending
+        """
+        fifo = self.next_fifo()
+        return fifo[0][0] if fifo is not None else float("inf")
+
+    def pop(self):
+        """Remove the earliest pending timeout
+
+        Returns:
+            (float, Request | int): Deadline and payload of the timeout
+        """
+        entry = self.next_fifo().popleft()
+        deadline, payload = entry
+        entry[1] = None     # Fired, a later cancel leaves the count alone
+        self.pending -= 1
+        return deadline, payload
+
+    def __len__(self):
+        return self.pending
@@ -0,0 +1,153 @@
+import settings
+
+import json
+import math
+
+
+SERVICE_DISTRIBUTIONS = ("exponential", "deterministic", "uniform", "erlang", "lognormal")
+
+
+def service_distribution(options:dict):
+    """Generator method and parameters drawing unit-mean service time variates of a tier
+
+    Args:
+        options (dict): Tier options, distribution with shape for erlang and cv for lognormal
+
+    Returns:
+        (str, dict): Generator method, None for deterministic service, and its parameters
+    """
+    distribution = options.get("distribution", "exponential")
+    if distribution == "exponential":
+        return "standard_exponential", {}
+    if distribution == "deterministic":
+        return None, {}
+    if distribution == "uniform":
+        return "uniform", {"low" : 0.0, "high" : 2.0}
+    if distribution == "erlang":
+        shape = options.get("shape", 2)
+        return "gamma", {"shape" : shape, "scale" : 1 / shape}
+    if distribution == "lognormal":
+        sigma2 = math.log(1 + options.get("cv", 1.0) ** 2)
+        return "lognormal", {"mean" : -sigma2 / 2, "sigma" : math.sqrt(sigma2)}
+    raise ValueError(f"Unknown service distribution {distribution}, expected one of {', '.join(SERVICE_DISTRIBUTIONS)}")
+
+
+class Topology:
+    def __init__(self, spec:dict) -> None:
+        """Tiers of a closed-loop web stack and the calls between them, compiled to flat tables
+
+        A request enters the entry tier and is served there. After every service at a tier, it
+        calls one of the tier's callees with the probability of that call, or returns to its caller
+        (the client for the entry tier) otherwise. When a callee returns, the caller serves the
+        request again, unless the caller is a pass-through tier, which returns right away. A
+        synchronous call holds the caller's core until the callee returns. An asynchronous call
+        frees it, and the request queues at the caller again on return.
+
+        Spec, e.g. loaded from json:
+            {"entry" : "app",
+             "tiers" : {"app" : {"cores" : 20, "service_time" : 0.1, "queue_length" : 1000},
+                        "db" : {"cores" : 5, "service_time" : 1, "distribution" : "erlang", "shape" : 4}},
+             "calls" : [{"from" : "app", "to" : "db", "probability" : 0.02, "synchronous" : true}]}
+
+        Tier options are cores, service_time (mean), distribution (one of SERVICE_DISTRIBUTIONS,
+        exponential by default, with shape for erlang and cv for lognormal), queue_length per
+        priority class and pass_through. Tiers are indexed in the order of the spec.
+
+        Args:
+            spec (dict): Topology spec
+        """
+        self.spec = spec
+        self.names = list(spec["tiers"])
+        if not self.names:
+            raise ValueError("A topology needs at least one tier")
+        index = {name : tier for tier, name in enumerate(self.names)}
+        entry = spec.get("entry", self.names[0])
+        if entry not in index:
+            raise ValueError(f"Unknown entry tier {entry}")
+        self.entry = index[entry]
+
+        self.core_counts = []
+        self.service_times = []
+        self.queue_lengths = []
+        self.distributions = []     # (generator method or None for deterministic, parameters) of every tier
+        self.pass_through = []
+        for name in self.names:
+            options = spec["tiers"][name]
+            self.core_counts.append(int(options["cores"]))
+            self.service_times.append(float(options["service_time"]))
+            self.queue_lengths.append(options.get("queue_length", float("inf")))
+            self.distributions.append(service_distribution(options))
+            self.pass_through.append(bool(options.get("pass_through", False)))
+
+        # Routing table: per tier, cumulative call probabilities with the callee and call mode of each
+        calls = [[] for _ in self.names]
+        for call in spec.get("calls", []):
+            if call["from"] not in index or call["to"] not in index:
+                raise ValueError(f"Call between unknown tiers {call['from']} -> {call['to']}")
+            calls[index[call["from"]]].append((float(call["probability"]), index[call["to"]], bool(call.get("synchronous", False))))
+        self.routes = []
+        for tier, tier_calls in enumerate(calls):
+            total = sum(probability for probability, _, _ in tier_calls)
+            if total > 1 + 1e-12 or (total >= 1 and not self.pass_through[tier]):
+                raise ValueError(f"Call probabilities of tier {self.names[tier]} sum to {total}, requests would never return")
+            if not tier_calls:
+                self.routes.append(None)    # Returns without drawing a route
+                continue
+            thresholds, callees, synchronous = [], [], []
+            cumulative = 0.0
+            for probability, callee, is_synchronous in tier_calls:
+                cumulative += probability
+                thresholds.append(cumulative)
+                callees.append(callee)
+                synchronous.append(is_synchronous)
+            self.routes.append((tuple(thresholds), tuple(callees), tuple(synchronous)))
+
+    @classmethod
+    def load(cls, path:str):
+        """Topology of a json spec file
+
+        Args:
+            path (str): Path of the json file
+
+        Returns:
+            Topology: Compiled topology
+        """
+        with open(path) as file:
+            return cls(json.load(file))
+
+    def __len__(self):
+        return len(self.names)
+
+
+def two_tier_topology(**argv):
+    """Topology of the app and db servers of Simulator, from the same arguments
+
+    Args:
+        argv: Simulator arguments, application_server_count, db_server_count, application_service_time,
+              db_service_time, app_to_db_prob, app_server_queue_length, db_server_queue_length and
+              db_call_is_synchronous are used
+
+    Returns:
+        Topology: Two-tier topology, tiers named app_server and db_server
+    """
+    return Topology({
+        "entry" : "app_server",
+        "tiers" : {
+            "app_server" : {
+                "cores" : argv["application_server_count"],
+                "service_time" : argv["application_service_time"],
+                "queue_length" : argv["app_server_queue_length"]
+            },
+            "db_server" : {
+                "cores" : argv["db_server_count"],
+                "service_time" : argv["db_service_time"],
+                "queue_length" : argv["db_server_queue_length"]
+            }
+        },
+        "calls" : [{
+            "from" : "app_server",
+            "to" : "db_server",
+            "probability" : argv["app_to_db_prob"],
+            "synchronous" : bool(argv["db_call_is_synchronous"])
+        }]
+    })
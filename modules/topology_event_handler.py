@@ -0,0 +1,489 @@
+import settings
+
+from collections import deque
+from array import array
+import logging
+
+from modules.event_list import HeapEventList
+from modules.server import Server
+from modules.timeout_manager import TimeoutManager
+from modules.topology import Topology
+from utils.probability_gen import get_probablity, get_retry_delay
+from utils.random_streams import ConstantStream, RandomStreams
+from utils.instrumentation import Instrumentation
+from utils.output_analysis import OutputAnalysis
+from utils.quantile_sketch import QuantileSketch
+
+
+class TopologyEventHandler:
+    def __init__(self, topology:Topology, event_queue:HeapEventList, think_time:float, priority_prob:float,
+                 logger:logging.Logger, retry_delay:float, request_timeout:float, random_streams:RandomStreams,
+                 timeouts:TimeoutManager, arrivals:deque = None, output_analysis:OutputAnalysis = None,
+                 instrumentation:Instrumentation = None) -> None:
+        """Event handler of any topology, driven by its routing table
+
+        Events are (time, seq, type, slot) tuples of three types, arrival, service completion and
+        timeout, dispatched through a list indexed by type. Requests live in struct-of-arrays
+        columns like in ArrayEventHandler, with the tier they are at and a stack of their callers,
+        each flagged when it holds a core for a synchronous call. Handling an event only touches
+        the tier of the request and its callers, whatever the number of tiers.
+
+        Args:
+            topology (Topology): Tiers and routing table
+            event_queue (HeapEventList): Future event list of the simulator, any of modules.event_list
+            think_time (float): think time of the users
+            priority_prob (float): probability that request is of high probability
+            logger (logging.Logger): Logger object
+            retry_delay (float): Retry sending packet after failure
+            request_timeout (float): Timeout value for requests
+            random_streams (RandomStreams): Random streams of the run
+            timeouts (TimeoutManager): Pending request timeouts
+            arrivals (deque): FIFO of arrival events scheduled in time order, kept outside the event queue
+            output_analysis (OutputAnalysis): Warm-up detection and batch means of response times, None when off
+            instrumentation (Instrumentation): Counters and timers of the event loop, None when off
+        """
+        self.logger = logger
+        self.topology = topology
+        self.random_streams = random_streams
+        self.event_queue = event_queue
+        self.push_event, self.pop_event = event_queue.operations()
+        self.timeouts = timeouts
+        self.arrivals = arrivals if arrivals is not None else deque()
+        self.think_time = think_time
+        self.priority_prob = priority_prob
+        self.retry_delay = retry_delay
+        self.request_timeout = request_timeout
+        self.output_analysis = output_analysis
+        self.instrumentation = instrumentation
+
+        self.servers = []
+        for tier, (distribution, parameters) in enumerate(topology.distributions):
+            self.servers.append(Server(
+                core_count = topology.core_counts[tier],
+                average_service_time = topology.service_times[tier],
+                service_stream = ConstantStream() if distribution is None else random_streams.tier_service(tier, distribution, **parameters),
+                queue_length = topology.queue_lengths[tier]
+            ))
+        self.entry = topology.entry
+        self.routes = topology.routes
+        self.pass_through = topology.pass_through
+        self.seq = 0    # Tie breaker of events scheduled at the same time
+
+        # Request columns, indexed by slot
+        self.request_id = array('q')
+        self.client_id = array('l')
+        self.request_priority = array('b')
+        self.arrival_time = array('d')
+        self.is_timed_out = array('b')
+        self.state = array('b')
+        self.tier = array('h')  # Tier serving the request or holding it in its waiting queue
+        self.waiting = array('b')
+        self.callers = []   # Caller stack of every request, tier << 1 | 1 if the caller holds a core
+        self.timeout_entry = []
+        self.free_slots = []
+        self.request_counter = 0
+
+        self.reset_statistics(0)
+
+    def reset_statistics(self, current_time:float):
+        """Discard the statistics collected so far, e.g. at the end of the warm-up
+
+        Args:
+            current_time (float): Current simulation time, start of the measurement window
+        """
+        self.statistics_start_time = current_time
+
+        self.request_completed_from_system_for_goodput = 0
+        self.request_completed_from_system_for_badput = 0
+        self.priority_request_dropped = 0
+        self.regular_request_dropped = 0
+        self.request_timed_out = 0
+        self.response_time_sum_of_system = 0.0
+        self.system_sketches = [QuantileSketch() for _ in range(settings.PRIORITY_CLASSES)]
+
+        # Completions and response times since arrival in the system, per tier
+        self.tier_goodput = [0] * len(self.servers)
+        self.tier_badput = [0] * len(self.servers)
+        self.tier_response_time_sums = [0.0] * len(self.servers)
+        self.tier_sketches = [[QuantileSketch() for _ in range(settings.PRIORITY_CLASSES)] for _ in self.servers]
+
+        for server in self.servers:
+            server.reset_statistics(current_time)
+
+    def acquire_slot(self, client_id:int, request_priority:int, arrival_time:float, is_timed_out:bool):
+        """Allocate the columns of a new request
+
+        Args:
+            client_id (int): Client sending the request
+            request_priority (int): Priority of the request
+            arrival_time (float): Arrival time of the request
+            is_timed_out (bool): Whether the request retries a timed out one
+
+        Returns:
+            int: Slot of the request
+        """
+        request_id = self.request_counter
+        self.request_counter += 1
+        if self.free_slots:
+            slot = self.free_slots.pop()
+            self.request_id[slot] = request_id
+            self.client_id[slot] = client_id
+            self.request_priority[slot] = request_priority
+            self.arrival_time[slot] = arrival_time
+            self.is_timed_out[slot] = is_timed_out
+            self.state[slot] = settings.REQUEST_IN_SERVICE
+            self.tier[slot] = self.entry
+            self.waiting[slot] = False
+            self.timeout_entry[slot] = None
+        else:
+            slot = len(self.state)
+            self.request_id.append(request_id)
+            self.client_id.append(client_id)
+            self.request_priority.append(request_priority)
+            self.arrival_time.append(arrival_time)
+            self.is_timed_out.append(is_timed_out)
+            self.state.append(settings.REQUEST_IN_SERVICE)
+            self.tier.append(self.entry)
+            self.waiting.append(False)
+            self.callers.append([])
+            self.timeout_entry.append(None)
+        return slot
+
+    def release_slot(self, slot:int):
+        """Free the slot of a request nothing refers to anymore
+
+        Args:
+            slot (int): Slot of the request
+        """
+        self.timeout_entry[slot] = None
+        self.callers[slot].clear()
+        self.free_slots.append(slot)
+
+    def in_flight(self):
+        """Number of requests currently holding a slot
+
+        Returns:
+            int: Requests in flight
+        """
+        return len(self.state) - len(self.free_slots)
+
+    def schedule(self, event_type:int, slot:int, time:float):
+        """Push an event in the event queue
+
+        Args:
+            event_type (int): Type of the event
+            slot (int): Slot of the request
+            time (float): Execution time of the event
+        """
+        self.seq += 1
+        self.push_event((time, self.seq, event_type, slot))
+
+    def schedule_arrival(self, client_id:int, request_priority:int, time:float, is_timed_out:bool = False):
+        """Schedule the arrival of a new request at the entry tier
+
+        Args:
+            client_id (int): Client sending the request
+            request_priority (int): Priority of the request
+            time (float): Arrival time of the request
+            is_timed_out (bool): Whether the request retries a timed out one
+        """
+        slot = self.acquire_slot(client_id, request_priority, time, is_timed_out)
+        # Initial and think-time arrivals come in time order and skip the heap, out of order retries do not
+        if not self.arrivals or time >= self.arrivals[-1][0]:
+            self.seq += 1
+            self.arrivals.append((time, self.seq, settings.EVENT_REQUEST_ARRIVAL, slot))
+        else:
+            self.schedule(settings.EVENT_REQUEST_ARRIVAL, slot, time)
+
+    def enter(self, slot:int, tier:int, current_time:float):
+        """Start serving a request at a tier, or queue it there
+
+        Args:
+            slot (int): Slot of the request
+            tier (int): Tier the request enters
+            current_time (float): Current time
+
+        Returns:
+            bool: False if the queue was full and the request was dropped
+        """
+        server = self.servers[tier]
+        self.tier[slot] = tier
+        if server.busy_cores < server.core_count:
+            self.schedule(settings.EVENT_SERVICE_COMPLETE, slot, current_time + server.get_service_time())
+            server.acquire_core(self.request_priority[slot], current_time)
+            return True
+        if server.queue.append(slot, slot, self.request_priority[slot], current_time):
+            self.waiting[slot] = True
+            return True
+        self.handle_request_failure(slot, current_time)   # Request dropped due to queue overflow
+        return False
+
+    def serve_next_request(self, tier:int, current_time:float):
+        """Start serving the next waiting request of a tier, if any
+
+        Args:
+            tier (int): Tier with a free core
+            current_time (float): Current time
+        """
+        server = self.servers[tier]
+        slot = server.queue.popleft(current_time)
+        if slot is not None:
+            self.waiting[slot] = False
+            self.schedule(settings.EVENT_SERVICE_COMPLETE, slot, current_time + server.get_service_time())
+            server.acquire_core(self.request_priority[slot], current_time)
+
+    def release_callers(self, slot:int, current_time:float):
+        """Empty the caller stack of a request that leaves the system, freeing the cores held for it
+
+        Args:
+            slot (int): Slot of the request
+            current_time (float): Current time
+
+        Returns:
+            list: Tiers whose core was freed, innermost caller first
+        """
+        released = []
+        callers = self.callers[slot]
+        while callers:
+            caller = callers.pop()
+            if caller & 1:
+                self.servers[caller >> 1].release_core(self.request_priority[slot], current_time)
+                released.append(caller >> 1)
+        return released
+
+    def return_to_callers(self, slot:int, current_time:float):
+        """Return a request from its tier to the caller that serves it next, or to the client
+
+        Args:
+            slot (int): Slot of the request
+            current_time (float): Current time
+
+        Returns:
+            list: Tiers of pass-through callers whose held core was freed
+        """
+        released = []
+        callers = self.callers[slot]
+        while callers:
+            caller = callers.pop()
+            tier = caller >> 1
+            if caller & 1:  # Synchronous call, the caller's core is waiting
+                server = self.servers[tier]
+                server.release_core(self.request_priority[slot], current_time)
+                if not self.pass_through[tier]:
+                    self.tier[slot] = tier
+                    self.schedule(settings.EVENT_SERVICE_COMPLETE, slot, current_time + server.get_service_time())
+                    server.acquire_core(self.request_priority[slot], current_time)
+                    return released
+                released.append(tier)
+            elif not self.pass_through[tier]:   # Asynchronous call, the request waits for its turn
+                self.enter(slot, tier, current_time)
+                return released
+        self.complete_request(slot, current_time)
+        return released
+
+    def complete_request(self, slot:int, current_time:float):
+        """Request returned to its client
+
+        Args:
+            slot (int): Slot of the request
+            current_time (float): Current time
+        """
+        self.state[slot] = settings.REQUEST_COMPLETED
+        self.timeouts.cancel(self.timeout_entry[slot])
+        self.schedule_arrival(
+            client_id = self.client_id[slot],
+            request_priority = int(get_probablity(self.priority_prob, self.random_streams.priority)),
+            time = current_time + self.think_time
+        )
+        response_time = current_time - self.arrival_time[slot]
+        self.response_time_sum_of_system += response_time
+        self.system_sketches[self.request_priority[slot]].add(response_time)
+
+        # If request was timed out before
+        if self.is_timed_out[slot]:
+            self.request_completed_from_system_for_badput += 1
+        else:
+            self.request_completed_from_system_for_goodput += 1
+        self.release_slot(slot)
+
+        if self.output_analysis is not None and self.output_analysis.observe(response_time, current_time):
+            self.reset_statistics(current_time)
+
+    def handle_request_arrival(self, slot:int, current_time:float):
+        """Request arrives at the entry tier
+
+        Args:
+            slot (int): Slot of the request
+            current_time (float): current time of the simulation
+        """
+        self.timeout_entry[slot] = self.timeouts.schedule(slot, current_time, self.request_timeout)
+        self.enter(slot, self.entry, current_time)
+
+    def handle_service_complete(self, slot:int, current_time:float):
+        """Service of a request completed at its tier, it calls another tier or returns
+
+        Args:
+            slot (int): Slot of the request
+            current_time (float): current time of the simulation
+        """
+        tier = self.tier[slot]
+        server = self.servers[tier]
+        request_priority = self.request_priority[slot]
+        server.release_core(request_priority, current_time)
+
+        if self.state[slot] == settings.REQUEST_IN_SERVICE:
+            response_time = current_time - self.arrival_time[slot]
+            self.tier_response_time_sums[tier] += response_time
+            self.tier_sketches[tier][request_priority].add(response_time)
+            if self.is_timed_out[slot]:
+                self.tier_badput[tier] += 1
+            else:
+                self.tier_goodput[tier] += 1
+
+            # Next tier from the routing table, a single draw whatever the number of callees
+            callee = None
+            route = self.routes[tier]
+            if route is not None:
+                draw = self.random_streams.routing.next()
+                thresholds, callees, synchronous = route
+                for index, threshold in enumerate(thresholds):
+                    if draw < threshold:
+                        callee, is_synchronous = callees[index], synchronous[index]
+                        break
+
+            if callee is not None:
+                callers = self.callers[slot]
+                callers.append(tier << 1)
+                # Core waits for the synchronous call, unless the call was dropped
+                if self.enter(slot, callee, current_time) and is_synchronous:
+                    server.acquire_core(request_priority, current_time)
+                    callers[-1] |= 1
+                released = ()
+            else:
+                released = self.return_to_callers(slot, current_time)
+
+        # Request timed out while being served, nothing refers to it anymore
+        else:
+            released = self.release_callers(slot, current_time)
+            self.release_slot(slot)
+
+        if server.busy_cores < server.core_count:
+            self.serve_next_request(tier, current_time)
+        for released_tier in released:
+            self.serve_next_request(released_tier, current_time)
+
+    def handle_request_failure(self, slot:int, current_time:float, is_timeout:bool = False):
+        """Request timed out or dropped because the buffer queue is full
+
+        Args:
+            slot (int): Slot of the request
+            current_time (float): current time of the simulation
+            is_timeout (bool): Whether the request timed out
+        """
+        request_priority = self.request_priority[slot]
+        if not is_timeout:
+            if request_priority == settings.HIGH_PRIORITY:
+                self.priority_request_dropped += 1
+            else:
+                self.regular_request_dropped += 1
+            self.state[slot] = settings.REQUEST_DROPPED
+            self.timeouts.cancel(self.timeout_entry[slot])   # Client retries now, not again at the timeout
+        else:
+            self.state[slot] = settings.REQUEST_TIMED_OUT
+            self.request_timed_out += 1
+
+        # Dropped or timed out while waiting, the request leaves right away and frees the held cores
+        was_waiting = self.waiting[slot]
+        if was_waiting:
+            self.servers[self.tier[slot]].queue.remove(slot, request_priority, current_time)
+            self.waiting[slot] = False
+        if was_waiting or not is_timeout:
+            for released_tier in self.release_callers(slot, current_time):
+                self.serve_next_request(released_tier, current_time)
+
+        self.schedule_arrival(
+            client_id = self.client_id[slot],
+            request_priority = request_priority,
+            time = current_time + get_retry_delay(self.retry_delay, self.random_streams.retry),
+            is_timed_out = is_timeout
+        )
+
+        # Requests timed out while being served are released once their service completes
+        if was_waiting or not is_timeout:
+            self.release_slot(slot)
+
+    def handle_request_timeout(self, slot:int, current_time:float):
+        """Timeout of a request raised, timeouts of completed requests are cancelled
+
+        Args:
+            slot (int): Slot of the request
+            current_time (float): current time of the simulation
+        """
+        self.handle_request_failure(slot, current_time, is_timeout = True)
+
+    def response_time_sketches(self):
+        """Response time sketches of the system and every tier, per priority class
+
+        Returns:
+            dict: "system" or tier name -> list of sketches indexed by priority
+        """
+        sketches = {"system" : self.system_sketches}
+        sketches.update(zip(self.topology.names, self.tier_sketches))
+        return sketches
+
+    def run_until(self, end_time:float, current_time:float, max_events:int = None):
+        """Handle events in time order up to, not including, end_time
+
+        Args:
+            end_time (float): Simulation time to run until
+            current_time (float): Current simulation time
+            max_events (int): Stop after this many events, None for no limit
+
+        Returns:
+            (float, int): Time of the last handled event, number of events handled
+        """
+        event_queue = self.event_queue
+        pop_event = self.pop_event
+        timeouts = self.timeouts
+        arrivals = self.arrivals
+        handlers = [None] * (max(settings.EVENT_REQUEST_ARRIVAL, settings.EVENT_SERVICE_COMPLETE, settings.EVENT_TIMEOUT) + 1)
+        handlers[settings.EVENT_REQUEST_ARRIVAL] = self.handle_request_arrival
+        handlers[settings.EVENT_SERVICE_COMPLETE] = self.handle_service_complete
+        handlers[settings.EVENT_TIMEOUT] = self.handle_request_timeout
+        if self.instrumentation is not None:
+            for event_type, handler in enumerate(handlers):
+                if handler is not None:
+                    handlers[event_type] = self.instrumentation.instrument(
+                        handler,
+                        event_type_of = lambda slot, event_type = event_type: event_type,
+                        is_stale = lambda slot, event_type = event_type: (event_type == settings.EVENT_SERVICE_COMPLETE
+                                                                          and self.state[slot] != settings.REQUEST_IN_SERVICE),
+                        event_list = event_queue,
+                        arrivals = arrivals,
+                        timeouts = timeouts,
+                        queues = {name : server.queue for name, server in zip(self.topology.names, self.servers)}
+                    )
+
+        events_processed = 0
+        max_events = -1 if max_events is None else max_events   # Never reached by the count
+        while True:
+            # Earliest of the event list, the arrival FIFO and the next timeout, events from end_time on are left for later
+            next_timeout = timeouts.next_time()
+            event = event_queue[0] if event_queue else None
+            from_arrivals = arrivals and (event is None or arrivals[0] < event)
+            if from_arrivals:
+                event = arrivals[0]
+            if event is not None and event[0] <= next_timeout:
+                if event[0] >= end_time:
+                    break
+                current_time, _, event_type, slot = arrivals.popleft() if from_arrivals else pop_event()
+            else:
+                if next_timeout >= end_time:
+                    break
+                current_time, slot = timeouts.pop()
+                event_type = settings.EVENT_TIMEOUT
+            handlers[event_type](slot, current_time)
+            events_processed += 1
+            if events_processed == max_events:
+                break
+        return current_time, events_processed
@@ -0,0 +1,180 @@
+import settings
+
+from modules.simulator import Simulator, percentile_columns, save_results
+from modules.topology import Topology
+from modules.topology_event_handler import TopologyEventHandler
+from utils.logger import get_logger
+from utils.random_streams import RandomStreams
+
+
+class TopologySimulator(Simulator):
+    def __init__(self, **argv) -> None:
+        """Simulator of any topology of tiers, run by TopologyEventHandler
+
+        Takes the Simulator arguments that do not describe the servers, simulation_time, clients,
+        think_time, priority_prob, retry_delay, request_timeout, seed, event_list, instrument,
+        detect_warmup, target_precision, confidence, checkpoint_every, checkpoint_path and log_to_file,
+        plus topology: a Topology, a spec dict or the path of a json spec. Traces, time series and
+        common random numbers are only available with Simulator.
+        """
+        if argv.get('common_random_numbers'):
+            raise ValueError("Common random numbers are not supported by TopologySimulator")
+        self.logger = get_logger("EVENT_HANDLER", log_to_file = bool(argv.get('log_to_file')))
+
+        topology = argv['topology']
+        if isinstance(topology, str):
+            topology = Topology.load(topology)
+        elif isinstance(topology, dict):
+            topology = Topology(topology)
+        self.topology = topology
+
+        self.simulation_time = argv['simulation_time']
+        self.random_streams = RandomStreams(seed = argv.get('seed'))
+        self.seed = self.random_streams.seed
+        self.trace = None
+        self.time_series = None
+
+        self.engine = "topology"
+        self.initialize_run_state(argv)
+        self.event_handler = TopologyEventHandler(
+            topology = topology,
+            event_queue = self.event_queue,
+            think_time = argv['think_time'],
+            priority_prob = argv['priority_prob'],
+            logger = self.logger,
+            retry_delay = argv['retry_delay'],
+            request_timeout = argv['request_timeout'],
+            random_streams = self.random_streams,
+            timeouts = self.timeouts,
+            arrivals = self.arrivals,
+            output_analysis = self.output_analysis,
+            instrumentation = self.instrumentation
+        )
+
+        self.initialize_simulation(priority_prob = argv['priority_prob'])
+
+    def servers(self):
+        """Servers of the simulation, by tier name
+
+        Returns:
+            dict: Tier name -> Server
+        """
+        return dict(zip(self.topology.names, self.event_handler.servers))
+
+    def collect_results(self):
+        """Results row of the simulation, system columns then the columns of every tier
+
+        Returns:
+            dict: Column name -> value
+        """
+        handler = self.event_handler
+        completed_from_system = handler.request_completed_from_system_for_goodput + handler.request_completed_from_system_for_badput
+        dropped = handler.priority_request_dropped + handler.regular_request_dropped
+        measured_time = self.end_time - handler.statistics_start_time  # Rates exclude a detected warm-up
+
+        results = {
+            "num_clients" : self.num_clients,
+            "tiers" : " ".join(self.topology.names),
+            "priority_probability" : handler.priority_prob,
+            "system_throughput" : completed_from_system/measured_time,
+            "system_goodput" : handler.request_completed_from_system_for_goodput/measured_time,
+            "system_badput" : handler.request_completed_from_system_for_badput/measured_time,
+            "system_average_response_time" : handler.response_time_sum_of_system/completed_from_system if completed_from_system else 0.0,
+            "number_in_system" : 0.0,
+            "priority_requests_dropped" : handler.priority_request_dropped,
+            "regular_requests_dropped" : handler.regular_request_dropped,
+            "requests_timed_out" : handler.request_timed_out,
+            "total_requests_served" : completed_from_system,
+            "fraction_of_requests_dropped" : round(dropped/(completed_from_system + dropped), 3) if completed_from_system + dropped else 0.0
+        }
+        for tier, (name, server) in enumerate(zip(self.topology.names, handler.servers)):
+            completed = handler.tier_goodput[tier] + handler.tier_badput[tier]
+            busy = server.average_busy_cores(self.end_time)
+            waiting = server.queue.average_lengths(self.end_time)
+            results.update({
+                f"{name}_cores" : server.core_count,
+                f"{name}_service_time" : server.average_service_time,
+                f"{name}_throughput" : completed/measured_time,
+                f"{name}_goodput" : handler.tier_goodput[tier]/measured_time,
+                f"{name}_badput" : handler.tier_badput[tier]/measured_time,
+                f"{name}_average_response_time" : handler.tier_response_time_sums[tier]/completed if completed else 0.0,
+                f"number_in_{name}" : sum(busy) + sum(waiting),
+                f"{name}_average_queue_length" : sum(waiting),
+                f"{name}_utilization" : sum(busy)/server.core_count
+            })
+            results["number_in_system"] += sum(busy) + sum(waiting)
+        results.update(percentile_columns(handler.response_time_sketches()))
+        results.update(self.output_analysis_columns())
+        return results
+
+    def print_report(self, results:dict):
+        """Print the topology and results of the simulation
+
+        Args:
+            results (dict): Results row of the simulation
+        """
+        tiers = "\n".join(
+            f"{name} : {results[f'{name}_cores']} cores, {results[f'{name}_service_time']} seconds, "
+            f"{results[f'{name}_throughput']} reqs/sec, {results[f'{name}_average_response_time']} sec, "
+            f"{results[f'number_in_{name}']} in tier, utilization {results[f'{name}_utilization']}"
+            for name in self.topology.names
+        )
+        print(f"""
+-- SYSTEM CONFIGURATION --
+seed : {self.seed}
+num clients : {results["num_clients"]}
+priority probability : {results["priority_probability"]}
+
+-- RESULTS --
+system throughput : {results["system_throughput"]} reqs/sec
+system goodput : {results["system_goodput"]} reqs/sec
+system badput : {results["system_badput"]} reqs/sec
+system average response time : {results["system_average_response_time"]} sec
+system p95 / p99 response time : {results["system_p95_response_time"]} / {results["system_p99_response_time"]} sec
+number in system : {results["number_in_system"]}
+
+priority requests dropped : {results["priority_requests_dropped"]}
+regular requests dropped : {results["regular_requests_dropped"]}
+requests timed out : {results["requests_timed_out"]}
+total requests served : {results["total_requests_served"]}
+fraction of requests dropped : {results["fraction_of_requests_dropped"]}
+
+-- TIERS --
+{tiers}
+        """)
+        self.print_output_analysis(results)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Simulate a topology of tiers declared in a json file')
+    parser.add_argument('topology', type=str, help='path of the json topology spec')
+    parser.add_argument('--simulation_time', type=float, required=True, help='simulated seconds')
+    parser.add_argument('--num_clients', type=int, required=True, help='number of clients')
+    parser.add_argument('--think_time', type=float, required=True, help='think time of client')
+    parser.add_argument('--priority_probability', type=float, required=True, help='probability of request being a priority request')
+    parser.add_argument('--retry_delay', type=float, required=True, help='delay time after request timeout')
+    parser.add_argument('--request_timeout', type=float, required=True, help='request timeout time')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the random streams, drawn from the OS when omitted')
+    parser.add_argument('--detect_warmup', action='store_true',
+                        help='detect the end of the warm-up online (MSER-5) and reset the statistics there')
+    parser.add_argument('--target_precision', type=float, default=None,
+                        help='stop the run once the batch-means half-width of the response time is within this fraction of its mean')
+    args = parser.parse_args()
+
+    sim = TopologySimulator(
+        topology = args.topology,
+        simulation_time = args.simulation_time,
+        clients = args.num_clients,
+        think_time = args.think_time,
+        priority_prob = args.priority_probability,
+        retry_delay = args.retry_delay,
+        request_timeout = args.request_timeout,
+        seed = args.seed,
+        detect_warmup = args.detect_warmup,
+        target_precision = args.target_precision,
+        log_to_file = True
+    )
+    result = sim.run(verbose = True)
+    save_results([result.row], args.request_timeout, kind = "topology")
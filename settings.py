@@ -7,7 +7,7 @@ BASE = os.path.dirname(os.path.abspath(__file__))   # Project directory
 LOGS_DIR = os.path.join(BASE, "logs")
 ITER_LOGS_DIR = os.path.join(LOGS_DIR, f"log_{datetime.now().strftime('%Y%m%d%H%M%S')}")
 
-# Logging
+# Logging, the log directory is only created once a file handler is added
 VERBOSE = 1
 STREAM_HANDLER_LOGGING_LEVEL = logging.WARNING
 FILE_HANDLER_LOGGING_LEVEL = logging.INFO
@@ -16,25 +16,85 @@ LOG_FILE_PATHS = {
     "TEMP": os.path.join(ITER_LOGS_DIR, "temp.log")
 }
 
-# Setup directories
-list_of_directories = [LOGS_DIR, ITER_LOGS_DIR]
-for directory in list_of_directories:
-    if not os.path.exists(directory):
-        os.makedirs(directory)
-
 # Event codes
 EVENT_REQUEST_ARRIVAL = 1
 EVENT_REQUEST_COMPLETE_FROM_APP_SERVER = 2
 EVENT_REQUEST_COMPLETE_FROM_DB_SERVER = 3
 EVENT_TIMEOUT = 4
+TRACE_REQUEST_DROPPED = 5   # Trace record of a request dropped on a full queue, not an event
+EVENT_SERVICE_COMPLETE = 6  # Service completion at any tier of a topology, the request knows its tier
 
 # Request
 HIGH_PRIORITY = 1
 LOW_PRIORITY = 0
+PRIORITY_CLASSES = 2    # Request priorities range over [0, PRIORITY_CLASSES)
 REQUEST_TIMEOUT = 100
 
+# Request states
+REQUEST_IN_SERVICE = 0  # Waiting or being served
+REQUEST_COMPLETED = 1
+REQUEST_TIMED_OUT = 2
+REQUEST_DROPPED = 3
+
 # Server
 APPLICATION_SERVER = 1
 DB_SERVER = 0
+NO_TIER = -1    # Requests that are not waiting in any queue
+
+# SYNCHRONIZE = False
+
+# Engine
+DEFAULT_ENGINE = "object"   # Representation of events and requests, "object", "array" or "numba"
+
+# Future event list
+DEFAULT_EVENT_LIST = "heap"     # "heap", "calendar" or "ladder", the numba engine keeps its own heap
+CALENDAR_MIN_BUCKETS = 16   # Buckets of a calendar queue, it never shrinks below
+CALENDAR_WIDTH_SAMPLE = 25  # Earliest events whose gaps set the bucket width of a resized calendar
+LADDER_THRESHOLD = 50   # Events of a ladder bucket sorted into the bottom, more get a finer rung
+LADDER_MAX_RUNGS = 8    # Rungs of a ladder queue, a bucket of the last rung is sorted whatever its size
+
+# Event trace
+TRACE_MODE = "off"  # "off", "sampled" or "full"
+TRACE_SAMPLE_EVERY = 100    # Sampled mode records 1 in TRACE_SAMPLE_EVERY requests
+TRACE_BUFFER_RECORDS = 65536    # Records per trace buffer
+
+# Output analysis
+MSER_BATCH_SIZE = 5     # Observations per batch of MSER-5
+MSER_MIN_BATCHES = 100  # Batches collected before the first truncation check
+MSER_CHECK_EVERY = 20   # Batches between truncation checks
+BATCH_MEANS_MAX_BATCHES = 64    # Batch means kept, neighbours merge when full
+BATCH_MEANS_MIN_BATCHES = 20    # Batches needed before the precision can stop a run
+PRECISION_CHECK_INTERVAL = 10   # Simulated seconds between precision checks
+
+# Metrics time series
+TIME_SERIES_INTERVAL = None     # Simulated seconds per row, None turns the time series off
+TIME_SERIES_BUFFER_ROWS = 4096  # Rows buffered before they are appended to the file
+
+# Live runs
+SATURATION_UTILIZATION = 0.98   # Busy fraction of a server over a snapshot interval, with requests waiting, counted as saturated
+SATURATION_SNAPSHOTS = 3    # Saturated snapshots in a row stopping a run watched with stop_when_saturated
+LIVE_POLL_INTERVAL = 1  # Seconds between checks that the worker of a live simulation is still running
+
+# Checkpoints
+CHECKPOINT_COMPRESSION_LEVEL = 1    # gzip level of the checkpoints, speed over size
+
+# Results store
+RESULTS_STORE_PATH = os.path.join(BASE, "results", "results.sqlite")    # Default SQLite results store
+RESULTS_STORE_BATCH_SIZE = 16   # Sweep results written per transaction
+RESULTS_STORE_TIMEOUT = 60  # Seconds a writer waits for another one to finish
+RESULTS_EXPORT_DIRECTORY = os.path.join(BASE, "results", "export")  # Default root of exported csv layouts, apart from the committed baselines in results/RT_*
+
+# Benchmark suite
+BENCHMARK_HISTORY_PATH = os.path.join(BASE, "results", "benchmark_history.json")   # Runs of python -m benchmarks.suite
+
+# Response time percentiles
+SKETCH_RELATIVE_ACCURACY = 0.01     # Relative error of the quantile sketches
+SKETCH_MIN_VALUE = 1e-6     # Seconds, smaller response times count as 0
+SKETCH_MAX_VALUE = 1e6      # Seconds, larger response times are clamped
+RESPONSE_TIME_PERCENTILES = (50, 95, 99)    # Percentile columns of the results row
 
-# SYNCHRONIZE = False
\ No newline at end of file
+# Random streams
+RANDOM_BLOCK_SIZE = 4096    # Variates pre-drawn per refill of a random stream
+NUMBA_BLOCK_SIZE = 65536   # Variates of every random stream handed to the numba kernel at a time
+NUMBA_INITIAL_CAPACITY = 1024  # Request slots of the numba kernel before it first grows
+CRN_BLOCK_SIZE = 64     # Variates pre-drawn per refill of a per-client stream, with common random numbers
@@ -0,0 +1,88 @@
+import settings
+
+import argparse
+import ast
+import time
+
+from modules.sweep import run_sweep, save_sweep
+from modules.results_store import ResultsStore
+
+
+def parse_value(text:str):
+    """Python literal of a command-line value, the raw string if it is not one
+
+    Args:
+        text (str): Value on the command line
+
+    Returns:
+        int | float | str: Parsed value
+    """
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
+
+def parse_values(text:str):
+    """Values of a grid axis, "a,b,c" or an inclusive range "start:stop:step"
+
+    Args:
+        text (str): Axis on the command line
+
+    Returns:
+        list: Values of the axis
+    """
+    if ":" in text:
+        start, stop, step = (parse_value(part) for part in text.split(":"))
+        values = []
+        value = start
+        while value <= stop:
+            values.append(value)
+            value += step
+        return values
+    return [parse_value(part) for part in text.split(",")]
+
+def parse_assignments(assignments:list, parse):
+    """Parse name=value command-line assignments
+
+    Args:
+        assignments (list): "name=value" strings
+        parse (callable): Parser of the value
+
+    Returns:
+        dict: Name -> parsed value
+    """
+    parsed = {}
+    for assignment in assignments:
+        name, _, value = assignment.partition("=")
+        if not value:
+            raise SystemExit(f"Expected name=value, got {assignment}")
+        parsed[name] = parse(value)
+    return parsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Parallel parameter sweep of the web server simulation')
+    parser.add_argument('--grid', action='append', default=[], metavar='NAME=VALUES',
+                        help='Simulator argument to sweep, "a,b,c" or inclusive range "start:stop:step", repeatable')
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE',
+                        help='Simulator argument shared by every point, repeatable')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes, one per CPU by default')
+    parser.add_argument('--store', type=str, default=None, 
+                        help='SQLite results store, points already in it are not simulated again and new ones are added')
+    parser.add_argument('--output_dir', type=str, default='.', help='directory of the RT_<request_timeout>_simulation.csv files')
+    args = parser.parse_args()
+
+    grid = parse_assignments(args.grid, parse_values)
+    base_config = parse_assignments(args.set, parse_value)
+
+    start = time.perf_counter()
+    if args.store is None:
+        points = run_sweep(grid, base_config, workers = args.workers)
+        simulated = len(points)
+    else:
+        with ResultsStore(args.store) as store:
+            known = len(store)
+            points = run_sweep(grid, base_config, workers = args.workers, store = store)
+            simulated = len(store) - known
+    save_sweep(points, args.output_dir)
+    print(f"{simulated} of {len(points)} points simulated in {time.perf_counter() - start:.1f} sec")
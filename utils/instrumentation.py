@@ -0,0 +1,173 @@
+import settings
+
+import marshal
+import time
+from dataclasses import dataclass
+
+
+# Event type -> name in the report and the profile
+EVENT_NAMES = {
+    settings.EVENT_REQUEST_ARRIVAL : "EVENT_REQUEST_ARRIVAL",
+    settings.EVENT_REQUEST_COMPLETE_FROM_APP_SERVER : "EVENT_REQUEST_COMPLETE_FROM_APP_SERVER",
+    settings.EVENT_REQUEST_COMPLETE_FROM_DB_SERVER : "EVENT_REQUEST_COMPLETE_FROM_DB_SERVER",
+    settings.EVENT_TIMEOUT : "EVENT_TIMEOUT",
+    settings.EVENT_SERVICE_COMPLETE : "EVENT_SERVICE_COMPLETE"
+}
+
+
+def depth_bucket_label(bucket:int):
+    """Range of queue depths of a power of 2 bucket
+
+    Args:
+        bucket (int): Bit length of the depths, 0 for empty queues
+
+    Returns:
+        str: "0", "1", "2-3", "4-7", ...
+    """
+    if bucket <= 1:
+        return str(bucket)
+    return f"{2 ** (bucket - 1)}-{2 ** bucket - 1}"
+
+
+@dataclass
+class InstrumentationReport:
+    """Where the time of the event loop went, per event type
+    """
+    events: dict    # Event name -> events handled
+    handler_time: dict  # Event name -> seconds spent in its handler
+    stale_events: dict  # Event name -> events popped for a request that had already failed
+    loop_time: float    # Seconds spent in the event loop, handlers included
+    heap_high_water: int    # Largest size of the event list seen before an event
+    pending_high_water: int     # Largest number of pending events, event list, arrival FIFO and timeouts
+    queue_depths: dict  # Queue name -> depth range -> events handled while the queue had that depth
+
+    @property
+    def overhead_time(self) -> float:
+        """Seconds of the event loop outside the handlers: event list, arrival FIFO and timeouts
+        """
+        return max(0.0, self.loop_time - sum(self.handler_time.values()))
+
+    def summary(self):
+        """Human readable report
+
+        Returns:
+            str: One line per event type, then the event list and queue depths
+        """
+        lines = []
+        for name, count in self.events.items():
+            seconds = self.handler_time[name]
+            lines.append(f"{name} : {count:,} events, {seconds:.3f} sec ({seconds / count * 1e6 if count else 0:.2f} us/event), "
+                         f"{self.stale_events.get(name, 0):,} stale")
+        lines.append(f"event loop : {self.loop_time:.3f} sec, {self.overhead_time:.3f} sec outside the handlers")
+        lines.append(f"heap high-water mark : {self.heap_high_water:,} | pending events high-water mark : {self.pending_high_water:,}")
+        for name, depths in self.queue_depths.items():
+            lines.append(f"{name} queue depth : " + ", ".join(f"{depth} : {count:,}" for depth, count in depths.items()))
+        return "\n".join(lines)
+
+    def profile_stats(self):
+        """Statistics in the format of cProfile, one function per event type called by the event loop
+
+        Returns:
+            dict: (file, line, function) -> (primitive calls, calls, own time, cumulative time, callers)
+        """
+        loop = ("simulator", 0, "run_until")
+        stats = {loop : (1, 1, self.overhead_time, self.loop_time, {})}
+        for name, count in self.events.items():
+            seconds = self.handler_time[name]
+            stats[("event_handler", 0, name)] = (count, count, seconds, seconds, {loop : (count, count, seconds, seconds)})
+        return stats
+
+    def dump_stats(self, path:str):
+        """Write the statistics as cProfile.Profile.dump_stats does, readable by pstats.Stats and snakeviz
+
+        Args:
+            path (str): Path of the profile file
+        """
+        with open(path, "wb") as file:
+            marshal.dump(self.profile_stats(), file)
+
+
+class Instrumentation:
+    def __init__(self) -> None:
+        """Opt-in counters of the event loop, handler times per event type, event list sizes and queue depths
+
+        Engines wrap their handlers with instrument only when a run asks for instrumentation,
+        so runs without it execute exactly the code they did before.
+        """
+        self.events = {}    # Event type -> events handled
+        self.handler_ns = {}    # Event type -> nanoseconds in its handler
+        self.stale_events = {}  # Event type -> events popped for a failed request
+        self.loop_ns = 0
+        self.heap_high_water = 0
+        self.pending_high_water = 0
+        self.queue_depths = {}  # Queue name -> events handled per power of 2 depth bucket
+
+    def instrument(self, handler, event_type_of, is_stale, event_list, arrivals, timeouts, queues:dict):
+        """Wrap an event handler so that it counts and times its events
+
+        Args:
+            handler (callable): Event handler, called with the event or slot and the current time
+            event_type_of (callable): Type of the event, from the event or slot
+            is_stale (callable): Whether the event was popped for a request that already failed, from the event or slot
+            event_list (HeapEventList): Future event list of the run
+            arrivals (deque): Arrival FIFO of the run
+            timeouts (TimeoutManager): Pending request timeouts
+            queues (dict): Queue name -> waiting queue, sampled before every event
+
+        Returns:
+            callable: Instrumented handler
+        """
+        events, handler_ns, stale_events = self.events, self.handler_ns, self.stale_events
+        depths = {name : self.queue_depths.setdefault(name, []) for name in queues}
+        perf_counter_ns = time.perf_counter_ns
+
+        def instrumented_handler(event, current_time:float):
+            event_type = event_type_of(event)
+            heap = len(event_list)
+            if heap > self.heap_high_water:
+                self.heap_high_water = heap
+            pending = heap + len(arrivals) + len(timeouts)
+            if pending > self.pending_high_water:
+                self.pending_high_water = pending
+            for name, queue in queues.items():
+                bucket = len(queue).bit_length()
+                histogram = depths[name]
+                if bucket >= len(histogram):
+                    histogram.extend([0] * (bucket + 1 - len(histogram)))
+                histogram[bucket] += 1
+            if is_stale(event):
+                stale_events[event_type] = stale_events.get(event_type, 0) + 1
+
+            start = perf_counter_ns()
+            handler(event, current_time)
+            handler_ns[event_type] = handler_ns.get(event_type, 0) + perf_counter_ns() - start
+            events[event_type] = events.get(event_type, 0) + 1
+        return instrumented_handler
+
+    def add_loop_time(self, seconds:float):
+        """Account wall-clock time spent in the event loop
+
+        Args:
+            seconds (float): Seconds of one run_until
+        """
+        self.loop_ns += int(seconds * 1e9)
+
+    def report(self):
+        """Snapshot of the counters
+
+        Returns:
+            InstrumentationReport: Counters, times in seconds and depth histograms
+        """
+        event_types = sorted(self.events)
+        return InstrumentationReport(
+            events = {EVENT_NAMES.get(event_type, str(event_type)) : self.events[event_type] for event_type in event_types},
+            handler_time = {EVENT_NAMES.get(event_type, str(event_type)) : self.handler_ns[event_type] / 1e9 for event_type in event_types},
+            stale_events = {EVENT_NAMES.get(event_type, str(event_type)) : count for event_type, count in sorted(self.stale_events.items())},
+            loop_time = self.loop_ns / 1e9,
+            heap_high_water = self.heap_high_water,
+            pending_high_water = self.pending_high_water,
+            queue_depths = {
+                name : {depth_bucket_label(bucket) : count for bucket, count in enumerate(histogram) if count}
+                for name, histogram in self.queue_depths.items()
+            }
+        )
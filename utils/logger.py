@@ -1,33 +1,41 @@
 import settings
 
 import logging
+import os
 
 
-def get_logger(logger_name:str):
+def get_logger(logger_name:str, log_to_file:bool = False):
     """Creates a custom logger
 
+    Handlers are added once per process, so loggers of many simulators in one process do not
+    repeat every message. The log file and its directory are only created when asked for.
+
     Args:
         logger_name (str): Unique logger name
+        log_to_file (bool): Also write the messages to the log file of the logger
 
     Returns:
         logging.Logger: logger object
     """
     logger = logging.getLogger(logger_name)
-    if settings.VERBOSE:    # Activate stream handler
+    handler_types = {type(handler) for handler in logger.handlers}
+    if settings.VERBOSE and logging.StreamHandler not in handler_types:    # Activate stream handler
         stream_handler = logging.StreamHandler()
         stream_handler.setLevel(settings.STREAM_HANDLER_LOGGING_LEVEL)
         stream_formatter = logging.Formatter("%(asctime)s | %(name)s | %(levelname)s : %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
         stream_handler.setFormatter(stream_formatter)
         logger.addHandler(stream_handler)
 
-    if logger_name in settings.LOG_FILE_PATHS.keys():
-        path = settings.LOG_FILE_PATHS[logger_name]
-    else:
-        path = settings.LOG_FILE_PATHS["TEMP"]
-    file_handler = logging.FileHandler(path)
-    file_handler.setLevel(settings.FILE_HANDLER_LOGGING_LEVEL)
-    file_formatter = logging.Formatter("%(asctime)s | %(levelname)s : %(message)s", datefmt="%I:%M:%S")
-    file_handler.setFormatter(file_formatter)
-    logger.addHandler(file_handler)
-
-    return logger
\ No newline at end of file
+    if log_to_file and logging.FileHandler not in handler_types:
+        if logger_name in settings.LOG_FILE_PATHS.keys():
+            path = settings.LOG_FILE_PATHS[logger_name]
+        else:
+            path = settings.LOG_FILE_PATHS["TEMP"]
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        file_handler = logging.FileHandler(path)
+        file_handler.setLevel(settings.FILE_HANDLER_LOGGING_LEVEL)
+        file_formatter = logging.Formatter("%(asctime)s | %(levelname)s : %(message)s", datefmt="%I:%M:%S")
+        file_handler.setFormatter(file_formatter)
+        logger.addHandler(file_handler)
+
+    return logger
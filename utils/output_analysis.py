@@ -0,0 +1,149 @@
+import settings
+
+import numpy as np
+
+
+def mser_truncation(batch_means:np.ndarray):
+    """MSER truncation point of a series of batch means
+
+    Args:
+        batch_means (np.ndarray): Batch means in time order
+
+    Returns:
+        int: Number of leading batches d* minimizing the MSER statistic over d < n - 1
+    """
+    count = len(batch_means)
+    suffix_sum = np.cumsum(batch_means[::-1])[::-1]
+    suffix_sum_of_squares = np.cumsum((batch_means ** 2)[::-1])[::-1]
+    remaining = np.arange(count, 0, -1)     # n - d for every d
+    squared_error = suffix_sum_of_squares - suffix_sum ** 2 / remaining
+    mser = squared_error[:-1] / remaining[:-1] ** 2
+    return int(np.argmin(mser))
+
+
+class BatchMeans:
+    def __init__(self, max_batches:int) -> None:
+        """Non-overlapping batch means of a stream in constant memory
+
+        The batch size starts at 1 and doubles, merging neighbouring batches, whenever
+        max_batches batches are full.
+
+        Args:
+            max_batches (int): Even number of batches kept
+        """
+        self.max_batches = max_batches
+        self.batch_size = 1
+        self.means = []
+        self.current_sum = 0.0
+        self.current_count = 0
+
+    def observe(self, value:float):
+        """Add an observation
+
+        Args:
+            value (float): Observation
+        """
+        self.current_sum += value
+        self.current_count += 1
+        if self.current_count == self.batch_size:
+            self.means.append(self.current_sum / self.batch_size)
+            self.current_sum = 0.0
+            self.current_count = 0
+            if len(self.means) == self.max_batches:
+                self.means = [(self.means[i] + self.means[i + 1]) / 2 for i in range(0, self.max_batches, 2)]
+                self.batch_size *= 2
+
+    def interval(self, confidence:float = 0.95):
+        """Confidence interval of the mean from the full batches
+
+        Args:
+            confidence (float): Confidence level
+
+        Returns:
+            (float, float): Mean and half-width, half-width is infinite for fewer than 2 batches
+        """
+        from scipy import stats
+
+        if not self.means:
+            return float("nan"), float("inf")
+        means = np.asarray(self.means)
+        if len(means) < 2:
+            return means.mean(), float("inf")
+        half_width = stats.t.ppf((1 + confidence) / 2, len(means) - 1) * means.std(ddof=1) / np.sqrt(len(means))
+        return means.mean(), half_width
+
+
+class OutputAnalysis:
+    def __init__(self, detect_warmup:bool = True, confidence:float = 0.95) -> None:
+        """Online warm-up detection (MSER-5) and batch-means interval of response times
+
+        Response times are grouped in batches of 5. Every settings.MSER_CHECK_EVERY batches the
+        MSER-5 truncation point is computed, and the warm-up is over the first time it falls in
+        the first half of the series. Statistics are then reset, and the following response times
+        feed the batch means.
+
+        Args:
+            detect_warmup (bool): Detect the warm-up first, otherwise batch means start right away
+            confidence (float): Confidence level of the interval
+        """
+        self.confidence = confidence
+        self.in_warmup = detect_warmup
+        self.warmup_time = 0.0  # Simulation time the statistics were reset at
+
+        self.mser_means = []
+        self.mser_sum = 0.0
+        self.mser_count = 0
+
+        self.batch_means = BatchMeans(settings.BATCH_MEANS_MAX_BATCHES)
+
+    def observe(self, response_time:float, current_time:float):
+        """Add a response time
+
+        Args:
+            response_time (float): Response time of a request completed from the system
+            current_time (float): Current simulation time
+
+        Returns:
+            bool: True if the warm-up was detected with this observation, statistics must be reset
+        """
+        if not self.in_warmup:
+            self.batch_means.observe(response_time)
+            return False
+
+        self.mser_sum += response_time
+        self.mser_count += 1
+        if self.mser_count < settings.MSER_BATCH_SIZE:
+            return False
+        self.mser_means.append(self.mser_sum / settings.MSER_BATCH_SIZE)
+        self.mser_sum = 0.0
+        self.mser_count = 0
+
+        batches = len(self.mser_means)
+        if batches < settings.MSER_MIN_BATCHES or batches % settings.MSER_CHECK_EVERY:
+            return False
+        if mser_truncation(np.asarray(self.mser_means)) >= batches // 2:
+            return False
+
+        self.in_warmup = False
+        self.warmup_time = current_time
+        self.mser_means = []
+        return True
+
+    def interval(self):
+        """Batch-means confidence interval of the response time after the warm-up
+
+        Returns:
+            (float, float): Mean and half-width
+        """
+        return self.batch_means.interval(self.confidence)
+
+    def relative_half_width(self):
+        """Half-width of the interval relative to its mean
+
+        Returns:
+            float: Relative half-width, infinite until enough batches are full
+        """
+        mean, half_width = self.interval()
+        if len(self.batch_means.means) < settings.BATCH_MEANS_MIN_BATCHES or not mean:
+            return float("inf")
+        return half_width / abs(mean)
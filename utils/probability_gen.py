@@ -1,44 +1,23 @@
-import numpy as np
-
-
-def get_probablity(prob):
+def get_probablity(prob, stream):
     """Select item from probabilistic distribution
 
     Args:
         prob (float): Probability of event A
+        stream (RandomStream): Stream of uniform variates in [0, 1)
 
     Returns:
         bool: True for event A, False for event B
     """
-    max_num = 10**4
-    num = np.random.randint(low=1, high=max_num)
-    if num <= prob * max_num:
-        return True
-    return False
+    return stream.next() < prob
 
-def calculate_average_response_time(current_average, number_of_requests_served, new_response_time):
-    """Average response time 
+def get_retry_delay(mean_retry_delay, stream):
+    """Delay before a failed request is sent again
 
     Args:
-        current_average (float): Current running average
-        number_of_requests_served (int): Number of requests served
-        new_response_time (float): New response time to add to the average
+        mean_retry_delay (float): Mean of the normal distribution
+        stream (RandomStream): Stream of standard normal variates
 
     Returns:
-        float : New average
+        float: Retry delay
     """
-    return round((current_average*number_of_requests_served + new_response_time)/(number_of_requests_served + 1),3)
-
-def calculate_number_in_the_server(server):
-    """Total number of request in the server
-
-    Args:
-        server (Server): Server object
-
-    Returns:
-        int: Number of requests in the server
-    """
-    return server.busy_cores + len(server.regular_queue) + len(server.priority_queue)
-
-def get_retry_delay(mean_retry_delay):
-    return abs(np.random.normal(mean_retry_delay))
\ No newline at end of file
+    return abs(mean_retry_delay + stream.next())
\ No newline at end of file
@@ -0,0 +1,103 @@
+import settings
+
+import math
+import numpy as np
+
+
+class QuantileSketch:
+    def __init__(self, relative_accuracy:float = None, min_value:float = None, max_value:float = None) -> None:
+        """Mergeable streaming quantile sketch with logarithmic buckets (DDSketch style)
+
+        Values in (gamma^(i-1), gamma^i] fall in bucket i, with gamma = (1 + a) / (1 - a), so every
+        quantile is returned within a relative error a of an observed value. Buckets cover
+        [min_value, max_value] in a fixed array, values below go to a zero bucket and values above
+        to the last one. Sketches with the same parameters merge by adding their counts.
+
+        Args:
+            relative_accuracy (float): Relative error a of the quantiles, settings.SKETCH_RELATIVE_ACCURACY by default
+            min_value (float): Smallest value told apart from 0, settings.SKETCH_MIN_VALUE by default
+            max_value (float): Largest value without clamping, settings.SKETCH_MAX_VALUE by default
+        """
+        self.relative_accuracy = relative_accuracy or settings.SKETCH_RELATIVE_ACCURACY
+        self.min_value = min_value or settings.SKETCH_MIN_VALUE
+        self.max_value = max_value or settings.SKETCH_MAX_VALUE
+
+        self.gamma = (1 + self.relative_accuracy) / (1 - self.relative_accuracy)
+        self.inverse_log_gamma = 1 / math.log(self.gamma)
+        self.offset = math.ceil(math.log(self.min_value) * self.inverse_log_gamma)
+        self.counts = [0] * (math.ceil(math.log(self.max_value) * self.inverse_log_gamma) - self.offset + 1)
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value:float):
+        """Add an observation
+
+        Args:
+            value (float): Observation, non negative
+        """
+        if value > self.min_value:
+            index = math.ceil(math.log(value) * self.inverse_log_gamma) - self.offset
+            self.counts[min(index, len(self.counts) - 1)] += 1
+        else:
+            self.zero_count += 1
+        self.count += 1
+
+    def merge(self, other:"QuantileSketch"):
+        """Add the observations of another sketch
+
+        Args:
+            other (QuantileSketch): Sketch with the same parameters
+        """
+        if (other.relative_accuracy, other.min_value, other.max_value) != (self.relative_accuracy, self.min_value, self.max_value):
+            raise ValueError("Only sketches with the same relative accuracy and value range can be merged")
+        self.counts = [count + other_count for count, other_count in zip(self.counts, other.counts)]
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def quantiles(self, quantiles:list):
+        """Estimate quantiles of the observations
+
+        Args:
+            quantiles (list): Quantiles in [0, 1]
+
+        Returns:
+            list: Estimates, nan when the sketch is empty
+        """
+        if not self.count:
+            return [float("nan")] * len(quantiles)
+        cumulative = np.cumsum(self.counts) + self.zero_count
+        estimates = []
+        for quantile in quantiles:
+            rank = quantile * (self.count - 1)
+            if rank < self.zero_count:
+                estimates.append(0.0)
+            else:
+                index = int(np.searchsorted(cumulative, rank, side="right")) + self.offset
+                estimates.append(2 * self.gamma ** index / (self.gamma + 1))   # Middle of the bucket in relative terms
+        return estimates
+
+    def quantile(self, quantile:float):
+        """Estimate a quantile of the observations
+
+        Args:
+            quantile (float): Quantile in [0, 1]
+
+        Returns:
+            float: Estimate, nan when the sketch is empty
+        """
+        return self.quantiles([quantile])[0]
+
+
+def merge_sketches(sketches:list):
+    """Merge sketches without changing them
+
+    Args:
+        sketches (list): Sketches with the same parameters
+
+    Returns:
+        QuantileSketch: Sketch of all the observations
+    """
+    merged = QuantileSketch(sketches[0].relative_accuracy, sketches[0].min_value, sketches[0].max_value)
+    for sketch in sketches:
+        merged.merge(sketch)
+    return merged
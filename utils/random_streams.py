@@ -0,0 +1,162 @@
+import settings
+
+import numpy as np
+
+
+class RandomStream:
+    def __init__(self, generator:np.random.Generator, distribution:str, block_size:int = None, **parameters) -> None:
+        """Stream of random variates drawn in large blocks from a single generator
+
+        Args:
+            generator (np.random.Generator): Generator owned by this stream
+            distribution (str): Name of the distribution method of the generator
+            block_size (int): Number of variates pre-drawn on every refill
+            parameters: Parameters of the distribution method, e.g. shape and scale of gamma
+        """
+        self.generator = generator
+        self.distribution = distribution
+        self.parameters = parameters
+        self.block_size = block_size if block_size is not None else settings.RANDOM_BLOCK_SIZE
+        self.block = []
+        self.index = 0
+
+    def refill(self):
+        """Draw a new block of variates from the generator
+        """
+        self.block = getattr(self.generator, self.distribution)(size = self.block_size, **self.parameters).tolist()
+        self.index = 0
+
+    def next(self):
+        """Next variate of the stream
+
+        Returns:
+            float: Random variate
+        """
+        if self.index == len(self.block):
+            self.refill()
+        value = self.block[self.index]
+        self.index += 1
+        return value
+
+
+# Purpose -> standard distribution of its variates, in the order the streams are spawned
+STREAM_PURPOSES = {
+    "app_service" : "standard_exponential",
+    "db_service" : "standard_exponential",
+    "routing" : "random",
+    "priority" : "random",
+    "retry" : "standard_normal"
+}
+
+
+class ConstantStream:
+    def __init__(self, value:float = 1.0) -> None:
+        """Stream always returning the same value, the variates of a deterministic distribution
+
+        Args:
+            value (float): Value of every variate
+        """
+        self.value = value
+
+    def next(self):
+        """Next variate of the stream
+
+        Returns:
+            float: The constant value
+        """
+        return self.value
+
+
+class ClientStreams:
+    def __init__(self, entropy, client_id:int, block_size:int = None) -> None:
+        """Random streams of a single client, one per purpose, for common random numbers
+
+        The stream of every purpose only depends on the seed and the client id, so two
+        configurations run with the same seed give the k-th request of a client the same
+        service times, route, priority and retry delays. Streams are created on first use.
+
+        Args:
+            entropy (int | list): Entropy of the seed of the run
+            client_id (int): Id of the client
+            block_size (int): Number of variates pre-drawn on every refill
+        """
+        self.entropy = entropy
+        self.client_id = client_id
+        self.block_size = block_size if block_size is not None else settings.CRN_BLOCK_SIZE
+
+    def __getattr__(self, purpose:str):
+        """Stream of a purpose, created the first time it is needed
+
+        Args:
+            purpose (str): Name of the stream, one of STREAM_PURPOSES
+
+        Returns:
+            RandomStream: Stream of the purpose
+        """
+        if purpose not in STREAM_PURPOSES:
+            raise AttributeError(purpose)
+        seed_sequence = np.random.SeedSequence(self.entropy, spawn_key = (self.client_id, list(STREAM_PURPOSES).index(purpose)))
+        stream = RandomStream(np.random.default_rng(seed_sequence), STREAM_PURPOSES[purpose], self.block_size)
+        setattr(self, purpose, stream)
+        return stream
+
+
+class RandomStreams:
+    def __init__(self, seed:int = None, block_size:int = None, common_random_numbers:bool = False) -> None:
+        """Independent random streams, one per purpose, derived from a single seed
+
+        Args:
+            seed (int): Seed of the run, a fresh one is drawn from the OS when None
+            block_size (int): Number of variates pre-drawn on every refill
+            common_random_numbers (bool): Give every client its own streams, see ClientStreams
+        """
+        seed_sequence = np.random.SeedSequence(seed)
+        self.seed = seed_sequence.entropy   # Seed that reproduces this run
+        self.common_random_numbers = common_random_numbers
+        self.clients = {}   # Client id -> ClientStreams, with common random numbers
+
+        app_service, db_service, routing, priority, retry = [
+            np.random.default_rng(child) for child in seed_sequence.spawn(len(STREAM_PURPOSES))
+        ]
+        self.app_service = RandomStream(app_service, "standard_exponential", block_size)
+        self.db_service = RandomStream(db_service, "standard_exponential", block_size)
+        self.routing = RandomStream(routing, "random", block_size)
+        self.priority = RandomStream(priority, "random", block_size)
+        self.retry = RandomStream(retry, "standard_normal", block_size)
+
+    def client(self, client_id:int):
+        """Streams of the requests of a client
+
+        Args:
+            client_id (int): Id of the client
+
+        Returns:
+            RandomStreams | ClientStreams: The client's own streams with common random numbers,
+                                           the streams shared by every client otherwise
+        """
+        if not self.common_random_numbers:
+            return self
+        streams = self.clients.get(client_id)
+        if streams is None:
+            streams = self.clients[client_id] = ClientStreams(self.seed, client_id)
+        return streams
+
+    def tier_service(self, tier_index:int, distribution:str, **parameters):
+        """Service stream of a tier of a topology
+
+        Exponential streams of the first two tiers are the app and db service streams, so a
+        two-tier topology draws the same service times as the two-tier engines. Other tiers get
+        a stream of their own, derived from the seed and the tier index.
+
+        Args:
+            tier_index (int): Index of the tier in the topology
+            distribution (str): Name of the distribution method of the generator
+            parameters: Parameters of the distribution method
+
+        Returns:
+            RandomStream: Stream of the tier
+        """
+        if distribution == "standard_exponential" and not parameters and tier_index < 2:
+            return (self.app_service, self.db_service)[tier_index]
+        seed_sequence = np.random.SeedSequence(self.seed, spawn_key = (len(STREAM_PURPOSES) + tier_index,))
+        return RandomStream(np.random.default_rng(seed_sequence), distribution, **parameters)
@@ -0,0 +1,163 @@
+import settings
+
+import argparse
+
+import os
+import numpy as np
+
+from utils.trace import write_npy_header
+
+
+# One row per interval, rates are per second and the other columns time averages over the interval
+TIME_SERIES_DTYPE = np.dtype([
+    ("time", "<f8"),    # End of the interval
+    ("system_throughput", "<f8"),
+    ("system_goodput", "<f8"),
+    ("drop_rate", "<f8"),
+    ("timeout_rate", "<f8"),
+    ("number_in_app_server", "<f8"),
+    ("app_server_queue_length", "<f8"),
+    ("app_server_utilization", "<f8"),
+    ("number_in_db_server", "<f8"),
+    ("db_server_queue_length", "<f8"),
+    ("db_server_utilization", "<f8")
+])
+TIME_SERIES_FORMATS = ("npy", "parquet")
+
+
+class TimeSeriesRecorder:
+    def __init__(self, path:str, interval:float, app_core_count:int, db_core_count:int, buffer_rows:int = None) -> None:
+        """Fixed-interval metrics of a run, streamed to a .npy or .parquet file
+
+        Every interval, the cumulative counters and time integrals of the event handler are
+        differenced against the previous interval. Rows go into a preallocated buffer which is
+        appended to the file when full, so memory stays bounded however long the run.
+
+        Args:
+            path (str): Path of the file, Parquet if it ends with .parquet (requires pyarrow), .npy otherwise
+            interval (float): Simulated seconds per row
+            app_core_count (int): Cores of the app server, for the utilization
+            db_core_count (int): Cores of the db server, for the utilization
+            buffer_rows (int): Rows per buffer
+        """
+        self.path = path
+        self.interval = interval
+        self.app_core_count = app_core_count
+        self.db_core_count = db_core_count
+        self.buffer = np.empty(buffer_rows or settings.TIME_SERIES_BUFFER_ROWS, dtype=TIME_SERIES_DTYPE)
+        self.index = 0
+        self.count = 0  # Rows written to the file
+
+        self.next_time = interval   # End of the current interval
+        self.last_time = 0.0
+        self.last = np.zeros(8)     # Cumulative values at the end of the previous interval
+
+        self.format = "parquet" if path.endswith(".parquet") else "npy"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok = True)
+        if self.format == "parquet":
+            try:
+                import pyarrow
+                import pyarrow.parquet
+            except ImportError:
+                raise ImportError("Parquet time series require pyarrow, install it or use a .npy path")
+            self.pyarrow = pyarrow
+            self.writer = pyarrow.parquet.ParquetWriter(path, self.arrow_table(self.buffer[:0]).schema)
+        else:
+            self.file = open(path, "wb")
+            write_npy_header(self.file, 0, TIME_SERIES_DTYPE)
+
+    def record(self, time:float, cumulative:np.ndarray):
+        """Add the row of the interval ending at time
+
+        Args:
+            time (float): End of the interval
+            cumulative (np.ndarray): Output of EventHandler.cumulative_metrics at time
+        """
+        elapsed = time - self.last_time
+        if elapsed <= 0:
+            return
+        (goodput, badput, dropped, timed_out, app_busy, app_queue, db_busy, db_queue) = (cumulative - self.last) / elapsed
+        self.buffer[self.index] = (
+            time, goodput + badput, goodput, dropped, timed_out,
+            app_busy + app_queue, app_queue, app_busy / self.app_core_count,
+            db_busy + db_queue, db_queue, db_busy / self.db_core_count
+        )
+        self.last = cumulative
+        self.last_time = time
+        self.next_time = time + self.interval
+
+        self.index += 1
+        if self.index == len(self.buffer):
+            self.flush()
+
+    def rebase(self, cumulative:np.ndarray):
+        """Keep the current interval whole when the handler statistics are about to be reset
+
+        Args:
+            cumulative (np.ndarray): Output of EventHandler.cumulative_metrics just before the reset
+        """
+        self.last = self.last - cumulative
+
+    def arrow_table(self, rows:np.ndarray):
+        """Arrow table of time series rows, one column per field
+
+        Args:
+            rows (np.ndarray): Rows of TIME_SERIES_DTYPE
+
+        Returns:
+            pyarrow.Table: Table of the rows
+        """
+        return self.pyarrow.table({name : rows[name] for name in TIME_SERIES_DTYPE.names})
+
+    def flush(self):
+        """Append the buffered rows to the file
+        """
+        if not self.index:
+            return
+        rows = self.buffer[:self.index]
+        if self.format == "parquet":
+            self.writer.write_table(self.arrow_table(rows))
+        else:
+            self.file.write(rows.tobytes())
+        self.count += self.index
+        self.index = 0
+
+    def close(self):
+        """Write the remaining rows and finalize the file
+        """
+        self.flush()
+        if self.format == "parquet":
+            self.writer.close()
+        elif not self.file.closed:
+            self.file.seek(0)
+            write_npy_header(self.file, self.count, TIME_SERIES_DTYPE)
+            self.file.close()
+
+
+def read_time_series(path:str):
+    """Load a time series file as a DataFrame
+
+    Args:
+        path (str): Path of the .npy or .parquet file
+
+    Returns:
+        pd.DataFrame: One row per interval
+    """
+    import pandas as pd
+
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.DataFrame(np.load(path))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert a metrics time series')
+    parser.add_argument('path', type=str, help='path of the .npy or .parquet file')
+    parser.add_argument('--csv', type=str, default=None, help='write the time series to this csv file instead of printing it')
+    args = parser.parse_args()
+
+    time_series = read_time_series(args.path)
+    if args.csv:
+        time_series.to_csv(args.csv, index=False)
+    else:
+        print(time_series.to_string(index=False))
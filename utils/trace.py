@@ -0,0 +1,139 @@
+import settings
+
+import os
+import queue
+import threading
+
+import numpy as np
+
+
+# Fixed-width trace record
+TRACE_DTYPE = np.dtype([
+    ("time", "<f8"),
+    ("type", "i1"),
+    ("tier", "i1"),
+    ("request_id", "<i8"),
+    ("app_queue", "<i4"),
+    ("db_queue", "<i4")
+])
+TRACE_MODES = ("off", "sampled", "full")
+HEADER_LENGTH = 256     # Bytes reserved at least for the .npy header, rewritten with the record count on close
+
+
+def write_npy_header(file, count:int, dtype:np.dtype = TRACE_DTYPE):
+    """Write a .npy (version 1.0) header of fixed length for a 1-d array of records
+
+    Args:
+        file (io.BufferedWriter): File positioned at its start
+        count (int): Number of records following the header
+        dtype (np.dtype): Record type, trace records by default
+    """
+    descr = np.lib.format.dtype_to_descr(dtype)
+    header = str({"descr": descr, "fortran_order": False, "shape": (count,)})
+    prefix = np.lib.format.MAGIC_PREFIX + bytes([1, 0])
+
+    # Same length whatever the count, so the header can be rewritten in place
+    longest = len(prefix) + 2 + len(str({"descr": descr, "fortran_order": False, "shape": (2 ** 63,)})) + 1
+    length = max(HEADER_LENGTH, -(-longest // 64) * 64)
+    padding = length - len(prefix) - 2 - len(header) - 1
+    file.write(prefix + (length - len(prefix) - 2).to_bytes(2, "little"))
+    file.write((header + " " * padding + "\n").encode("latin1"))
+
+
+class TraceRecorder:
+    def __init__(self, path:str, sample_every:int = 1, buffer_records:int = None) -> None:
+        """Binary event trace written to a .npy file by a background thread
+
+        Records go into a preallocated buffer. A full buffer is handed to the writer thread and
+        recording continues in a second buffer, so the simulation only waits on the disk when
+        the writer falls a whole buffer behind.
+
+        Args:
+            path (str): Path of the .npy trace file
+            sample_every (int): Record the events of 1 in sample_every requests
+            buffer_records (int): Number of records per buffer
+        """
+        buffer_records = buffer_records or settings.TRACE_BUFFER_RECORDS
+        self.path = path
+        self.sample_every = sample_every
+        self.buffer = np.empty(buffer_records, dtype=TRACE_DTYPE)
+        self.index = 0
+        self.count = 0  # Records written to the file
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok = True)
+        self.file = open(path, "wb")
+        write_npy_header(self.file, 0)
+
+        self.free_buffers = queue.Queue()
+        self.free_buffers.put(np.empty(buffer_records, dtype=TRACE_DTYPE))
+        self.full_buffers = queue.Queue()
+        self.writer = threading.Thread(target=self.write_buffers, name="trace-writer", daemon=True)
+        self.writer.start()
+
+    def record(self, time:float, type:int, request_id:int, tier:int, app_queue:int, db_queue:int):
+        """Record an event, if its request is sampled
+
+        Args:
+            time (float): Simulation time of the event
+            type (int): Event type, or settings.TRACE_REQUEST_DROPPED
+            request_id (int): Id of the request
+            tier (int): Tier of the event, settings.NO_TIER if none
+            app_queue (int): Number of requests waiting at the app server
+            db_queue (int): Number of requests waiting at the db server
+        """
+        if request_id % self.sample_every:
+            return
+        self.buffer[self.index] = (time, type, tier, request_id, app_queue, db_queue)
+        self.index += 1
+        if self.index == len(self.buffer):
+            self.flush()
+
+    def flush(self):
+        """Hand the current buffer to the writer thread and continue in a free one
+        """
+        if self.index:
+            self.full_buffers.put((self.buffer, self.index))
+            self.buffer = self.free_buffers.get()
+            self.index = 0
+
+    def write_buffers(self):
+        """Writer thread, appends full buffers to the file until close
+        """
+        while True:
+            item = self.full_buffers.get()
+            if item is None:
+                return
+            buffer, count = item
+            self.file.write(buffer[:count].tobytes())
+            self.count += count
+            self.free_buffers.put(buffer)
+
+    def close(self):
+        """Write the remaining records and finalize the file header
+        """
+        if self.file.closed:
+            return
+        self.flush()
+        self.full_buffers.put(None)
+        self.writer.join()
+        self.file.seek(0)
+        write_npy_header(self.file, self.count)
+        self.file.close()
+
+
+def get_trace_recorder(mode:str, path:str, sample_every:int = 1):
+    """Trace recorder for a trace mode
+
+    Args:
+        mode (str): "off", "sampled" (1 in sample_every requests) or "full"
+        path (str): Path of the .npy trace file
+        sample_every (int): Sampling period of sampled mode
+
+    Returns:
+        TraceRecorder: Recorder, None when tracing is off
+    """
+    if mode not in TRACE_MODES:
+        raise ValueError(f"Unknown trace mode {mode}, expected one of {', '.join(TRACE_MODES)}")
+    if mode == "off":
+        return None
+    return TraceRecorder(path, sample_every = sample_every if mode == "sampled" else 1)
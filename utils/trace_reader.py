@@ -0,0 +1,49 @@
+import settings
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+
+EVENT_NAMES = {
+    settings.EVENT_REQUEST_ARRIVAL : "EVENT_REQUEST_ARRIVAL",
+    settings.EVENT_REQUEST_COMPLETE_FROM_APP_SERVER : "EVENT_REQUEST_COMPLETE_FROM_APP_SERVER",
+    settings.EVENT_REQUEST_COMPLETE_FROM_DB_SERVER : "EVENT_REQUEST_COMPLETE_FROM_DB_SERVER",
+    settings.EVENT_TIMEOUT : "EVENT_TIMEOUT",
+    settings.TRACE_REQUEST_DROPPED : "REQUEST_DROPPED"
+}
+TIER_NAMES = {
+    settings.APPLICATION_SERVER : "app",
+    settings.DB_SERVER : "db",
+    settings.NO_TIER : ""
+}
+
+
+def read_trace(path:str):
+    """Load a binary event trace as a DataFrame
+
+    Args:
+        path (str): Path of the .npy trace file
+
+    Returns:
+        pd.DataFrame: One row per record, with the event and tier names decoded
+    """
+    records = np.load(path, mmap_mode="r")
+    trace = pd.DataFrame({name: np.asarray(records[name]) for name in records.dtype.names})
+    trace["event"] = trace["type"].map(EVENT_NAMES)
+    trace["tier_name"] = trace["tier"].map(TIER_NAMES)
+    return trace
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert a binary event trace')
+    parser.add_argument('path', type=str, help='path of the .npy trace file')
+    parser.add_argument('--csv', type=str, default=None, help='write the trace to this csv file instead of printing it')
+    args = parser.parse_args()
+
+    trace = read_trace(args.path)
+    if args.csv:
+        trace.to_csv(args.csv, index=False)
+    else:
+        print(trace)